@@ -0,0 +1,30 @@
+"""Add chat summary
+
+Revision ID: 4f9a1d6c3e82
+Revises: ee41c9b7d205
+Create Date: 2026-10-18 18:05:32.617408
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f9a1d6c3e82'
+down_revision: Union[str, None] = 'ee41c9b7d205'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chats', sa.Column('summary', sa.String(), nullable=True))
+    op.add_column('chats', sa.Column('summary_until', sa.DateTime(), nullable=True))
+    op.add_column('chats', sa.Column('summary_until_id', sa.UUID(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chats', 'summary_until_id')
+    op.drop_column('chats', 'summary_until')
+    op.drop_column('chats', 'summary')
@@ -0,0 +1,45 @@
+"""Add ingestion jobs
+
+Revision ID: 7c4e2a9f0b13
+Revises: 3b8f1c2d9a41
+Create Date: 2026-10-18 11:40:27.190354
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e2a9f0b13'
+down_revision: Union[str, None] = '3b8f1c2d9a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ingestion_jobs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('question_id', sa.UUID(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('run_after', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'uq_ingestion_jobs_queued_question', 'ingestion_jobs', ['question_id'],
+        unique=True, postgresql_where=sa.text("status = 'queued'")
+    )
+    op.create_index('ix_ingestion_jobs_status_run_after', 'ingestion_jobs', ['status', 'run_after'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ingestion_jobs_status_run_after', table_name='ingestion_jobs')
+    op.drop_index('uq_ingestion_jobs_queued_question', table_name='ingestion_jobs')
+    op.drop_table('ingestion_jobs')
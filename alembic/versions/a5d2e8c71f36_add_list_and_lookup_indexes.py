@@ -0,0 +1,48 @@
+"""Add list and lookup indexes
+
+Revision ID: a5d2e8c71f36
+Revises: 7c4e2a9f0b13
+Create Date: 2026-10-18 15:02:11.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d2e8c71f36'
+down_revision: Union[str, None] = '7c4e2a9f0b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns): keyset pagination on (timestamp, id) and the foreign key lookups
+INDEXES = [
+    ('ix_messages_chat_id_created_at_id', 'messages', ['chat_id', 'created_at', 'id']),
+    ('ix_chats_created_at_id', 'chats', ['created_at', 'id']),
+    ('ix_chats_user_id_created_at_id', 'chats', ['user_id', 'created_at', 'id']),
+    ('ix_issues_created_at_id', 'issues', ['created_at', 'id']),
+    ('ix_issues_user_id_created_at_id', 'issues', ['user_id', 'created_at', 'id']),
+    ('ix_issues_status_created_at_id', 'issues', ['status', 'created_at', 'id']),
+    ('ix_issues_chat_id_created_at_id', 'issues', ['chat_id', 'created_at', 'id']),
+    ('ix_questions_updated_at_id', 'questions', ['updated_at', 'id']),
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+    ('ix_urltrain_scraped_at_id', 'urltrain', ['scraped_at', 'id']),
+    ('ix_ingestion_jobs_question_id_created_at', 'ingestion_jobs', ['question_id', 'created_at']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY doesn't block writes but can't run inside a transaction.
+    # If a build fails it leaves an INVALID index behind: drop it and run the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
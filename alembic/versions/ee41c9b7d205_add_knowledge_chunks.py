@@ -0,0 +1,122 @@
+"""Add knowledge chunks
+
+Revision ID: ee41c9b7d205
+Revises: a5d2e8c71f36
+Create Date: 2026-10-18 17:21:46.905137
+
+"""
+import hashlib
+import json
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ee41c9b7d205'
+down_revision: Union[str, None] = 'a5d2e8c71f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+
+messages = sa.table(
+    'messages',
+    sa.column('id', sa.UUID()),
+    sa.column('knowledge', postgresql.ARRAY(sa.JSON())),
+    sa.column('knowledge_refs', postgresql.JSONB(none_as_null=True)),
+)
+knowledge_chunks = sa.table(
+    'knowledge_chunks',
+    sa.column('id', sa.String()),
+    sa.column('question_id', sa.UUID()),
+    sa.column('payload', postgresql.JSONB()),
+)
+
+
+# same as knowledge_chunk_id in app/db/repositories/knowledge.py
+def knowledge_chunk_id(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def payload_question_id(payload):
+    try:
+        return uuid.UUID(str(payload.get("id")))
+    except ValueError:
+        return None
+
+
+def batches(conn, column):
+    # messages with `column` set, BATCH_SIZE at a time in id order
+    last_id = None
+    while True:
+        stmt = sa.select(messages.c.id, column).where(column.isnot(None)).order_by(messages.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            stmt = stmt.where(messages.c.id > last_id)
+        rows = conn.execute(stmt).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.create_table(
+        'knowledge_chunks',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('question_id', sa.UUID(), nullable=True),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_knowledge_chunks_question_id'), 'knowledge_chunks', ['question_id'], unique=False)
+    op.add_column('messages', sa.Column('knowledge_refs', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+    # move the stored payloads into knowledge_chunks; the search scores weren't kept, so they are null
+    conn = op.get_bind()
+    for rows in batches(conn, messages.c.knowledge):
+        chunks = {}
+        updates = []
+        for message_id, knowledge in rows:
+            refs = []
+            for payload in knowledge:
+                chunk_id = knowledge_chunk_id(payload)
+                chunks.setdefault(chunk_id, {"id": chunk_id, "question_id": payload_question_id(payload), "payload": payload})
+                refs.append({"id": chunk_id, "score": None})
+            updates.append({"message_id": message_id, "refs": refs})
+
+        if chunks:
+            conn.execute(postgresql.insert(knowledge_chunks).values(list(chunks.values())).on_conflict_do_nothing())
+        conn.execute(
+            messages.update().where(messages.c.id == sa.bindparam("message_id")).values(knowledge_refs=sa.bindparam("refs")),
+            updates
+        )
+
+    op.drop_column('messages', 'knowledge')
+
+
+def downgrade() -> None:
+    op.add_column('messages', sa.Column('knowledge', postgresql.ARRAY(sa.JSON()), nullable=True))
+
+    conn = op.get_bind()
+    for rows in batches(conn, messages.c.knowledge_refs):
+        chunk_ids = {ref["id"] for _, refs in rows for ref in refs}
+        payloads = dict(conn.execute(
+            sa.select(knowledge_chunks.c.id, knowledge_chunks.c.payload).where(knowledge_chunks.c.id.in_(chunk_ids))
+        ).all())
+        conn.execute(
+            messages.update().where(messages.c.id == sa.bindparam("message_id")).values(knowledge=sa.bindparam("payloads")),
+            [
+                {"message_id": message_id, "payloads": [payloads[ref["id"]] for ref in refs if ref["id"] in payloads]}
+                for message_id, refs in rows
+            ]
+        )
+
+    op.drop_column('messages', 'knowledge_refs')
+    op.drop_index(op.f('ix_knowledge_chunks_question_id'), table_name='knowledge_chunks')
+    op.drop_table('knowledge_chunks')
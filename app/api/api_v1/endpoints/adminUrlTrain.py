@@ -1,20 +1,22 @@
 import httpx
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional
 import uuid
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
 
 from app.api import deps
 from app.schemas.adminUrlTrain import webUrlTrain
+from app.schemas.pagination import Page
+from app.helpers.pagination_functions import page_limit, paginate, build_page, filter_date_range
 from app.db.models.urlTrain import urltrain as urlModel
 from app.helpers.qdrant_functions import create_semantic_chunks, generate_summary, get_points_by_uuid, delete_points_by_uuid, upload_to_qdrant
 
 router = APIRouter()
 
-COLLECTION_NAME = "admin_trainer"
 local_path = "http://127.0.0.1:8001"
 deploy_path = ""
 
@@ -43,13 +45,20 @@ async def get_traininfo_by_id(url_train_id: uuid.UUID, db: Session = Depends(dep
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
-#   GET ALL URL models
+#   GET ALL URL models (recently scraped first, paginated)
 #################################################################################################
-@router.get("/", response_model=List[webUrlTrain])
-async def get_all_traininfo(db: Session = Depends(deps.get_db)):
+@router.get("/", response_model=Page[webUrlTrain])
+async def get_all_traininfo(
+    db: Session = Depends(deps.get_db),
+    cursor: Optional[str] = None, limit: int = page_limit(),
+    scraped_after: Optional[datetime] = None, scraped_before: Optional[datetime] = None
+):
     try:
-        db_urls = db.query(urlModel).order_by(urlModel.scraped_at.desc()).all()
-        return db_urls
+        stmt = filter_date_range(select(urlModel), urlModel.scraped_at, scraped_after, scraped_before)
+        db_urls = db.scalars(paginate(stmt, urlModel.scraped_at, urlModel.id, cursor, limit)).all()
+        return build_page(db_urls, "scraped_at", limit)
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
@@ -6,6 +6,7 @@ from app.schemas.auth import UserAuth, TokenData
 from fastapi.responses import RedirectResponse
 from fastapi.responses import HTMLResponse
 from app.core.supabase import supabase 
+from app.helpers.auth_functions import token_verifier
 
 from app.api import deps
 from app.schemas.questions import Question, QuestionCreate, QuestionUpdate
@@ -137,6 +138,7 @@ async def log_out(request: Request):
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
+        token_verifier.revoke(auth_header.split(" ")[1])
         supabase.auth.sign_out()
         return {"message": f"Logged Out"}
     except Exception as e:
@@ -1,267 +1,269 @@
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload, contains_eager, subqueryload
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
 
 from app.api import deps
+from app.db.session import AsyncSessionLocal
 from app.schemas.chats import Chat, ChatCreate, ChatUpdate, ChatWithMessages, ChatResponse
 from app.db.models.chats import Chat as ChatModel
-from app.db.models.messages import Message as MessageModel
 from app.schemas.messages import Message, MessageCreate
-from app.helpers.openai_functions import create_chat_completion, create_chat_completion_context
-from app.helpers.qdrant_functions import search_in_qdrant
+from app.helpers.openai_functions import create_chat_completion_async, create_chat_completion_stream, retrieve_knowledge_async
+from app.helpers.context_functions import load_conversation, conversation_history, refresh_chat_summary
+from app.helpers.stream_functions import sse_event
+from app.helpers.semantic_cache import answer_cache
+from app.helpers.collection_functions import COLLECTION_NAME
+from app.core.config import settings
+from app.db.repositories.chats import get_chat, create_chat_turn, add_chat_turn, get_chat_window, get_message_knowledge
+from app.helpers.pagination_functions import page_limit, paginate, build_page, filter_date_range, decode_cursor, window_cursors
+from app.schemas.pagination import Page
+from app.helpers.fieldset_functions import parse_field_names
 
 router = APIRouter()
 
-COLLECTION_NAME = "admin_trainer"
-
 #################################################################################################
 #   CREATE CHAT
+#   the chat and both messages are saved in one transaction once the answer is ready
 #################################################################################################
 @router.post("/", response_model = ChatResponse)
-async def create_chat(*, db: Session = Depends(deps.get_db), chat_in: ChatCreate):
+async def create_chat(*, db: AsyncSession = Depends(deps.get_async_db), chat_in: ChatCreate):
     
     try:
-        db_chat = ChatModel(
-            user_id = chat_in.user_id,
-            first_message = chat_in.first_message
-        )
-        db.add(db_chat)
-        db.commit()
-        db.refresh(db_chat)
-        
-        db_message_user = MessageModel(
-            chat_id = db_chat.id,
-            sender = "user",
-            content = db_chat.first_message
-        )
-        
-        db.add(db_message_user)
-        db.commit()
-        db.refresh(db_message_user)
-        
-        queryText = db_chat.first_message
-        
-        search_results = search_in_qdrant(COLLECTION_NAME, queryText, 10)
-        
-        combined_result = ""
-        result_list = []
-        for result in search_results:
-            # print(result.payload)
-            combined_result += f"{result.payload}"
-            result_list.append(result.payload)
-        
-        # db_full_chat = (
-        #     db.query(ChatModel)
-        #     .options(joinedload(ChatModel.messages))
-        #     .filter(ChatModel.id == db_chat.id)
-        #     .first()
-        # )
-        # if not db_full_chat:
-        #     raise HTTPException(status_code=404, detail="Chat not found")
-        
-        # print(db_full_chat)
+        queryText = chat_in.first_message
         
-        # # Sort messages by created_at
-        # db_full_chat.messages.sort(key=lambda message: message.created_at)
+        query_embedding, combined_result, result_list, cached_answer = await retrieve_knowledge_async(COLLECTION_NAME, queryText)
         
-        openai_response = create_chat_completion(queryText, combined_result)
-        # openai_response = create_chat_completion_context(queryText, db_full_chat.messages, combined_result)
+        if cached_answer:
+            openai_response = cached_answer
+        else:
+            openai_response = await create_chat_completion_async(queryText, combined_result)
+            answer_cache.store(query_embedding, openai_response, result_list)
         
-        db_message_assistant = MessageModel(
-            chat_id = db_chat.id,
-            sender = "assistant",
-            content = openai_response,
-            knowledge = result_list
-        )
-        
-        db.add(db_message_assistant)
-        db.commit()
-        db.refresh(db_message_assistant)
-        print(db_message_user.content)
-        response = ChatResponse(
-            id = db_chat.id,
-            user_id = db_chat.user_id,
-            first_message = db_chat.first_message,
-            created_at = db_chat.created_at,
-            updated_at = db_chat.updated_at,
-            query=Message(
-                id=db_message_user.id,
-                chat_id=db_message_user.chat_id,
-                sender=db_message_user.sender,
-                content=db_message_user.content,
-                knowledge=db_message_user.knowledge,
-                created_at=db_message_user.created_at,
-                updated_at=db_message_user.updated_at
-            ),
-            response=Message(
-                id=db_message_assistant.id,
-                chat_id=db_message_assistant.chat_id,
-                sender=db_message_assistant.sender,
-                content=db_message_assistant.content,
-                knowledge=db_message_assistant.knowledge,
-                created_at=db_message_assistant.created_at,
-                updated_at=db_message_assistant.updated_at
-            )
-        )
+        chat, query, response = await create_chat_turn(db, chat_in.user_id, queryText, openai_response, result_list)
         
-        return response
+        return ChatResponse(**chat, query=Message(**query), response=Message(**response))
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
 #   UPDATE CHAT 
+#   answered with the chat summary and recent turns as context, both messages of the turn are
+#   saved in one transaction once the answer is ready and the summary is refreshed afterwards
 #################################################################################################
 @router.put("/{chat_id}", response_model = ChatResponse)
-async def update_chat(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID, message_in: MessageCreate):
+async def update_chat(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID, message_in: MessageCreate, background_tasks: BackgroundTasks):
     try:
-        db_chat = db.query(ChatModel).filter(ChatModel.id == chat_id).first()
-        if not db_chat:
+        chat = await get_chat(db, chat_id)
+        if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
         queryText = message_in.content
         
-        db_message_user = MessageModel(
-            chat_id = db_chat.id,
-            sender = "user",
-            content = queryText
-        )
-        
-        db.add(db_message_user)
-        db.commit()
-        db.refresh(db_message_user)
-        
-        search_results = search_in_qdrant(COLLECTION_NAME, queryText, 10)
-        
-        combined_result = ""
-        result_list = []
-        for result in search_results:
-            # print(result.payload)
-            combined_result += f"{result.payload}"
-            result_list.append(result.payload)
-        
-        # db_full_chat = (
-        #     db.query(ChatModel)
-        #     .options(joinedload(ChatModel.messages))
-        #     .filter(ChatModel.id == db_chat.id)
-        #     .first()
-        # )
-        # if not db_full_chat:
-        #     raise HTTPException(status_code=404, detail="Chat not found")
-        
-        # print(db_full_chat)
+        conversation = await load_conversation(db, chat)
+        history = conversation_history(conversation)
         
-        # Sort messages by created_at
-        # db_full_chat.messages.sort(key=lambda message: message.created_at)
-        
-        openai_response = create_chat_completion(queryText, combined_result)
-        # openai_response = create_chat_completion_context(queryText, db_full_chat.messages, combined_result)
-        
-        
-        db_message_assistant = MessageModel(
-            chat_id = db_chat.id,
-            sender = "assistant",
-            content = openai_response,
-            knowledge = result_list
+        query_embedding, combined_result, result_list, cached_answer = await retrieve_knowledge_async(
+            COLLECTION_NAME, queryText, use_cache=not history
         )
         
-        db.add(db_message_assistant)
-        db.commit()
-        db.refresh(db_message_assistant)
-        print(db_message_user.content)
+        if cached_answer:
+            openai_response = cached_answer
+        else:
+            openai_response = await create_chat_completion_async(queryText, combined_result, history)
+            if not history:
+                answer_cache.store(query_embedding, openai_response, result_list)
         
-        response = ChatResponse(
-            id = db_chat.id,
-            user_id = db_chat.user_id,
-            first_message = db_chat.first_message,
-            created_at = db_chat.created_at,
-            updated_at = db_chat.updated_at,
-            query=Message(
-                id=db_message_user.id,
-                chat_id=db_message_user.chat_id,
-                sender=db_message_user.sender,
-                content=db_message_user.content,
-                knowledge=db_message_user.knowledge,
-                created_at=db_message_user.created_at,
-                updated_at=db_message_user.updated_at
-            ),
-            response=Message(
-                id=db_message_assistant.id,
-                chat_id=db_message_assistant.chat_id,
-                sender=db_message_assistant.sender,
-                content=db_message_assistant.content,
-                knowledge=db_message_assistant.knowledge,
-                created_at=db_message_assistant.created_at,
-                updated_at=db_message_assistant.updated_at
-            )
-        )
+        query, response = await add_chat_turn(db, chat_id, queryText, openai_response, result_list)
+        background_tasks.add_task(refresh_chat_summary, chat, conversation, [query, response])
         
-        return response
+        return ChatResponse(**chat, query=Message(**query), response=Message(**response))
     
     except HTTPException as http_exc:
         raise http_exc
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+    
+#################################################################################################
+#   Helper generator for the streaming chat endpoints
+#   sends the knowledge first, then the answer tokens, and saves the turn at the end
+#   chat is None for a new chat, which is then created for user_id
+#   history is the conversation context of a follow-up; the saved messages are added to
+#   turn_messages for the summary refresh that runs after the stream
+#################################################################################################
+async def stream_chat_turn(queryText, query_embedding, combined_result, result_list, cached_answer, chat=None, user_id=None, history=None, turn_messages=None):
+    yield sse_event("knowledge", result_list)
+    
+    tokens = []
+    if cached_answer:
+        tokens.append(cached_answer)
+        yield sse_event("token", {"content": cached_answer})
+    else:
+        try:
+            async for token in create_chat_completion_stream(queryText, combined_result, history):
+                tokens.append(token)
+                yield sse_event("token", {"content": token})
+        except HTTPException as http_exc:
+            yield sse_event("error", {"detail": http_exc.detail})
+            return
+        except Exception as e:
+            yield sse_event("error", {"detail": "Unexpected error: " + str(e)})
+            return
+        if not history:
+            answer_cache.store(query_embedding, "".join(tokens), result_list)
+    
+    # the request session is already released once streaming starts, so use a fresh one
+    async with AsyncSessionLocal() as db:
+        try:
+            if chat is None:
+                chat, query, response = await create_chat_turn(db, user_id, queryText, "".join(tokens), result_list)
+            else:
+                query, response = await add_chat_turn(db, chat["id"], queryText, "".join(tokens), result_list)
+            if turn_messages is not None:
+                turn_messages.extend([query, response])
+            
+            response = ChatResponse(**chat, query=Message(**query), response=Message(**response))
+            
+            yield sse_event("done", response.model_dump(mode="json"))
+        except SQLAlchemyError as e:
+            await db.rollback()
+            yield sse_event("error", {"detail": "Database error: " + str(e)})
+
+#################################################################################################
+#   CREATE CHAT (STREAMING)
+#################################################################################################
+@router.post("/stream")
+async def create_chat_stream(*, chat_in: ChatCreate):
+    
+    try:
+        queryText = chat_in.first_message
+        
+        query_embedding, combined_result, result_list, cached_answer = await retrieve_knowledge_async(COLLECTION_NAME, queryText)
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+    
+    return StreamingResponse(
+        stream_chat_turn(queryText, query_embedding, combined_result, result_list, cached_answer, user_id=chat_in.user_id),
+        media_type="text/event-stream"
+    )
+
+#################################################################################################
+#   UPDATE CHAT (STREAMING)
+#################################################################################################
+@router.put("/{chat_id}/stream")
+async def update_chat_stream(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID, message_in: MessageCreate):
+    try:
+        chat = await get_chat(db, chat_id)
+        if not chat:
+            raise HTTPException(status_code=404, detail="Chat not found")
+
+        queryText = message_in.content
+        
+        conversation = await load_conversation(db, chat)
+        history = conversation_history(conversation)
+        
+        query_embedding, combined_result, result_list, cached_answer = await retrieve_knowledge_async(
+            COLLECTION_NAME, queryText, use_cache=not history
+        )
+    except HTTPException as http_exc:
+        raise http_exc
+    except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
+    turn_messages = []
+    return StreamingResponse(
+        stream_chat_turn(
+            queryText, query_embedding, combined_result, result_list, cached_answer,
+            chat=chat, history=history, turn_messages=turn_messages
+        ),
+        media_type="text/event-stream",
+        background=BackgroundTask(refresh_chat_summary, chat, conversation, turn_messages)
+    )
+    
 #################################################################################################
 #   DELETE CHAT BY ID
 #################################################################################################
 @router.delete("/{chat_id}", response_model=dict)
-async def delete_chat_by_id(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID):
+async def delete_chat_by_id(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID):
     try:
-        db_chat = db.query(ChatModel).filter(ChatModel.id == chat_id).first()
+        db_chat = await db.get(ChatModel, chat_id)
         if not db_chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
-        db.delete(db_chat)
-        db.commit()
+        await db.delete(db_chat)
+        await db.commit()
         
         return {"detail": "Chat deleted successfully"}
     except HTTPException as http_exc:
         raise http_exc
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
     
 #################################################################################################
-#   GET ALL CHAT PREVIEWS FOR A USER BY USER ID
+#   GET ALL CHAT PREVIEWS FOR A USER BY USER ID (newest first, paginated)
 #################################################################################################
-@router.get("/users/{user_id}", response_model=List[Chat])
-async def get_chats_for_user(*, db: Session = Depends(deps.get_db), user_id: uuid.UUID):
+@router.get("/users/{user_id}", response_model=Page[Chat])
+async def get_chats_for_user(
+    *, db: AsyncSession = Depends(deps.get_async_db), user_id: uuid.UUID,
+    cursor: Optional[str] = None, limit: int = page_limit(),
+    created_after: Optional[datetime] = None, created_before: Optional[datetime] = None
+):
     try:
-        db_chats = db.query(ChatModel).filter(ChatModel.user_id == user_id).order_by(ChatModel.created_at.desc()).all()
-        return db_chats
+        stmt = select(ChatModel).where(ChatModel.user_id == user_id)
+        stmt = filter_date_range(stmt, ChatModel.created_at, created_after, created_before)
+        db_chats = (await db.scalars(paginate(stmt, ChatModel.created_at, ChatModel.id, cursor, limit))).all()
+        return build_page(db_chats, "created_at", limit)
+    except HTTPException as http_exc:
+        raise http_exc
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
-#   GET ALL CHAT PREVIEWS
+#   GET ALL CHAT PREVIEWS (newest first, paginated, optionally of one user)
 #################################################################################################
-@router.get("/", response_model=List[Chat])
-async def get_chats_for_user(*, db: Session = Depends(deps.get_db)):
+@router.get("/", response_model=Page[Chat])
+async def get_chats_for_user(
+    *, db: AsyncSession = Depends(deps.get_async_db),
+    cursor: Optional[str] = None, limit: int = page_limit(), user_id: Optional[uuid.UUID] = None,
+    created_after: Optional[datetime] = None, created_before: Optional[datetime] = None
+):
     try:
-        db_chats = db.query(ChatModel).order_by(ChatModel.created_at.desc()).all()
-        return db_chats
+        stmt = select(ChatModel)
+        if user_id:
+            stmt = stmt.where(ChatModel.user_id == user_id)
+        stmt = filter_date_range(stmt, ChatModel.created_at, created_after, created_before)
+        db_chats = (await db.scalars(paginate(stmt, ChatModel.created_at, ChatModel.id, cursor, limit))).all()
+        return build_page(db_chats, "created_at", limit)
+    except HTTPException as http_exc:
+        raise http_exc
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
@@ -271,9 +273,9 @@ async def get_chats_for_user(*, db: Session = Depends(deps.get_db)):
 #   UPDATE CHAT BY ID
 #################################################################################################
 @router.put("/{chat_id}", response_model=Chat)
-async def update_chat_by_id(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID, chat_in: ChatUpdate):
+async def update_chat_by_id(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID, chat_in: ChatUpdate):
     try:
-        db_chat = db.query(ChatModel).filter(ChatModel.id == chat_id).first()
+        db_chat = await db.get(ChatModel, chat_id)
         if not db_chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
@@ -281,41 +283,68 @@ async def update_chat_by_id(*, db: Session = Depends(deps.get_db), chat_id: uuid
         for key, value in update_data.items():
             setattr(db_chat, key, value)
 
-        db.commit()
-        db.refresh(db_chat)
+        await db.commit()
+        await db.refresh(db_chat)
         return db_chat
     except HTTPException as http_exc:
         raise http_exc
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
     
 #################################################################################################
-#   GET ALL MESSAGES FOR A CHAT USING CHAT_ID
+#   GET A CHAT WITH ITS MESSAGES USING CHAT_ID
+#   the latest `limit` messages, older / newer ones with the before / after cursors;
+#   the knowledge of the answers only with ?include=knowledge
 #################################################################################################
 @router.get("/{chat_id}", response_model=ChatWithMessages)
-async def get_chat_with_messages(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID):
+async def get_chat_with_messages(
+    *, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID,
+    before: Optional[str] = None, after: Optional[str] = None,
+    limit: int = Query(settings.CHAT_WINDOW_SIZE, ge=1, le=settings.PAGE_SIZE_MAX),
+    include: Optional[str] = None
+):
     try:
-        db_chat = (
-            db.query(ChatModel)
-            .options(joinedload(ChatModel.messages))
-            .filter(ChatModel.id == chat_id)
-            .first()
+        if before and after:
+            raise HTTPException(status_code=400, detail="Pass either before or after, not both")
+        
+        chat = await get_chat_window(
+            db, chat_id, limit,
+            before=decode_cursor(before) if before else None,
+            after=decode_cursor(after) if after else None,
+            knowledge="knowledge" in parse_field_names(include, ["knowledge"], "include")
         )
-        if not db_chat:
+        if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
         
-        # Sort messages by created_at
-        db_chat.messages.sort(key=lambda message: message.created_at)
-        
-        return db_chat
+        return ChatWithMessages(**chat, **window_cursors(chat))
+    except HTTPException as http_exc:
+        raise http_exc
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+
+#################################################################################################
+#   GET THE KNOWLEDGE OF A MESSAGE
+#   messages only carry references to their knowledge, this hydrates the payloads of one
+#################################################################################################
+@router.get("/{chat_id}/messages/{message_id}/knowledge", response_model=List[Dict])
+async def get_knowledge_of_message(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID, message_id: uuid.UUID):
+    try:
+        knowledge = await get_message_knowledge(db, chat_id, message_id)
+        if knowledge is None:
+            raise HTTPException(status_code=404, detail="Message not found")
+        return knowledge
+    except HTTPException as http_exc:
+        raise http_exc
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
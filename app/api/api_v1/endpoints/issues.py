@@ -1,18 +1,25 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload, subqueryload
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
 
 from app.api import deps
+from app.core.config import settings
+from app.db.repositories.chats import get_chat_around_message
 
 from app.db.models.issues import Issue as IssueModel
 from app.db.models.chats import Chat as ChatModel
 
 from app.schemas.chats import ChatWithMessages
-from app.schemas.issues import Issue, IssueCreate, IssueUpdate, IssueWithChat, IssueUpdateClient
+from app.schemas.issues import Issue, IssueCreate, IssueUpdate, IssueWithChat, IssueUpdateClient, IssueSummary, ISSUE_FIELDS, ISSUE_HEAVY_FIELDS
 from app.schemas.messages import Message
+from app.schemas.pagination import Page
+from app.helpers.pagination_functions import page_limit, paginate, build_page, filter_date_range, window_cursors
+from app.helpers.fieldset_functions import select_fields, fetch_fields, parse_field_names
 
 router = APIRouter()
 
@@ -20,7 +27,7 @@ router = APIRouter()
 #   CREATE ISSUE
 #################################################################################################
 @router.post("/", response_model = Issue)
-async def create_issue(*, db: Session = Depends(deps.get_db), issue_in: IssueCreate):
+async def create_issue(*, db: AsyncSession = Depends(deps.get_async_db), issue_in: IssueCreate):
     
     try:
         db_issue = IssueModel(
@@ -33,28 +40,28 @@ async def create_issue(*, db: Session = Depends(deps.get_db), issue_in: IssueCre
         )
         
         db.add(db_issue)
-        db.commit()
-        db.refresh(db_issue)
+        await db.commit()
+        await db.refresh(db_issue)
         
         return db_issue
     
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
 #################################################################################################
 #   UPDATE ISSUE FROM ADMIN SIDE
 #################################################################################################
 @router.put("/{issue_id}", response_model = Issue)
-async def update_issue_from_admin(*, db: Session = Depends(deps.get_db), issue_id: uuid.UUID, issue_in: IssueUpdate):
+async def update_issue_from_admin(*, db: AsyncSession = Depends(deps.get_async_db), issue_id: uuid.UUID, issue_in: IssueUpdate):
     
     try:
-        db_issue = db.query(IssueModel).filter(IssueModel.id == issue_id).first()
+        db_issue = await db.get(IssueModel, issue_id)
         
         if not db_issue:
             raise HTTPException(status_code=404, detail="Issue not found")
@@ -63,28 +70,28 @@ async def update_issue_from_admin(*, db: Session = Depends(deps.get_db), issue_i
         for key, value in update_data.items():
             setattr(db_issue, key, value)
 
-        db.commit()
-        db.refresh(db_issue)
+        await db.commit()
+        await db.refresh(db_issue)
         
         return db_issue
     
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
 #   UPDATE ISSUE FROM CLIENT SIDE
 #################################################################################################
 @router.put("/{issue_id}/user", response_model = Issue)
-async def update_issue_from_client(*, db: Session = Depends(deps.get_db), issue_id: uuid.UUID, issue_in: IssueUpdateClient):
+async def update_issue_from_client(*, db: AsyncSession = Depends(deps.get_async_db), issue_id: uuid.UUID, issue_in: IssueUpdateClient):
     
     try:
-        db_issue = db.query(IssueModel).filter(IssueModel.id == issue_id).first()
+        db_issue = await db.get(IssueModel, issue_id)
         
         if not db_issue:
             raise HTTPException(status_code=404, detail="Issue not found")
@@ -93,63 +100,86 @@ async def update_issue_from_client(*, db: Session = Depends(deps.get_db), issue_
         for key, value in update_data.items():
             setattr(db_issue, key, value)
 
-        db.commit()
-        db.refresh(db_issue)
+        await db.commit()
+        await db.refresh(db_issue)
         
         return db_issue
     
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
 #   GET ISSUES ALONG WITH RELATED CHAT WITH ISSUE ID
+#   only the reported message and `context` messages on each side of it are loaded,
+#   the rest of the chat through the before / after cursors of GET /chats/{chat_id};
+#   the knowledge of the answers only with ?include=knowledge
 #################################################################################################
 
 @router.get("/{issue_id}/chat", response_model=IssueWithChat)
-async def get_issue_with_chat(*, db: Session = Depends(deps.get_db), issue_id: uuid.UUID):
+async def get_issue_with_chat(
+    *, db: AsyncSession = Depends(deps.get_async_db), issue_id: uuid.UUID,
+    context: int = Query(settings.ISSUE_CONTEXT_MESSAGES, ge=0, le=settings.PAGE_SIZE_MAX),
+    include: Optional[str] = None
+):
     try:
-        db_issue = db.query(IssueModel).filter(IssueModel.id == issue_id).first()
+        knowledge = "knowledge" in parse_field_names(include, ["knowledge"], "include")
+
+        db_issue = await db.get(IssueModel, issue_id)
         
         if not db_issue:
             raise HTTPException(status_code=404, detail="Issue not found")
         
-        db_chat = (
-            db.query(ChatModel)
-            .options(joinedload(ChatModel.messages))
-            .filter(ChatModel.id == db_issue.chat_id)
-            .first()
-        )
-        if not db_chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
-        
-        # Sort messages by created_at
-        db_chat.messages.sort(key=lambda message: message.created_at)
-        
-        response = db_issue
-        response.chat = db_chat
+        issue = Issue.model_validate(db_issue, from_attributes=True)
+        await db.commit()
         
-        # response = IssueWithChat.model_validate(db_issue)
+        chat = await get_chat_around_message(db, issue.chat_id, issue.message_id, context, knowledge)
+        if not chat:
+            raise HTTPException(status_code=404, detail="Chat not found")
         
-        return response
+        return IssueWithChat(**issue.model_dump(), chat=ChatWithMessages(**chat, **window_cursors(chat)))
     
+    except HTTPException as http_exc:
+        raise http_exc
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
-#   GET ALL ISSUES
+#   GET ALL ISSUES (newest first, paginated, filtered by status / user / chat / date,
+#   ?fields= / ?include=message_content)
 #################################################################################################
 
-@router.get("/", response_model=List[Issue])
-async def get_all_issues(db: Session = Depends(deps.get_db)):
+@router.get("/", response_model=Page[IssueSummary], response_model_exclude_unset=True)
+async def get_all_issues(
+    db: AsyncSession = Depends(deps.get_async_db),
+    cursor: Optional[str] = None, limit: int = page_limit(),
+    status: Optional[str] = None, user_id: Optional[uuid.UUID] = None, chat_id: Optional[uuid.UUID] = None,
+    created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+    fields: Optional[str] = None, include: Optional[str] = None
+):
     try:
-        db_issues = db.query(IssueModel).order_by(IssueModel.created_at.desc()).all()
-        return db_issues
+        columns = select_fields(
+            IssueModel.__table__.c, ISSUE_FIELDS, ISSUE_HEAVY_FIELDS, fields, include, required=("id", "created_at")
+        )
+        stmt = select(*columns)
+        if status:
+            stmt = stmt.where(IssueModel.status == status)
+        if user_id:
+            stmt = stmt.where(IssueModel.user_id == user_id)
+        if chat_id:
+            stmt = stmt.where(IssueModel.chat_id == chat_id)
+        stmt = filter_date_range(stmt, IssueModel.created_at, created_after, created_before)
+        issues = await fetch_fields(db, paginate(stmt, IssueModel.created_at, IssueModel.id, cursor, limit))
+        return build_page(issues, "created_at", limit)
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
\ No newline at end of file
@@ -1,14 +1,18 @@
 from typing import List
 import uuid
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from qdrant_client.http.exceptions import ResponseHandlingException
 from app.api import deps
-from app.helpers.openai_functions import rag_query
+from app.helpers.openai_functions import rag_query_async, create_chat_completion_stream, retrieve_knowledge_async
+from app.helpers.stream_functions import sse_event
+from app.helpers.embedding_cache import embedding_cache
+from app.helpers.semantic_cache import answer_cache
+from app.helpers.auth_functions import token_verifier
+from app.helpers.collection_functions import COLLECTION_NAME
 
 from app.schemas.query import Response, Query
 
-COLLECTION_NAME = "admin_trainer"
-
 router = APIRouter()
 
 #################################################################################################
@@ -18,7 +22,7 @@ router = APIRouter()
 async def query_openai(query_in: Query):
     try:
         queryText = query_in.query
-        openai_response = rag_query(COLLECTION_NAME, queryText, 10)
+        openai_response = await rag_query_async(COLLECTION_NAME, queryText)
         
         query_response = Response(
             response = openai_response
@@ -30,3 +34,54 @@ async def query_openai(query_in: Query):
         raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+#################################################################################################
+#   Helper generator for the streaming query endpoint
+#################################################################################################
+async def stream_rag_answer(queryText, query_embedding, combined_result, result_list, cached_answer):
+    yield sse_event("knowledge", result_list)
+    
+    tokens = []
+    if cached_answer:
+        tokens.append(cached_answer)
+        yield sse_event("token", {"content": cached_answer})
+    else:
+        try:
+            async for token in create_chat_completion_stream(queryText, combined_result):
+                tokens.append(token)
+                yield sse_event("token", {"content": token})
+        except HTTPException as http_exc:
+            yield sse_event("error", {"detail": http_exc.detail})
+            return
+        except Exception as e:
+            yield sse_event("error", {"detail": f"An unexpected error occurred: {str(e)}"})
+            return
+        answer_cache.store(query_embedding, "".join(tokens), result_list)
+    
+    yield sse_event("done", Response(response = "".join(tokens)).model_dump())
+
+#################################################################################################
+#   Query the knowledge base and stream the answer as Server-Sent Events
+#################################################################################################
+@router.post("/openai/stream")
+async def query_openai_stream(query_in: Query):
+    try:
+        queryText = query_in.query
+        query_embedding, combined_result, result_list, cached_answer = await retrieve_knowledge_async(COLLECTION_NAME, queryText)
+    
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    
+    return StreamingResponse(
+        stream_rag_answer(queryText, query_embedding, combined_result, result_list, cached_answer),
+        media_type="text/event-stream"
+    )
+
+#################################################################################################
+#   Hit/miss counters of the query and auth token caches
+#################################################################################################
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {"embedding": embedding_cache.stats(), "answer": answer_cache.stats(), "auth": token_verifier.stats()}
@@ -1,27 +1,30 @@
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional
 import uuid
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
 
 from app.api import deps
-from app.schemas.questions import Question, QuestionCreate, QuestionUpdate
+from app.schemas.questions import Question, QuestionCreate, QuestionUpdate, QuestionAccepted, QuestionSummary, QUESTION_FIELDS, QUESTION_HEAVY_FIELDS
+from app.schemas.ingestionJobs import IngestionJob
 from app.db.models.questions import Question as QuestionModel
-from app.helpers.qdrant_functions import create_semantic_chunks, generate_summary, get_points_by_uuid, delete_points_by_uuid, upload_to_qdrant
+from app.helpers.ingestion_functions import enqueue_ingestion_job, get_latest_ingestion_job
+from app.helpers.pagination_functions import page_limit, paginate, build_page, filter_date_range
+from app.helpers.fieldset_functions import select_fields, fetch_fields
+from app.schemas.pagination import Page
 
 router = APIRouter()
 
-COLLECTION_NAME = "admin_trainer"
-
 #################################################################################################
 #   GET QUESTION BY ID
 #################################################################################################
 @router.get("/{question_id}", response_model=Question)
-async def get_question_by_id(question_id: uuid.UUID, db: Session = Depends(deps.get_db)):
+async def get_question_by_id(question_id: uuid.UUID, db: AsyncSession = Depends(deps.get_async_db)):
     try:
-        db_question = db.query(QuestionModel).filter(QuestionModel.id == question_id).first()
+        db_question = await db.get(QuestionModel, question_id)
         if not db_question:
             raise HTTPException(status_code=404, detail="Question not found")
         return db_question
@@ -31,21 +34,47 @@ async def get_question_by_id(question_id: uuid.UUID, db: Session = Depends(deps.
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
-#   GET ALL QUESTIONS
+#   GET INGESTION STATUS OF A QUESTION
 #################################################################################################
-@router.get("/", response_model=List[Question])
-async def get_all_questions(db: Session = Depends(deps.get_db)):
+@router.get("/{question_id}/ingestion", response_model=IngestionJob)
+async def get_question_ingestion(question_id: uuid.UUID, db: AsyncSession = Depends(deps.get_async_db)):
     try:
-        db_questions = db.query(QuestionModel).order_by(QuestionModel.updated_at.desc()).all()
-        return db_questions
+        db_job = await db.run_sync(get_latest_ingestion_job, question_id)
+        if not db_job:
+            raise HTTPException(status_code=404, detail="No ingestion job found for this question")
+        return db_job
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+
+#################################################################################################
+#   GET ALL QUESTIONS (recently updated first, paginated, ?fields= / ?include=answer)
+#################################################################################################
+@router.get("/", response_model=Page[QuestionSummary], response_model_exclude_unset=True)
+async def get_all_questions(
+    db: AsyncSession = Depends(deps.get_async_db),
+    cursor: Optional[str] = None, limit: int = page_limit(),
+    updated_after: Optional[datetime] = None, updated_before: Optional[datetime] = None,
+    fields: Optional[str] = None, include: Optional[str] = None
+):
+    try:
+        columns = select_fields(
+            QuestionModel.__table__.c, QUESTION_FIELDS, QUESTION_HEAVY_FIELDS, fields, include, required=("id", "updated_at")
+        )
+        stmt = filter_date_range(select(*columns), QuestionModel.updated_at, updated_after, updated_before)
+        questions = await fetch_fields(db, paginate(stmt, QuestionModel.updated_at, QuestionModel.id, cursor, limit))
+        return build_page(questions, "updated_at", limit)
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
 #   CREATE QUESTION
 #################################################################################################
-@router.post("/", response_model=Question)
-async def create_question(*, db: Session = Depends(deps.get_db), question_in: QuestionCreate):
+@router.post("/", response_model=QuestionAccepted, status_code=202)
+async def create_question(*, db: AsyncSession = Depends(deps.get_async_db), question_in: QuestionCreate):
     
     try:
         db_question = QuestionModel(
@@ -55,32 +84,43 @@ async def create_question(*, db: Session = Depends(deps.get_db), question_in: Qu
         )
         
         db.add(db_question)
-        db.commit()
-        db.refresh(db_question)
+        await db.flush()
         
+        job_id = None
         if db_question.answer:
-            semantic_chunks = create_semantic_chunks(db_question.answer)
-            summaries = generate_summary(semantic_chunks, db_question)
-            upload_to_qdrant(db_question, semantic_chunks, summaries, COLLECTION_NAME)
+            # commits the question and its job together
+            job = await db.run_sync(enqueue_ingestion_job, db_question.id, "index")
+            job_id = job.id
+        else:
+            await db.commit()
+        await db.refresh(db_question)
         
-        return db_question
+        return QuestionAccepted(
+            id=db_question.id,
+            question=db_question.question,
+            answer=db_question.answer,
+            url=db_question.url,
+            created_at=db_question.created_at,
+            updated_at=db_question.updated_at,
+            job_id=job_id
+        )
     
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
 #################################################################################################
 #   UPDATE QUESTION BY ID
 #################################################################################################
-@router.put("/{question_id}", response_model=Question)
-async def update_question_by_id(*, db: Session = Depends(deps.get_db), question_id: uuid.UUID, question_in: QuestionUpdate):
+@router.put("/{question_id}", response_model=QuestionAccepted, status_code=202)
+async def update_question_by_id(*, db: AsyncSession = Depends(deps.get_async_db), question_id: uuid.UUID, question_in: QuestionUpdate):
     try:
-        db_question = db.query(QuestionModel).filter(QuestionModel.id == question_id).first()
+        db_question = await db.get(QuestionModel, question_id)
         if not db_question:
             raise HTTPException(status_code=404, detail="Question not found")
 
@@ -88,67 +128,54 @@ async def update_question_by_id(*, db: Session = Depends(deps.get_db), question_
         for key, value in update_data.items():
             setattr(db_question, key, value)
 
-        db.commit()
-        db.refresh(db_question)
-        
-        ids = get_points_by_uuid(COLLECTION_NAME, str(question_id))
-        print(len(ids))
-        
-        if len(ids) != 0:
-            success = delete_points_by_uuid(COLLECTION_NAME, str(question_id))
-            
-            if not success:
-                raise HTTPException(status_code=500, detail="Failed to delete question from vectorDB")
+        # commits the update and its job together
+        job = await db.run_sync(enqueue_ingestion_job, db_question.id, "index")
+        await db.refresh(db_question)
         
-        if db_question.answer:
-            semantic_chunks = create_semantic_chunks(db_question.answer)
-            summaries = generate_summary(semantic_chunks, db_question)
-            upload_to_qdrant(db_question, semantic_chunks, summaries, COLLECTION_NAME)
-        
-        return db_question
+        return QuestionAccepted(
+            id=db_question.id,
+            question=db_question.question,
+            answer=db_question.answer,
+            url=db_question.url,
+            created_at=db_question.created_at,
+            updated_at=db_question.updated_at,
+            job_id=job.id
+        )
     except HTTPException as http_exc:
-        db.rollback()
+        await db.rollback()
         raise http_exc
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
 #   DELETE QUESTION BY ID FROM DB AND QDRANT
 #################################################################################################
-@router.delete("/{question_id}", response_model=dict)
-async def delete_question_by_id(*, db: Session = Depends(deps.get_db), question_id: uuid.UUID):
+@router.delete("/{question_id}", response_model=dict, status_code=202)
+async def delete_question_by_id(*, db: AsyncSession = Depends(deps.get_async_db), question_id: uuid.UUID):
     try:
-        db_question = db.query(QuestionModel).filter(QuestionModel.id == question_id).first()
+        db_question = await db.get(QuestionModel, question_id)
         if not db_question:
             raise HTTPException(status_code=404, detail="Question not found")
 
-        db.delete(db_question)
-        db.commit()
-        
-        try:
-            success = delete_points_by_uuid(COLLECTION_NAME, str(question_id))
-            
-            if success:
-                return {"detail": f"Question with ID {question_id} deleted from DB & vectorDB successfully"}
-            else:
-                raise HTTPException(status_code=500, detail="Failed to delete question from vectorDB")
+        # the delete and the job that removes the points are committed together
+        await db.delete(db_question)
+        job = await db.run_sync(enqueue_ingestion_job, question_id, "delete")
         
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An error occurred while deleting from vectorDB: {str(e)}")
+        return {"detail": f"Question with ID {question_id} deleted from DB, vectorDB deletion queued", "job_id": str(job.id)}
         
     except HTTPException as http_exc:
-        db.rollback()
+        await db.rollback()
         raise http_exc
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
\ No newline at end of file
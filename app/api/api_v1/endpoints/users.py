@@ -1,25 +1,30 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 import uuid
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
 
 from app.api import deps
-from app.schemas.users import User, UserCreate, UserUpdate
+from app.schemas.users import User, UserCreate, UserUpdate, UserSummary, USER_FIELDS
 from app.db.models.users import User as UserModel
 from app.db.models.issues import Issue as IssueModel
-from app.schemas.issues import Issue, IssueUpdateClient
+from app.schemas.issues import Issue, IssueUpdateClient, IssueSummary, ISSUE_FIELDS, ISSUE_HEAVY_FIELDS
+from app.schemas.pagination import Page
+from app.helpers.pagination_functions import page_limit, paginate, build_page, filter_date_range
+from app.helpers.fieldset_functions import select_fields, fetch_fields
 router = APIRouter()
 
 #################################################################################################
 #   GET USER BY ID
 #################################################################################################
 @router.get("/{user_id}", response_model=User)
-async def get_user_by_email(user_id: uuid.UUID, db: Session = Depends(deps.get_db)):
+async def get_user_by_email(user_id: uuid.UUID, db: AsyncSession = Depends(deps.get_async_db)):
     
     try:
-        db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        db_user = await db.get(UserModel, user_id)
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
         return db_user
@@ -32,10 +37,10 @@ async def get_user_by_email(user_id: uuid.UUID, db: Session = Depends(deps.get_d
 #   GET USER BY EMAIL
 #################################################################################################
 @router.get("/email/{email}", response_model=User)
-async def check_user_by_email(email: str, db: Session = Depends(deps.get_db)):
+async def check_user_by_email(email: str, db: AsyncSession = Depends(deps.get_async_db)):
     
     try:
-        db_user = db.query(UserModel).filter(UserModel.email == email).first()
+        db_user = (await db.scalars(select(UserModel).where(UserModel.email == email))).first()
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
         return db_user
@@ -45,16 +50,23 @@ async def check_user_by_email(email: str, db: Session = Depends(deps.get_db)):
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
-#   GET ALL USERS
+#   GET ALL USERS (newest first, paginated, ?fields=)
 #################################################################################################
-@router.get("/", response_model=List[User])
-async def get_user_by_email(db: Session = Depends(deps.get_db)):
+@router.get("/", response_model=Page[UserSummary], response_model_exclude_unset=True)
+async def get_user_by_email(
+    db: AsyncSession = Depends(deps.get_async_db),
+    cursor: Optional[str] = None, limit: int = page_limit(),
+    created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+    fields: Optional[str] = None
+):
     
     try:
-        db_users = db.query(UserModel).order_by(UserModel.created_at.desc()).all()
-        if not db_users:
+        columns = select_fields(UserModel.__table__.c, USER_FIELDS, [], fields, required=("id", "created_at"))
+        stmt = filter_date_range(select(*columns), UserModel.created_at, created_after, created_before)
+        db_users = await fetch_fields(db, paginate(stmt, UserModel.created_at, UserModel.id, cursor, limit))
+        if not db_users and not cursor:
             raise HTTPException(status_code=404, detail="User not found")
-        return db_users
+        return build_page(db_users, "created_at", limit)
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -64,7 +76,7 @@ async def get_user_by_email(db: Session = Depends(deps.get_db)):
 #   CREATE USER
 #################################################################################################
 @router.post("/", response_model=User)
-async def create_user(*, db: Session = Depends(deps.get_db), user_in: UserCreate):
+async def create_user(*, db: AsyncSession = Depends(deps.get_async_db), user_in: UserCreate):
     
     try:
         db_user = UserModel(
@@ -75,26 +87,26 @@ async def create_user(*, db: Session = Depends(deps.get_db), user_in: UserCreate
             interest = user_in.interest
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
 #   CREATE USER IF DOES NOT EXIST
 #################################################################################################
 @router.post("/{email}/exists", response_model=User)
-async def create_user(*, db: Session = Depends(deps.get_db), user_in: UserCreate, email: str,):
+async def create_user(*, db: AsyncSession = Depends(deps.get_async_db), user_in: UserCreate, email: str,):
     
     try:
-        db_user = db.query(UserModel).filter(UserModel.email == email).first()
+        db_user = (await db.scalars(select(UserModel).where(UserModel.email == email))).first()
         if not db_user:
             db_user = UserModel(
                 name = user_in.name,
@@ -104,26 +116,26 @@ async def create_user(*, db: Session = Depends(deps.get_db), user_in: UserCreate
                 interest = user_in.interest
             )
             db.add(db_user)
-            db.commit()
-            db.refresh(db_user)
+            await db.commit()
+            await db.refresh(db_user)
         return db_user
     
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
 #   UPDATE USER BY ID
 #################################################################################################
 @router.put("/{user_id}", response_model=User)
-async def update_user_by_id(*, db: Session = Depends(deps.get_db), user_id: uuid.UUID, user_in: UserUpdate):
+async def update_user_by_id(*, db: AsyncSession = Depends(deps.get_async_db), user_id: uuid.UUID, user_in: UserUpdate):
     try:
-        db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        db_user = await db.get(UserModel, user_id)
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -131,8 +143,8 @@ async def update_user_by_id(*, db: Session = Depends(deps.get_db), user_id: uuid
         for key, value in update_data.items():
             setattr(db_user, key, value)
 
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         
         return db_user
     except HTTPException as http_exc:
@@ -140,21 +152,35 @@ async def update_user_by_id(*, db: Session = Depends(deps.get_db), user_id: uuid
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
     
 #################################################################################################
-#   GET ALL ISSUES BY USER ID
+#   GET ALL ISSUES BY USER ID (newest first, paginated, ?fields= / ?include=message_content)
 #################################################################################################
 
-@router.get("/{user_id}/issues", response_model=List[Issue])
-async def get_all_issues(*,db: Session = Depends(deps.get_db), user_id: uuid.UUID):
+@router.get("/{user_id}/issues", response_model=Page[IssueSummary], response_model_exclude_unset=True)
+async def get_all_issues(
+    *,db: AsyncSession = Depends(deps.get_async_db), user_id: uuid.UUID,
+    cursor: Optional[str] = None, limit: int = page_limit(), status: Optional[str] = None,
+    created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+    fields: Optional[str] = None, include: Optional[str] = None
+):
     try:
-        db_issues = db.query(IssueModel).filter(IssueModel.user_id==user_id).order_by(IssueModel.created_at.desc()).all()
-        return db_issues
+        columns = select_fields(
+            IssueModel.__table__.c, ISSUE_FIELDS, ISSUE_HEAVY_FIELDS, fields, include, required=("id", "created_at")
+        )
+        stmt = select(*columns).where(IssueModel.user_id==user_id)
+        if status:
+            stmt = stmt.where(IssueModel.status == status)
+        stmt = filter_date_range(stmt, IssueModel.created_at, created_after, created_before)
+        issues = await fetch_fields(db, paginate(stmt, IssueModel.created_at, IssueModel.id, cursor, limit))
+        return build_page(issues, "created_at", limit)
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
\ No newline at end of file
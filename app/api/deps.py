@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, AsyncSessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -7,4 +7,7 @@ def get_db():
         yield db
     finally:
         db.close()
-        
\ No newline at end of file
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
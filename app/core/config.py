@@ -1,18 +1,142 @@
 from pydantic_settings import BaseSettings
 from pydantic import PostgresDsn
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()  
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # connection pools of the sync and async engines (per worker, each engine has its own pool)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT: int = int(os.getenv("DB_STATEMENT_TIMEOUT", 30000))  # milliseconds
+    # set when DATABASE_URL points at pgbouncer / the supabase pooler in transaction mode; the
+    # statement timeout is then not sent per connection but set on the role (ALTER ROLE, see README)
+    DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
     SUPABASE_URL: str = os.getenv("SUPABASE_URL")
     SUPABASE_ANON_KEY:str = os.getenv("SUPABASE_ANON_KEY")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
     QDRANT_HOST: str = os.getenv("QDRANT_HOST")
     QDRANT_API_KEY: str = os.getenv("QDRANT_API_KEY")
 
+    # keyset pagination of the list endpoints
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", 50))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", 200))
+    # messages loaded when a chat is opened, and around the reported message of an issue (each side)
+    CHAT_WINDOW_SIZE: int = int(os.getenv("CHAT_WINDOW_SIZE", 50))
+    ISSUE_CONTEXT_MESSAGES: int = int(os.getenv("ISSUE_CONTEXT_MESSAGES", 10))
 
+    # local verification of supabase access tokens: HS256 with the project JWT secret and/or
+    # asymmetric keys from the JWKS endpoint; without either every token is checked remotely
+    SUPABASE_JWT_SECRET: Optional[str] = os.getenv("SUPABASE_JWT_SECRET")
+    SUPABASE_JWKS_URL: Optional[str] = os.getenv("SUPABASE_JWKS_URL")
+    SUPABASE_JWT_AUDIENCE: str = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+    AUTH_LEEWAY: int = int(os.getenv("AUTH_LEEWAY", 10))
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+    # also ask supabase on revocation-sensitive routes (admin writes, logout)
+    AUTH_REMOTE_CHECK: bool = os.getenv("AUTH_REMOTE_CHECK", "true").lower() == "true"
 
+    # connection pools of the shared async clients (per worker)
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20))
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", 60))
+    QDRANT_MAX_CONNECTIONS: int = int(os.getenv("QDRANT_MAX_CONNECTIONS", 100))
+    QDRANT_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("QDRANT_MAX_KEEPALIVE_CONNECTIONS", 20))
+    QDRANT_TIMEOUT: int = int(os.getenv("QDRANT_TIMEOUT", 30))
 
-settings = Settings()
\ No newline at end of file
+    # query embedding cache (in memory, optionally backed by the embedding_cache table)
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", 2048))
+    EMBEDDING_CACHE_TTL: int = int(os.getenv("EMBEDDING_CACHE_TTL", 86400))
+    EMBEDDING_CACHE_PERSIST: bool = os.getenv("EMBEDDING_CACHE_PERSIST", "false").lower() == "true"
+    # entries of the chunker's sentence embedding cache (same TTL and table)
+    SENTENCE_EMBEDDING_CACHE_SIZE: int = int(os.getenv("SENTENCE_EMBEDDING_CACHE_SIZE", 4096))
+
+    # semantic answer cache for the RAG endpoints (opt-in)
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", 1024))
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+    SEMANTIC_CACHE_TTL: int = int(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+
+    # embedding provider: openai (EMBEDDING_MODEL) or local (hashed n-grams, offline)
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "openai")
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    EMBEDDING_DIMENSION: Optional[int] = int(os.getenv("EMBEDDING_DIMENSION")) if os.getenv("EMBEDDING_DIMENSION") else None
+
+    # ingestion batching (OpenAI allows 2048 inputs and ~300k tokens per embeddings request)
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 512))
+    EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 250000))
+    QDRANT_UPSERT_BATCH_SIZE: int = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", 256))
+    QDRANT_UPSERT_WAIT: bool = os.getenv("QDRANT_UPSERT_WAIT", "true").lower() == "true"
+
+    # chunk summarization: sequential, concurrent or batched (one JSON completion per question)
+    SUMMARY_MODE: str = os.getenv("SUMMARY_MODE", "concurrent")
+    SUMMARY_CONCURRENCY: int = int(os.getenv("SUMMARY_CONCURRENCY", 8))
+
+    # background ingestion jobs (0 workers: run them with `python -m app.worker` instead)
+    INGESTION_WORKERS: int = int(os.getenv("INGESTION_WORKERS", 1))
+    INGESTION_MAX_ATTEMPTS: int = int(os.getenv("INGESTION_MAX_ATTEMPTS", 3))
+    INGESTION_RETRY_BACKOFF: int = int(os.getenv("INGESTION_RETRY_BACKOFF", 10))
+    INGESTION_POLL_INTERVAL: float = float(os.getenv("INGESTION_POLL_INTERVAL", 5))
+    INGESTION_JOB_TIMEOUT: int = int(os.getenv("INGESTION_JOB_TIMEOUT", 600))
+    # running jobs refresh their updated_at this often, so only jobs of dead workers time out
+    INGESTION_HEARTBEAT_INTERVAL: float = float(os.getenv("INGESTION_HEARTBEAT_INTERVAL", 30))
+
+    # semantic chunker (threshold type: percentile, standard_deviation or interquartile)
+    CHUNKER_THRESHOLD_TYPE: str = os.getenv("CHUNKER_THRESHOLD_TYPE", "percentile")
+    CHUNKER_THRESHOLD_AMOUNT: Optional[float] = float(os.getenv("CHUNKER_THRESHOLD_AMOUNT")) if os.getenv("CHUNKER_THRESHOLD_AMOUNT") else None
+    CHUNKER_BUFFER_SIZE: int = int(os.getenv("CHUNKER_BUFFER_SIZE", 1))
+    # use chunk vectors pooled from the chunker's sentence embeddings instead of a second embedding pass
+    CHUNK_VECTORS_FROM_SENTENCES: bool = os.getenv("CHUNK_VECTORS_FROM_SENTENCES", "false").lower() == "true"
+
+    # token counting (tiktoken encoding of this model, ~4 characters per token if it can't be loaded)
+    TOKENIZER_MODEL: str = os.getenv("TOKENIZER_MODEL", "gpt-4o")
+    # conversation context of follow-ups: the recent turns within CHAT_CONTEXT_TOKENS, older turns
+    # folded into a rolling per-chat summary of about CHAT_SUMMARY_TOKENS
+    CHAT_CONTEXT_TOKENS: int = int(os.getenv("CHAT_CONTEXT_TOKENS", 2000))
+    CHAT_CONTEXT_MAX_MESSAGES: int = int(os.getenv("CHAT_CONTEXT_MAX_MESSAGES", 40))
+    CHAT_SUMMARY_TOKENS: int = int(os.getenv("CHAT_SUMMARY_TOKENS", 400))
+    CHAT_SUMMARY_MODEL: str = os.getenv("CHAT_SUMMARY_MODEL", "gpt-3.5-turbo-0125")
+
+    # knowledge base context of the RAG prompts: hits fetched per query, token budget of the
+    # rendered context, score cutoff (absolute and relative to the best hit) and the word-shingle
+    # jaccard similarity above which a chunk counts as a duplicate of a better one
+    KNOWLEDGE_CANDIDATES: int = int(os.getenv("KNOWLEDGE_CANDIDATES", 20))
+    KNOWLEDGE_CONTEXT_TOKENS: int = int(os.getenv("KNOWLEDGE_CONTEXT_TOKENS", 1500))
+    KNOWLEDGE_MIN_SCORE: float = float(os.getenv("KNOWLEDGE_MIN_SCORE", 0))
+    KNOWLEDGE_SCORE_RATIO: float = float(os.getenv("KNOWLEDGE_SCORE_RATIO", 0.7))
+    KNOWLEDGE_DUPLICATE_THRESHOLD: float = float(os.getenv("KNOWLEDGE_DUPLICATE_THRESHOLD", 0.8))
+
+    # search mode: dense (the "content" vector) or hybrid (dense + BM25 sparse "text" vector, fused
+    # with RRF). SPARSE_VECTORS writes the sparse vectors at ingestion and needs the collection to
+    # declare "text" with the IDF modifier; turn it on and re-index before switching to hybrid
+    SEARCH_MODE: str = os.getenv("SEARCH_MODE", "dense")
+    SPARSE_VECTORS: bool = os.getenv("SPARSE_VECTORS", "false").lower() == "true"
+    HYBRID_PREFETCH_LIMIT: int = int(os.getenv("HYBRID_PREFETCH_LIMIT", 40))
+    BM25_K1: float = float(os.getenv("BM25_K1", 1.2))
+    BM25_B: float = float(os.getenv("BM25_B", 0.75))
+    BM25_AVG_DOC_LENGTH: float = float(os.getenv("BM25_AVG_DOC_LENGTH", 128))
+    # MMR reranking of the search results: candidates fetched, relevance / diversity trade-off
+    # (1 = relevance only)
+    MMR_ENABLED: bool = os.getenv("MMR_ENABLED", "false").lower() == "true"
+    MMR_FETCH_LIMIT: int = int(os.getenv("MMR_FETCH_LIMIT", 50))
+    MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", 0.7))
+
+    # knowledge base collection (see helpers/collection_functions.py), applied with
+    # `python -m app.manage_qdrant ensure`; QDRANT_DEFAULT_SEGMENT_NUMBER 0 lets Qdrant pick
+    QDRANT_HNSW_M: int = int(os.getenv("QDRANT_HNSW_M", 16))
+    QDRANT_HNSW_EF_CONSTRUCT: int = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", 100))
+    QDRANT_VECTORS_ON_DISK: bool = os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() == "true"
+    QDRANT_ON_DISK_PAYLOAD: bool = os.getenv("QDRANT_ON_DISK_PAYLOAD", "true").lower() == "true"
+    QDRANT_INDEXING_THRESHOLD: int = int(os.getenv("QDRANT_INDEXING_THRESHOLD", 20000))
+    QDRANT_DEFAULT_SEGMENT_NUMBER: int = int(os.getenv("QDRANT_DEFAULT_SEGMENT_NUMBER", 0))
+    # page size of the filtered scrolls over the points of a question
+    QDRANT_SCROLL_PAGE_SIZE: int = int(os.getenv("QDRANT_SCROLL_PAGE_SIZE", 1000))
+
+
+
+
+settings = Settings()
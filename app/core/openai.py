@@ -1,4 +1,18 @@
+import httpx
 import openai
 from app.core.config import settings
 
-openaiClient = openai.Client(api_key = settings.OPENAI_API_KEY)
\ No newline at end of file
+openaiClient = openai.Client(api_key = settings.OPENAI_API_KEY)
+
+# shared, pooled client for the async request path
+asyncOpenaiClient = openai.AsyncClient(
+    api_key = settings.OPENAI_API_KEY,
+    timeout = settings.OPENAI_TIMEOUT,
+    http_client = openai.DefaultAsyncHttpxClient(
+        limits = httpx.Limits(
+            max_connections = settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections = settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout = settings.OPENAI_TIMEOUT
+    )
+)
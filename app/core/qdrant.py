@@ -1,5 +1,17 @@
+import httpx
 import qdrant_client
 from qdrant_client import QdrantClient
 from app.core.config import settings
 
-qdrantClient = qdrant_client.QdrantClient(settings.QDRANT_HOST, api_key = settings.QDRANT_API_KEY)
\ No newline at end of file
+qdrantClient = qdrant_client.QdrantClient(settings.QDRANT_HOST, api_key = settings.QDRANT_API_KEY)
+
+# shared, pooled client for the async request path
+asyncQdrantClient = qdrant_client.AsyncQdrantClient(
+    settings.QDRANT_HOST,
+    api_key = settings.QDRANT_API_KEY,
+    timeout = settings.QDRANT_TIMEOUT,
+    limits = httpx.Limits(
+        max_connections = settings.QDRANT_MAX_CONNECTIONS,
+        max_keepalive_connections = settings.QDRANT_MAX_KEEPALIVE_CONNECTIONS
+    )
+)
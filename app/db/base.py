@@ -7,4 +7,7 @@ from app.db.models.chats import Chat
 from app.db.models.messages import Message
 from app.db.models.domains import Domain
 from app.db.models.issues import Issue
-from app.db.models.urlTrain import urltrain
\ No newline at end of file
+from app.db.models.urlTrain import urltrain
+from app.db.models.embeddingCache import EmbeddingCache
+from app.db.models.ingestionJobs import IngestionJob
+from app.db.models.knowledgeChunks import KnowledgeChunk
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import UUID, Column, String, DateTime, ForeignKey, ARRAY
+from sqlalchemy import UUID, Column, String, DateTime, ForeignKey, ARRAY, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -12,6 +12,12 @@ class Chat(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     first_message = Column(String, nullable=False)
     
+    # rolling summary of the turns that no longer fit the conversation context, and the
+    # (created_at, id) key of the last message folded into it
+    summary = Column(String, nullable=True)
+    summary_until = Column(DateTime, nullable=True)
+    summary_until_id = Column(UUID(as_uuid=True), nullable=True)
+    
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
@@ -20,4 +26,10 @@ class Chat(Base):
     # messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
     
     # many-to-one
-    user = relationship("User", back_populates="chats")
\ No newline at end of file
+    user = relationship("User", back_populates="chats")
+    
+    __table_args__ = (
+        # keyset pagination of all chats and of the chats of a user, newest first
+        Index("ix_chats_created_at_id", "created_at", "id"),
+        Index("ix_chats_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
\ No newline at end of file
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    
+    key = Column(String, primary_key=True)  # sha256 of model + normalized text
+    model = Column(String, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # float32 bytes
+    
+    created_at = Column(DateTime, server_default=func.now())
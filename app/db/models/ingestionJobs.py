@@ -0,0 +1,28 @@
+import uuid
+from sqlalchemy import UUID, Column, String, DateTime, Integer, Index, text
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    question_id = Column(UUID(as_uuid=True), nullable=False)  # no FK, delete jobs outlive the question
+    
+    action = Column(String, nullable=False)  # index, delete
+    status = Column(String, nullable=False)  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    run_after = Column(DateTime, server_default=func.now())
+    
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        # at most one queued job per question, so rapid edits coalesce into it
+        Index("uq_ingestion_jobs_queued_question", "question_id", unique=True, postgresql_where=text("status = 'queued'")),
+        Index("ix_ingestion_jobs_status_run_after", "status", "run_after"),
+        # latest job of a question
+        Index("ix_ingestion_jobs_question_id_created_at", "question_id", "created_at"),
+    )
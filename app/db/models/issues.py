@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import UUID, Column, ForeignKey, String, DateTime
+from sqlalchemy import UUID, Column, ForeignKey, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
@@ -20,4 +20,12 @@ class Issue(Base):
     
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        # keyset pagination of issues, unfiltered and filtered by user / status / chat
+        Index("ix_issues_created_at_id", "created_at", "id"),
+        Index("ix_issues_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_issues_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_issues_chat_id_created_at_id", "chat_id", "created_at", "id"),
+    )
     
\ No newline at end of file
@@ -0,0 +1,14 @@
+from sqlalchemy import UUID, Column, String, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+
+class KnowledgeChunk(Base):
+    __tablename__ = "knowledge_chunks"
+    
+    id = Column(String, primary_key=True)  # sha256 of the canonical JSON of the payload
+    question_id = Column(UUID(as_uuid=True), nullable=True, index=True)  # no FK, snapshots outlive the question
+    payload = Column(JSONB, nullable=False)  # qdrant payload of the chunk when it was retrieved
+    
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import JSON, UUID, Column, String, DateTime, ForeignKey, ARRAY
+from sqlalchemy import JSON, UUID, Column, String, DateTime, ForeignKey, ARRAY, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -13,10 +13,16 @@ class Message(Base):
     
     sender = Column(String, nullable=False)
     content = Column(String, nullable=False)
-    knowledge = Column(ARRAY(JSON), nullable=True)
+    # [{"id": knowledge chunk id, "score": search score}] of the retrieved knowledge, in order
+    knowledge_refs = Column(JSONB(none_as_null=True), nullable=True)
     
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     # many-to-one
-    chat = relationship("Chat", back_populates="messages")
\ No newline at end of file
+    chat = relationship("Chat", back_populates="messages")
+    
+    __table_args__ = (
+        # messages of a chat in order
+        Index("ix_messages_chat_id_created_at_id", "chat_id", "created_at", "id"),
+    )
\ No newline at end of file
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import UUID, Column, String, DateTime
+from sqlalchemy import UUID, Column, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
@@ -14,4 +14,8 @@ class Question(Base):
     
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_questions_updated_at_id", "updated_at", "id"),
+    )
     
\ No newline at end of file
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import UUID, Column, String, DateTime
+from sqlalchemy import UUID, Column, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
@@ -9,4 +9,8 @@ class urltrain(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     url = Column(String, nullable=False, unique=True)
     scraped_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_urltrain_scraped_at_id", "scraped_at", "id"),
+    )
     
\ No newline at end of file
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, ARRAY, TIMESTAMP, UUID
+from sqlalchemy import Column, String, ARRAY, TIMESTAMP, UUID, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
@@ -18,4 +18,8 @@ class User(Base):
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     
     # one-to-many
-    chats = relationship("Chat", back_populates="user")
\ No newline at end of file
+    chats = relationship("Chat", back_populates="user")
+    
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
\ No newline at end of file
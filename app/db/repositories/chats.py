@@ -0,0 +1,253 @@
+import uuid
+
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.sql import func
+
+from app.db.models.chats import Chat as ChatModel
+from app.db.models.messages import Message as MessageModel
+from app.db.repositories.knowledge import store_knowledge, hydrate_knowledge, hydrate_messages
+
+CHAT_COLUMNS = ChatModel.__table__.c
+MESSAGE_COLUMNS = MessageModel.__table__.c
+
+
+#################################################################################################
+#   Chat turn repository
+#   a turn (optional new chat, user message, assistant message) is written in one transaction
+#   and the rows come back through RETURNING, so no refresh SELECT is needed afterwards.
+#   Rows are returned as dicts that the Chat / Message schemas can be built from directly.
+#   The retrieved knowledge goes to knowledge_chunks (see repositories/knowledge.py), the
+#   assistant message only references it.
+#################################################################################################
+
+#################################################################################################
+#   Helper function to get a chat without keeping a transaction (and connection) open
+#   input: async db session, chat id, output: chat row or None
+#################################################################################################
+async def get_chat(db, chat_id):
+    async with db.begin():
+        result = await db.execute(select(*CHAT_COLUMNS).where(CHAT_COLUMNS.id == chat_id))
+        row = result.mappings().first()
+    return dict(row) if row else None
+
+def message_values(chat_id, query_content, answer, knowledge_refs):
+    # clock_timestamp keeps the user message ahead of the answer, now() is the same for the whole transaction
+    return [
+        {
+            "chat_id": chat_id,
+            "sender": "user",
+            "content": query_content,
+            "knowledge_refs": None,
+            "created_at": func.clock_timestamp(),
+            "updated_at": func.clock_timestamp(),
+        },
+        {
+            "chat_id": chat_id,
+            "sender": "assistant",
+            "content": answer,
+            "knowledge_refs": knowledge_refs,
+            "created_at": func.clock_timestamp(),
+            "updated_at": func.clock_timestamp(),
+        },
+    ]
+
+async def insert_messages(db, chat_id, query_content, answer, knowledge):
+    knowledge_refs = await store_knowledge(db, knowledge)
+    result = await db.execute(
+        insert(MessageModel.__table__)
+        .values(message_values(chat_id, query_content, answer, knowledge_refs))
+        .returning(*MESSAGE_COLUMNS)
+    )
+    rows = {row["sender"]: dict(row) for row in result.mappings()}
+    # the answer is returned with its knowledge, no need to read it back
+    rows["assistant"]["knowledge"] = knowledge
+    return rows["user"], rows["assistant"]
+
+#################################################################################################
+#   Helper function to create a chat together with its first turn
+#   input: async db session, user id, first message, answer, knowledge
+#   output: (chat row, user message row, assistant message row)
+#################################################################################################
+async def create_chat_turn(db, user_id, first_message, answer, knowledge):
+    chat_id = uuid.uuid4()
+    async with db.begin():
+        result = await db.execute(
+            insert(ChatModel.__table__)
+            .values(id=chat_id, user_id=user_id, first_message=first_message)
+            .returning(*CHAT_COLUMNS)
+        )
+        chat = dict(result.mappings().one())
+        user_message, assistant_message = await insert_messages(db, chat_id, first_message, answer, knowledge)
+    return chat, user_message, assistant_message
+
+#################################################################################################
+#   Helper function to add a turn to an existing chat
+#   input: async db session, chat id, user message, answer, knowledge
+#   output: (user message row, assistant message row)
+#################################################################################################
+async def add_chat_turn(db, chat_id, query_content, answer, knowledge):
+    async with db.begin():
+        return await insert_messages(db, chat_id, query_content, answer, knowledge)
+
+#################################################################################################
+#   Windowed message loading
+#   messages are read in (created_at, id) order straight off ix_messages_chat_id_created_at_id,
+#   a window at a time, so opening a long chat costs the same as opening a short one.
+#   A window is {"messages": oldest first, "before": key of the first message if older messages
+#   exist, "after": key of the last message if newer messages exist}; keys are (created_at, id).
+#   Messages carry their knowledge references; the payloads are only hydrated when asked for.
+#################################################################################################
+def message_key(message):
+    return message["created_at"], message["id"]
+
+async def older_messages(db, chat_id, key, limit):
+    # the newest `limit` messages before key (the newest of the chat without a key), oldest first
+    stmt = select(*MESSAGE_COLUMNS).where(MESSAGE_COLUMNS.chat_id == chat_id)
+    if key:
+        stmt = stmt.where(tuple_(MESSAGE_COLUMNS.created_at, MESSAGE_COLUMNS.id) < tuple_(*key))
+    stmt = stmt.order_by(MESSAGE_COLUMNS.created_at.desc(), MESSAGE_COLUMNS.id.desc()).limit(limit + 1)
+    rows = [dict(row) for row in (await db.execute(stmt)).mappings()]
+    return rows[:limit][::-1], len(rows) > limit
+
+async def newer_messages(db, chat_id, key, limit, inclusive=False):
+    # the oldest `limit` messages after key (from key on when inclusive), oldest first
+    stmt = select(*MESSAGE_COLUMNS).where(MESSAGE_COLUMNS.chat_id == chat_id)
+    message_order = tuple_(MESSAGE_COLUMNS.created_at, MESSAGE_COLUMNS.id)
+    stmt = stmt.where(message_order >= tuple_(*key) if inclusive else message_order > tuple_(*key))
+    stmt = stmt.order_by(MESSAGE_COLUMNS.created_at.asc(), MESSAGE_COLUMNS.id.asc()).limit(limit + 1)
+    rows = [dict(row) for row in (await db.execute(stmt)).mappings()]
+    return rows[:limit], len(rows) > limit
+
+def message_window(messages, has_older, has_newer):
+    return {
+        "messages": messages,
+        "before": message_key(messages[0]) if messages and has_older else None,
+        "after": message_key(messages[-1]) if messages and has_newer else None,
+    }
+
+#################################################################################################
+#   Helper function to get a chat with one window of its messages
+#   input: async db session, chat id, window size, key to load older (before) or newer (after)
+#   messages from; without either the latest messages are loaded; whether to hydrate the knowledge
+#   output: chat row with the window added, or None
+#################################################################################################
+async def get_chat_window(db, chat_id, limit, before=None, after=None, knowledge=False):
+    async with db.begin():
+        result = await db.execute(select(*CHAT_COLUMNS).where(CHAT_COLUMNS.id == chat_id))
+        row = result.mappings().first()
+        if not row:
+            return None
+
+        if after:
+            messages, has_newer = await newer_messages(db, chat_id, after, limit)
+            window = message_window(messages, True, has_newer)
+        else:
+            messages, has_older = await older_messages(db, chat_id, before, limit)
+            window = message_window(messages, has_older, before is not None)
+        if knowledge:
+            await hydrate_messages(db, messages)
+    return {**row, **window}
+
+#################################################################################################
+#   Helper function to get a chat with the messages around one of its messages
+#   input: async db session, chat id, message id, messages to load on each side, whether to
+#   hydrate the knowledge
+#   output: chat row with the window added, or None; the latest messages if the message is gone
+#################################################################################################
+async def get_chat_around_message(db, chat_id, message_id, radius, knowledge=False):
+    async with db.begin():
+        result = await db.execute(select(*CHAT_COLUMNS).where(CHAT_COLUMNS.id == chat_id))
+        row = result.mappings().first()
+        if not row:
+            return None
+
+        result = await db.execute(
+            select(MESSAGE_COLUMNS.created_at, MESSAGE_COLUMNS.id)
+            .where(MESSAGE_COLUMNS.id == message_id, MESSAGE_COLUMNS.chat_id == chat_id)
+        )
+        anchor = result.first()
+        if anchor is None:
+            messages, has_older = await older_messages(db, chat_id, None, 2 * radius + 1)
+            window = message_window(messages, has_older, False)
+        else:
+            older, has_older = await older_messages(db, chat_id, tuple(anchor), radius)
+            newer, has_newer = await newer_messages(db, chat_id, tuple(anchor), radius + 1, inclusive=True)
+            window = message_window(older + newer, has_older, has_newer)
+        if knowledge:
+            await hydrate_messages(db, window["messages"])
+    return {**row, **window}
+
+#################################################################################################
+#   Helper function to get the knowledge of one message of a chat
+#   input: async db session, chat id, message id, output: list of payloads, or None if the
+#   message doesn't exist in that chat
+#################################################################################################
+async def get_message_knowledge(db, chat_id, message_id):
+    async with db.begin():
+        result = await db.execute(
+            select(MESSAGE_COLUMNS.knowledge_refs)
+            .where(MESSAGE_COLUMNS.id == message_id, MESSAGE_COLUMNS.chat_id == chat_id)
+        )
+        row = result.first()
+        if row is None:
+            return None
+        [knowledge] = await hydrate_knowledge(db, [row.knowledge_refs])
+    return knowledge or []
+
+#################################################################################################
+#   Conversation context
+#   the messages after the chat's summary key are the ones not folded into its summary yet
+#################################################################################################
+def summary_key(chat):
+    if chat.get("summary_until") is None:
+        return None
+    return chat["summary_until"], chat["summary_until_id"]
+
+#################################################################################################
+#   Helper functions to get the messages that aren't in the chat summary, the latest or the
+#   oldest `limit` of them (one extra row is read to know whether there are more)
+#   input: async db session, chat row, max number of messages
+#   output: (messages oldest first, whether more unsummarized messages exist)
+#################################################################################################
+async def select_unsummarized_messages(db, chat, limit, newest):
+    async with db.begin():
+        stmt = select(*MESSAGE_COLUMNS).where(MESSAGE_COLUMNS.chat_id == chat["id"])
+        key = summary_key(chat)
+        if key:
+            stmt = stmt.where(tuple_(MESSAGE_COLUMNS.created_at, MESSAGE_COLUMNS.id) > tuple_(*key))
+        if newest:
+            stmt = stmt.order_by(MESSAGE_COLUMNS.created_at.desc(), MESSAGE_COLUMNS.id.desc())
+        else:
+            stmt = stmt.order_by(MESSAGE_COLUMNS.created_at.asc(), MESSAGE_COLUMNS.id.asc())
+        rows = [dict(row) for row in (await db.execute(stmt.limit(limit + 1))).mappings()]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return (rows[::-1] if newest else rows), has_more
+
+async def get_unsummarized_messages(db, chat, limit):
+    return await select_unsummarized_messages(db, chat, limit, newest=True)
+
+async def get_oldest_unsummarized_messages(db, chat, limit):
+    return await select_unsummarized_messages(db, chat, limit, newest=False)
+
+#################################################################################################
+#   Helper function to save a new chat summary
+#   only applied if the summary hasn't moved since it was read, so concurrent turns can't
+#   overwrite a newer summary with an older one
+#   input: async db session, chat row the summary was built from, summary, key of the last
+#   folded message, output: True if saved
+#################################################################################################
+async def update_chat_summary(db, chat, summary, until):
+    key = summary_key(chat)
+    stmt = (
+        update(ChatModel.__table__)
+        .where(CHAT_COLUMNS.id == chat["id"])
+        .values(summary=summary, summary_until=until[0], summary_until_id=until[1])
+    )
+    if key:
+        stmt = stmt.where(CHAT_COLUMNS.summary_until == key[0], CHAT_COLUMNS.summary_until_id == key[1])
+    else:
+        stmt = stmt.where(CHAT_COLUMNS.summary_until.is_(None))
+    async with db.begin():
+        result = await db.execute(stmt)
+    return result.rowcount == 1
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.models.knowledgeChunks import KnowledgeChunk as KnowledgeChunkModel
+
+CHUNK_COLUMNS = KnowledgeChunkModel.__table__.c
+
+
+#################################################################################################
+#   Knowledge chunk repository
+#   the payloads retrieved for an answer are stored once in knowledge_chunks, keyed by the hash
+#   of their content, and the message only keeps [{"id", "score"}] references to them. Popular
+#   chunks are shared by every message that retrieved them instead of being copied into each.
+#################################################################################################
+
+#################################################################################################
+#   Helper function to get the content address of a payload
+#   the same hashing is used by the backfill migration (ee41c9b7d205), keep them in sync
+#################################################################################################
+def knowledge_chunk_id(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def payload_question_id(payload):
+    try:
+        return uuid.UUID(str(payload.get("id")))
+    except ValueError:
+        return None
+
+#################################################################################################
+#   Helper function to split retrieved knowledge into chunk rows and references
+#   input: list of payloads (with the search score under "score")
+#   output: (chunk rows by id, list of references)
+#################################################################################################
+def split_knowledge(knowledge):
+    chunks = {}
+    refs = []
+    for item in knowledge or []:
+        payload = {key: value for key, value in item.items() if key != "score"}
+        chunk_id = knowledge_chunk_id(payload)
+        chunks.setdefault(chunk_id, {"id": chunk_id, "question_id": payload_question_id(payload), "payload": payload})
+        refs.append({"id": chunk_id, "score": item.get("score")})
+    return chunks, refs
+
+#################################################################################################
+#   Helper function to store retrieved knowledge, in the caller's transaction
+#   input: async db session, list of payloads, output: list of references (None without knowledge)
+#################################################################################################
+async def store_knowledge(db, knowledge):
+    if not knowledge:
+        return None
+    chunks, refs = split_knowledge(knowledge)
+    await db.execute(
+        insert(KnowledgeChunkModel.__table__)
+        .values(list(chunks.values()))
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+    return refs
+
+#################################################################################################
+#   Helper function to turn references back into payloads, with one query for all of them
+#   input: async db session, list of reference lists
+#   output: list of payload lists (the score added back), in the same order
+#################################################################################################
+async def hydrate_knowledge(db, refs_lists):
+    chunk_ids = {ref["id"] for refs in refs_lists for ref in refs or []}
+    payloads = {}
+    if chunk_ids:
+        result = await db.execute(select(CHUNK_COLUMNS.id, CHUNK_COLUMNS.payload).where(CHUNK_COLUMNS.id.in_(chunk_ids)))
+        payloads = dict(result.all())
+
+    return [
+        [
+            {**payloads[ref["id"]], "score": ref.get("score")}
+            for ref in refs
+            if ref["id"] in payloads
+        ] if refs is not None else None
+        for refs in refs_lists
+    ]
+
+#################################################################################################
+#   Helper function to add the knowledge to message rows that have references
+#################################################################################################
+async def hydrate_messages(db, messages):
+    knowledge_lists = await hydrate_knowledge(db, [message.get("knowledge_refs") for message in messages])
+    for message, knowledge in zip(messages, knowledge_lists):
+        message["knowledge"] = knowledge
+    return messages
@@ -0,0 +1,20 @@
+from sqlalchemy import select
+
+from app.db.models.questions import Question as QuestionModel
+
+QUESTION_COLUMNS = QuestionModel.__table__.c
+
+
+#################################################################################################
+#   Helper function to get the current version of questions, as stored in the chunk payloads
+#   (updated_at in ISO format); used to check semantic cache hits against edits
+#   input: async db session, list of question ids (strings)
+#   output: {question id: version}, deleted questions are missing
+#################################################################################################
+async def get_question_versions(db, question_ids):
+    async with db.begin():
+        result = await db.execute(
+            select(QUESTION_COLUMNS.id, QUESTION_COLUMNS.updated_at).where(QUESTION_COLUMNS.id.in_(question_ids))
+        )
+        rows = result.all()
+    return {str(question_id): updated_at.isoformat() for question_id, updated_at in rows}
@@ -1,11 +1,213 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from app.core.config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+#################################################################################################
+#   Connection pool metrics: checkouts, time spent waiting for a connection, new and
+#   invalidated connections, on top of the pool's own size / checked out / overflow counters.
+#   Everything but the wait is counted from the public pool events (meter_pool); the wait is
+#   timed around Pool.connect, the call every checkout goes through
+#################################################################################################
+class PoolMetrics:
+    def __init__(self, max_overflow):
+        self._lock = threading.Lock()
+        self.max_overflow = max_overflow
+        self.checkouts = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def record_checkin(self):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.wait_time += seconds
+            self.max_wait_time = max(self.max_wait_time, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            return {
+                "status": pool.status(),
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "max_overflow": self.max_overflow,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "waits": self.waits,
+                "wait_time_total_ms": round(1000 * self.wait_time, 2),
+                "wait_time_max_ms": round(1000 * self.max_wait_time, 2),
+                "timeouts": self.timeouts,
+            }
+
+
+class MeteredPoolMixin:
+    def __init__(self, *args, max_overflow=10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.metrics = PoolMetrics(max_overflow)
+
+    def recreate(self):
+        # the new pool keeps the event listeners and the metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        # a checkout waits when no connection is idle and the overflow is used up
+        waited = self.checkedin() == 0 and self.overflow() >= self.metrics.max_overflow
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        if waited:
+            self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+#################################################################################################
+#   Helper function to count the checkouts, new and invalidated connections of an engine's pool
+#   input: sync engine (the sync_engine of an async one), output: the pool's metrics
+#################################################################################################
+def meter_pool(engine):
+    metrics = engine.pool.metrics
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.record_connect()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.record_checkout()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.record_checkin()
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.record_invalidation()
+
+    @event.listens_for(engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        metrics.record_invalidation()
+
+    return metrics
+
+
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+#################################################################################################
+#   Statement timeout
+#   sent as a startup parameter of every new connection (libpq options / asyncpg
+#   server_settings). PgBouncer rejects unknown startup parameters, and in transaction mode a SET
+#   would only stick to whichever server connection ran it, so with DB_PGBOUNCER the timeout is
+#   not sent at all: it is the role's default instead, set once on the database with
+#       ALTER ROLE <DATABASE_URL user> SET statement_timeout = <DB_STATEMENT_TIMEOUT>;
+#################################################################################################
+def connect_args():
+    if settings.DB_PGBOUNCER:
+        return {}
+    return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}"}
+
+#################################################################################################
+#   Helper function to build the asyncpg url from DATABASE_URL
+#   asyncpg takes ssl instead of libpq's sslmode
+#################################################################################################
+def async_database_url(url):
+    url = make_url(url.replace("postgres://", "postgresql://", 1))
+    query = dict(url.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername="postgresql+asyncpg", query=query)
+
+def async_connect_args():
+    if settings.DB_PGBOUNCER:
+        # pgbouncer in transaction mode can't keep prepared statements across transactions
+        return {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    return {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)}}
+
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=MeteredQueuePool,
+    connect_args=connect_args(),
+    **POOL_OPTIONS
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+meter_pool(engine)
+
+# the API endpoints use the async engine so queries don't block the event loop
+async_engine = create_async_engine(
+    async_database_url(SQLALCHEMY_DATABASE_URL),
+    poolclass=MeteredAsyncQueuePool,
+    connect_args=async_connect_args(),
+    **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+meter_pool(async_engine.sync_engine)
+
+#################################################################################################
+#   Helper function to get the pool metrics of both engines
+#################################################################################################
+def get_pool_stats():
+    return {
+        "sync": engine.pool.metrics.snapshot(engine.pool),
+        "async": async_engine.pool.metrics.snapshot(async_engine.pool),
+    }
 
 Base = declarative_base()
@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.supabase import supabase
+
+# admin writes are checked against supabase too, so a revoked session can't change the knowledge base
+REVOCATION_SENSITIVE_PREFIXES = ["/api/v1/questions", "/api/v1/adminUrlTrain"]
+REVOCATION_SENSITIVE_PATHS = ["/api/v1/auth/logout"]
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+
+#################################################################################################
+#   Helper function to tell whether a request must also be verified remotely by supabase
+#################################################################################################
+def is_revocation_sensitive(method, path):
+    if path in REVOCATION_SENSITIVE_PATHS:
+        return True
+    return method in WRITE_METHODS and any(path.startswith(prefix) for prefix in REVOCATION_SENSITIVE_PREFIXES)
+
+
+#################################################################################################
+#   Verifier for supabase access tokens
+#   tokens are verified locally (signature, expiry, audience) and their claims cached until the
+#   token expires, so most requests never leave the process. Logged out sessions are remembered
+#   per process until their tokens would have expired anyway.
+#################################################################################################
+class TokenVerifier:
+    def __init__(self, secret=None, jwks_url=None, audience="authenticated", leeway=10, max_entries=10000):
+        self.secret = secret
+        self.audience = audience
+        self.leeway = leeway
+        self.max_entries = max_entries
+        self._jwks_client = jwt.PyJWKClient(jwks_url, cache_keys=True) if jwks_url else None
+
+        self._entries = OrderedDict()  # sha256(token) -> claims
+        self._revoked_sessions = {}  # session_id -> exp
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.remote_checks = 0
+
+    @property
+    def local(self):
+        return bool(self.secret or self._jwks_client)
+
+    async def verify_async(self, token, remote=False):
+        """Returns the claims of a valid token, raises HTTPException(401) otherwise."""
+        key = self._key(token)
+        claims = self._get(key)
+        checked_remotely = False
+        if claims is None:
+            if not self.local:
+                claims = await asyncio.to_thread(self._verify_remote, token)
+                checked_remotely = True
+            elif self._algorithm(token) == "HS256":
+                claims = self._decode(token)
+            else:
+                # the JWKS client may have to fetch the signing keys, keep that off the event loop
+                claims = await asyncio.to_thread(self._decode, token)
+            self._store(key, claims)
+
+        self._check_revoked(claims)
+        if remote and not checked_remotely:
+            await asyncio.to_thread(self._verify_remote, token)
+        return claims
+
+    def revoke(self, token):
+        """Drops a token from the cache and rejects every other token of its session in this process."""
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.pop(key, None)
+            if claims and claims.get("session_id"):
+                self._revoked_sessions[claims["session_id"]] = claims["exp"]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._revoked_sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": "local" if self.local else "remote",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "revoked_sessions": len(self._revoked_sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "remote_checks": self.remote_checks,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _key(self, token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def _algorithm(self, token):
+        try:
+            return jwt.get_unverified_header(token).get("alg")
+        except jwt.InvalidTokenError as e:
+            raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+
+    def _decode(self, token):
+        try:
+            if self._algorithm(token) == "HS256":
+                if not self.secret:
+                    raise jwt.InvalidAlgorithmError("HS256 tokens need SUPABASE_JWT_SECRET")
+                key, algorithms = self.secret, ["HS256"]
+            else:
+                if not self._jwks_client:
+                    raise jwt.InvalidAlgorithmError("Asymmetric tokens need SUPABASE_JWKS_URL")
+                key, algorithms = self._jwks_client.get_signing_key_from_jwt(token).key, ASYMMETRIC_ALGORITHMS
+            return jwt.decode(
+                token, key, algorithms=algorithms, audience=self.audience, leeway=self.leeway,
+                options={"require": ["exp", "sub"]}
+            )
+        except jwt.PyJWKClientError as e:
+            raise HTTPException(status_code=401, detail=f"Could not get the token signing key: {e}")
+        except jwt.InvalidTokenError as e:
+            raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+
+    def _verify_remote(self, token):
+        with self._lock:
+            self.remote_checks += 1
+        try:
+            auth_response = supabase.auth.get_user(token)
+        except Exception as e:
+            self._drop(token)
+            raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+        if not auth_response or not auth_response.user:
+            self._drop(token)
+            raise HTTPException(status_code=401, detail="Invalid user token")
+
+        # supabase checked the signature, the claims are only read for the user id and expiry
+        try:
+            claims = jwt.decode(token, options={"verify_signature": False, "verify_aud": False})
+        except jwt.InvalidTokenError:
+            claims = {}
+        claims["sub"] = str(auth_response.user.id)
+        claims.setdefault("exp", time.time() + 60)
+        return claims
+
+    def _check_revoked(self, claims):
+        session_id = claims.get("session_id")
+        with self._lock:
+            if session_id and session_id in self._revoked_sessions:
+                raise HTTPException(status_code=401, detail="Session logged out")
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None and claims["exp"] + self.leeway > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return claims
+            if claims is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def _store(self, key, claims):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            for session_id, exp in list(self._revoked_sessions.items()):
+                if exp + self.leeway <= now:
+                    del self._revoked_sessions[session_id]
+
+    def _drop(self, token):
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+
+
+token_verifier = TokenVerifier(
+    secret = settings.SUPABASE_JWT_SECRET,
+    jwks_url = settings.SUPABASE_JWKS_URL,
+    audience = settings.SUPABASE_JWT_AUDIENCE,
+    leeway = settings.AUTH_LEEWAY,
+    max_entries = settings.AUTH_TOKEN_CACHE_SIZE
+)
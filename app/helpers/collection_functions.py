@@ -0,0 +1,184 @@
+from qdrant_client import models
+
+from app.core.config import settings
+from app.core.qdrant import qdrantClient
+from app.helpers.embedding_providers import embedding_provider
+from app.helpers.sparse_vectors import DENSE_VECTOR_NAME, SPARSE_VECTOR_NAME
+
+COLLECTION_NAME = "admin_trainer"
+
+# payload fields the filtered scroll / delete / set_payload calls use
+PAYLOAD_INDEXES = {
+    "id": models.PayloadSchemaType.KEYWORD,
+    "url": models.PayloadSchemaType.KEYWORD,
+}
+
+
+#################################################################################################
+#   Schema of the knowledge base collection
+#   the collection is declared here and brought in line with `ensure_collection` (or
+#   `python -m app.manage_qdrant ensure`): a missing collection is created, an existing one only
+#   gets the settings that differ, so running it again is a no-op. Changes Qdrant can't apply in
+#   place (vector size or distance, a missing named vector) are reported, not forced.
+#################################################################################################
+def collection_schema():
+    if not embedding_provider.dimension:
+        raise ValueError(f"Unknown dimension of the embedding model {embedding_provider.model_id}, set EMBEDDING_DIMENSION")
+    return {
+        "vectors": {
+            DENSE_VECTOR_NAME: models.VectorParams(
+                size=embedding_provider.dimension,
+                distance=models.Distance.COSINE,
+                on_disk=settings.QDRANT_VECTORS_ON_DISK
+            )
+        },
+        "sparse_vectors": {
+            SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)
+        },
+        "hnsw": models.HnswConfigDiff(m=settings.QDRANT_HNSW_M, ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT),
+        "optimizers": models.OptimizersConfigDiff(
+            indexing_threshold=settings.QDRANT_INDEXING_THRESHOLD,
+            default_segment_number=settings.QDRANT_DEFAULT_SEGMENT_NUMBER
+        ),
+        "on_disk_payload": settings.QDRANT_ON_DISK_PAYLOAD,
+        "payload_indexes": PAYLOAD_INDEXES,
+    }
+
+#################################################################################################
+#   Helper function to compare a diff model (HnswConfigDiff, ...) with the current config
+#   output: {field: (current, wanted)} of the fields that differ
+#################################################################################################
+def config_changes(current, wanted):
+    changes = {}
+    for field, value in wanted.model_dump(exclude_none=True).items():
+        if getattr(current, field, None) != value:
+            changes[field] = (getattr(current, field, None), value)
+    return changes
+
+def describe(changes):
+    return ", ".join(f"{field} {old} -> {new}" for field, (old, new) in changes.items())
+
+#################################################################################################
+#   Helper function to plan the migration of a collection to the schema
+#   input: collection name, client (the app's by default)
+#   output: (list of (description, function applying it), list of problems that need a recreate)
+#################################################################################################
+def plan_collection(collection_name=COLLECTION_NAME, client=None):
+    client = client or qdrantClient
+    schema = collection_schema()
+
+    if not client.collection_exists(collection_name):
+        def create():
+            client.create_collection(
+                collection_name,
+                vectors_config=schema["vectors"],
+                sparse_vectors_config=schema["sparse_vectors"],
+                hnsw_config=schema["hnsw"],
+                optimizers_config=schema["optimizers"],
+                on_disk_payload=schema["on_disk_payload"]
+            )
+        steps = [(f"create collection {collection_name}", create)]
+        steps.extend(payload_index_steps(client, collection_name, schema, {}))
+        return steps, []
+
+    info = client.get_collection(collection_name)
+    config = info.config
+    steps = []
+    problems = []
+
+    current_vectors = config.params.vectors if isinstance(config.params.vectors, dict) else {}
+    vector_updates = {}
+    for name, wanted in schema["vectors"].items():
+        current = current_vectors.get(name)
+        if current is None:
+            problems.append(f"vector {name} is missing")
+        elif (current.size, current.distance) != (wanted.size, wanted.distance):
+            problems.append(f"vector {name} is {current.size} {current.distance}, the schema wants {wanted.size} {wanted.distance}")
+        elif bool(current.on_disk) != bool(wanted.on_disk):
+            vector_updates[name] = models.VectorParamsDiff(on_disk=wanted.on_disk)
+    if vector_updates:
+        steps.append((
+            f"set on_disk of vectors {', '.join(vector_updates)}",
+            lambda: client.update_collection(collection_name, vectors_config=vector_updates)
+        ))
+
+    current_sparse = config.params.sparse_vectors or {}
+    sparse_updates = {}
+    for name, wanted in schema["sparse_vectors"].items():
+        current = current_sparse.get(name)
+        if current is None:
+            # only needed once the sparse vectors are written
+            if settings.SPARSE_VECTORS or settings.SEARCH_MODE == "hybrid":
+                problems.append(f"sparse vector {name} is missing")
+        elif current.modifier != wanted.modifier:
+            sparse_updates[name] = wanted
+    if sparse_updates:
+        steps.append((
+            f"set modifier of sparse vectors {', '.join(sparse_updates)}",
+            lambda: client.update_collection(collection_name, sparse_vectors_config=sparse_updates)
+        ))
+
+    hnsw_changes = config_changes(config.hnsw_config, schema["hnsw"])
+    if hnsw_changes:
+        steps.append((
+            f"update hnsw config: {describe(hnsw_changes)}",
+            lambda: client.update_collection(collection_name, hnsw_config=schema["hnsw"])
+        ))
+
+    optimizer_changes = config_changes(config.optimizer_config, schema["optimizers"])
+    if optimizer_changes:
+        steps.append((
+            f"update optimizer config: {describe(optimizer_changes)}",
+            lambda: client.update_collection(collection_name, optimizers_config=schema["optimizers"])
+        ))
+
+    if bool(config.params.on_disk_payload) != schema["on_disk_payload"]:
+        steps.append((
+            f"set on_disk_payload to {schema['on_disk_payload']}",
+            lambda: client.update_collection(
+                collection_name, collection_params=models.CollectionParamsDiff(on_disk_payload=schema["on_disk_payload"])
+            )
+        ))
+
+    steps.extend(payload_index_steps(client, collection_name, schema, info.payload_schema or {}))
+    return steps, problems
+
+def payload_index_steps(client, collection_name, schema, payload_schema):
+    steps = []
+    for field_name, field_schema in schema["payload_indexes"].items():
+        current = payload_schema.get(field_name)
+        if current is not None and current.data_type == field_schema:
+            continue
+        steps.append((
+            f"create {field_schema.value} payload index on {field_name}",
+            lambda field_name=field_name, field_schema=field_schema: client.create_payload_index(
+                collection_name, field_name, field_schema=field_schema, wait=True
+            )
+        ))
+    return steps
+
+#################################################################################################
+#   Helper function to bring a collection in line with the schema
+#   input: collection name, client, dry_run (only plan)
+#   output: (descriptions of the applied / planned steps, problems that need a recreate)
+#################################################################################################
+def ensure_collection(collection_name=COLLECTION_NAME, client=None, dry_run=False):
+    steps, problems = plan_collection(collection_name, client)
+    if not dry_run:
+        for description, apply in steps:
+            print(f"Collection {collection_name}: {description}")
+            apply()
+    return [description for description, _ in steps], problems
+
+#################################################################################################
+#   Helper function to describe a collection: config, payload indexes and point count
+#################################################################################################
+def describe_collection(collection_name=COLLECTION_NAME, client=None):
+    client = client or qdrantClient
+    info = client.get_collection(collection_name)
+    return {
+        "status": info.status,
+        "points": info.points_count,
+        "config": info.config.model_dump(mode="json", exclude_none=True),
+        "payload_indexes": {name: index.data_type.value for name, index in (info.payload_schema or {}).items()},
+    }
@@ -0,0 +1,147 @@
+from app.core.config import settings
+from app.core.openai import asyncOpenaiClient
+from app.db.session import AsyncSessionLocal
+from app.db.repositories.chats import message_key, get_unsummarized_messages, get_oldest_unsummarized_messages, update_chat_summary
+from app.helpers.token_functions import count_tokens, truncate_to_tokens
+
+
+#################################################################################################
+#   Conversation context for chat follow-ups
+#   the prompt gets the chat's rolling summary plus the most recent turns that fit in
+#   CHAT_CONTEXT_TOKENS, so it stays the same size however long the chat gets. Once the turns
+#   after the summary outgrow the budget, the oldest of them are folded into the summary in the
+#   background, down to half the budget so the summary isn't rewritten on every turn. Folding
+#   always starts at the oldest unsummarized message, so a backlog that doesn't fit one read
+#   (chats older than the summary) is folded page by page.
+#################################################################################################
+SUMMARY_PROMPT = """
+                    You keep a running summary of a conversation between a freelancer and PENGUIN, an assistant
+                    that helps freelancers find relevant information.
+                    Update the summary with the new messages. Keep what the user told about themselves, their
+                    goals and open questions, and the key advice already given. Drop small talk.
+                    Answer with the updated summary only, in at most {words} words.
+                    """
+
+# per message overhead of the chat format
+MESSAGE_TOKENS = 4
+# longest message fed to the summarizer, and most tokens of messages folded by one call
+SUMMARY_INPUT_MESSAGE_TOKENS = 500
+SUMMARY_INPUT_TOKENS = 8000
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_TOKENS
+
+#################################################################################################
+#   Helper function to split messages into the older ones and the most recent that fit a budget
+#   input: messages (oldest first), token budget, output: (older messages, recent messages)
+#################################################################################################
+def split_history(messages, budget):
+    total = 0
+    start = len(messages)
+    while start > 0:
+        tokens = message_tokens(messages[start - 1])
+        if total + tokens > budget:
+            break
+        total += tokens
+        start -= 1
+    return messages[:start], messages[start:]
+
+#################################################################################################
+#   Helper function to load the conversation context of a chat
+#   input: async db session, chat row
+#   output: {"summary", "recent": messages in the prompt, "older": read messages that didn't fit,
+#   "truncated": whether there are unsummarized messages before the ones read}
+#################################################################################################
+async def load_conversation(db, chat):
+    messages, truncated = await get_unsummarized_messages(db, chat, settings.CHAT_CONTEXT_MAX_MESSAGES)
+    older, recent = split_history(messages, settings.CHAT_CONTEXT_TOKENS)
+    return {"summary": chat.get("summary"), "recent": recent, "older": older, "truncated": truncated}
+
+#################################################################################################
+#   Helper function to turn the conversation into chat completion messages
+#################################################################################################
+def conversation_history(conversation):
+    history = []
+    if conversation["summary"]:
+        history.append({"role": "system", "content": f"Summary of the earlier conversation:\n{conversation['summary']}"})
+    for message in conversation["recent"]:
+        history.append({"role": message["sender"], "content": message["content"]})
+    return history
+
+#################################################################################################
+#   Helper function to fold messages into a summary
+#   input: previous summary (or None), messages (oldest first), output: new summary
+#################################################################################################
+async def summarize_conversation(previous_summary, messages):
+    transcript = "\n".join(
+        f"{message['sender']}: {truncate_to_tokens(message['content'], SUMMARY_INPUT_MESSAGE_TOKENS)}"
+        for message in messages
+    )
+    response = await asyncOpenaiClient.chat.completions.create(
+        model=settings.CHAT_SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT.format(words=settings.CHAT_SUMMARY_TOKENS * 3 // 4)},
+            {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"}
+        ],
+        max_tokens=settings.CHAT_SUMMARY_TOKENS
+    )
+    return truncate_to_tokens(response.choices[0].message.content.strip(), settings.CHAT_SUMMARY_TOKENS)
+
+#################################################################################################
+#   Helper function to cut the messages of one summarizer call: the oldest ones within
+#   SUMMARY_INPUT_TOKENS (at least one)
+#################################################################################################
+def summary_input(messages):
+    total = 0
+    for i, message in enumerate(messages):
+        total += min(message_tokens(message), SUMMARY_INPUT_MESSAGE_TOKENS)
+        if total > SUMMARY_INPUT_TOKENS and i:
+            return messages[:i]
+    return messages
+
+#################################################################################################
+#   Helper function to fold the unsummarized messages of a chat into its summary, oldest first,
+#   until the rest fits in half the budget
+#   input: async db session, chat row, output: number of summarizer calls
+#################################################################################################
+async def fold_chat_summary(db, chat):
+    calls = 0
+    while True:
+        page, has_more = await get_oldest_unsummarized_messages(db, chat, settings.CHAT_CONTEXT_MAX_MESSAGES)
+        if has_more:
+            folded = page
+        elif sum(message_tokens(message) for message in page) <= settings.CHAT_CONTEXT_TOKENS:
+            return calls
+        else:
+            folded, _ = split_history(page, settings.CHAT_CONTEXT_TOKENS // 2)
+        folded = summary_input(folded)
+        if not folded:
+            return calls
+
+        summary = await summarize_conversation(chat.get("summary"), folded)
+        calls += 1
+        until = message_key(folded[-1])
+        if not await update_chat_summary(db, chat, summary, until):
+            # another turn moved the summary meanwhile, it carries on from there
+            return calls
+        chat = {**chat, "summary": summary, "summary_until": until[0], "summary_until_id": until[1]}
+
+#################################################################################################
+#   Background task run after a turn is saved: folds the oldest turns into the chat summary
+#   once the turns after the summary don't fit the budget anymore
+#   input: chat row and conversation the turn was answered with, the saved messages of the turn
+#   (filled in by the streaming endpoints once the stream is done)
+#################################################################################################
+async def refresh_chat_summary(chat, conversation, turn_messages):
+    if not turn_messages:
+        return
+
+    messages = conversation["older"] + conversation["recent"] + list(turn_messages)
+    if not conversation["truncated"] and sum(message_tokens(message) for message in messages) <= settings.CHAT_CONTEXT_TOKENS:
+        return
+
+    try:
+        async with AsyncSessionLocal() as db:
+            await fold_chat_summary(db, chat)
+    except Exception as e:
+        print(f"Chat summary error for chat {chat['id']}: {e}")
@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.embeddingCache import EmbeddingCache as EmbeddingCacheModel
+
+
+#################################################################################################
+#   Helper function to normalize a query before it is used as a cache key
+#   input: string, output: lowercased string with collapsed whitespace
+#################################################################################################
+def normalize_query(text):
+    return " ".join(text.lower().split())
+
+def cache_key(text, model):
+    return hashlib.sha256(f"{model}\n{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+#################################################################################################
+#   LRU + TTL cache for query (and chunker sentence) embeddings
+#   vectors are kept as float32 numpy arrays, optionally backed by the embedding_cache table
+#################################################################################################
+class EmbeddingCache:
+    def __init__(self, max_entries, ttl, persist=False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist = persist
+
+        self._entries = OrderedDict()  # key -> (expires_at, vector)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+
+    def get(self, text, model):
+        key = cache_key(text, model)
+        vector = self._get_memory(key)
+        if vector is None and self.persist:
+            vector = self._load(key)
+            if vector is not None:
+                self._store(key, vector)
+        return self._count(vector)
+
+    async def get_async(self, text, model):
+        key = cache_key(text, model)
+        vector = self._get_memory(key)
+        if vector is None and self.persist:
+            vector = await asyncio.to_thread(self._load, key)
+            if vector is not None:
+                self._store(key, vector)
+        return self._count(vector)
+
+    def get_many(self, texts, model):
+        keys = [cache_key(text, model) for text in texts]
+        vectors = [self._get_memory(key) for key in keys]
+        missing = [key for key, vector in zip(keys, vectors) if vector is None]
+        if missing and self.persist:
+            loaded = self._load_many(missing)
+            for i, key in enumerate(keys):
+                if vectors[i] is None and key in loaded:
+                    vectors[i] = loaded[key]
+                    self._store(key, vectors[i])
+        return [self._count(vector) for vector in vectors]
+
+    def set(self, text, model, embedding):
+        key = cache_key(text, model)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._store(key, vector)
+        if self.persist:
+            self._save(key, model, vector)
+        return vector
+
+    def set_many(self, texts, model, embeddings):
+        entries = {}
+        for text, embedding in zip(texts, embeddings):
+            key = cache_key(text, model)
+            entries[key] = np.asarray(embedding, dtype=np.float32)
+            self._store(key, entries[key])
+        if self.persist and entries:
+            self._save_many(model, entries)
+        return [entries[cache_key(text, model)] for text in texts]
+
+    async def set_async(self, text, model, embedding):
+        key = cache_key(text, model)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._store(key, vector)
+        if self.persist:
+            await asyncio.to_thread(self._save, key, model, vector)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "persist": self.persist,
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent_hits": self.persistent_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_bytes": sum(vector.nbytes for _, vector in self._entries.values()),
+            }
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, vector = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _count(self, vector):
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return vector
+
+    def _store(self, key, vector):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # the persistent table is only an optimization, so its errors never fail a request
+    def _load(self, key):
+        return self._load_many([key]).get(key)
+
+    def _load_many(self, keys):
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(EmbeddingCacheModel.key, EmbeddingCacheModel.embedding)
+                .filter(EmbeddingCacheModel.key.in_(set(keys)))
+                .filter(EmbeddingCacheModel.created_at > func.now() - timedelta(seconds=self.ttl))
+                .all()
+            )
+            with self._lock:
+                self.persistent_hits += len(rows)
+            return {row.key: np.frombuffer(row.embedding, dtype=np.float32) for row in rows}
+        except SQLAlchemyError as e:
+            print(f"Embedding cache load error: {e}")
+            return {}
+        finally:
+            db.close()
+
+    def _save(self, key, model, vector):
+        self._save_many(model, {key: vector})
+
+    def _save_many(self, model, entries):
+        db = SessionLocal()
+        try:
+            stmt = insert(EmbeddingCacheModel).values([
+                {"key": key, "model": model, "embedding": vector.tobytes()} for key, vector in entries.items()
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[EmbeddingCacheModel.key],
+                set_={"embedding": stmt.excluded.embedding, "created_at": func.now()}
+            )
+            db.execute(stmt)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Embedding cache save error: {e}")
+        finally:
+            db.close()
+
+
+embedding_cache = EmbeddingCache(
+    max_entries = settings.EMBEDDING_CACHE_SIZE,
+    ttl = settings.EMBEDDING_CACHE_TTL,
+    persist = settings.EMBEDDING_CACHE_PERSIST
+)
+
+# sentence groups embedded by the semantic chunker, kept apart so a long answer doesn't evict the
+# query embeddings; the keys are the same, so both share the persistent table
+sentence_embedding_cache = EmbeddingCache(
+    max_entries = settings.SENTENCE_EMBEDDING_CACHE_SIZE,
+    ttl = settings.EMBEDDING_CACHE_TTL,
+    persist = settings.EMBEDDING_CACHE_PERSIST
+)
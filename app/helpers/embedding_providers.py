@@ -0,0 +1,126 @@
+import re
+import zlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.openai import openaiClient, asyncOpenaiClient
+
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+
+#################################################################################################
+#   Embedding provider interface used by every helper in qdrant_functions
+#   embed(texts) returns one embedding (list of floats) per text, in order; embed_async and
+#   batches default to the sync call and a single batch.
+#   model_id is stored with each vector so vectors of different models are never mixed
+#################################################################################################
+class EmbeddingProvider(ABC):
+    model_id: str
+    dimension: int
+
+    @abstractmethod
+    def embed(self, texts):
+        pass
+
+    async def embed_async(self, texts):
+        return self.embed(texts)
+
+    def batches(self, texts):
+        return [texts]
+
+
+#################################################################################################
+#   OpenAI embeddings, batched to the API input limits
+#################################################################################################
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    def __init__(self, model, dimension=None):
+        self.model = model
+        self.model_id = f"openai/{model}" if dimension is None else f"openai/{model}@{dimension}"
+        self.dimension = dimension or OPENAI_EMBEDDING_DIMENSIONS.get(model)
+        # text-embedding-3 models can shorten their vectors server-side
+        self._extra = {"dimensions": dimension} if dimension else {}
+
+    def embed(self, texts):
+        embeddings = []
+        for batch in self.batches(texts):
+            response = openaiClient.embeddings.create(input=batch, model=self.model, **self._extra)
+            embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return embeddings
+
+    async def embed_async(self, texts):
+        embeddings = []
+        for batch in self.batches(texts):
+            response = await asyncOpenaiClient.embeddings.create(input=batch, model=self.model, **self._extra)
+            embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return embeddings
+
+    def batches(self, texts):
+        # tokens are estimated conservatively as 1 per 3 characters
+        batch = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = len(text) // 3 + 1
+            if batch and (len(batch) >= settings.EMBEDDING_BATCH_SIZE or batch_tokens + tokens > settings.EMBEDDING_BATCH_MAX_TOKENS):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+
+#################################################################################################
+#   Local, deterministic CPU embedder: signed feature hashing of word unigrams/bigrams and
+#   character n-grams into a fixed number of buckets, L2 normalized. No network, no model files,
+#   so ingestion and search can be exercised and profiled offline.
+#################################################################################################
+class LocalEmbeddingProvider(EmbeddingProvider):
+    def __init__(self, dimension=3072, ngram_range=(3, 5)):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.model_id = f"local/hashed-ngrams-{ngram_range[0]}-{ngram_range[1]}@{dimension}"
+
+    def features(self, text):
+        text = " ".join(text.lower().split())
+        words = re.findall(r"\w+", text)
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        padded = f" {text} "
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, texts):
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self.features(text)
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint64, count=len(features))
+            buckets = (hashes % self.dimension).astype(np.int64)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(embeddings[row], buckets, signs)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1, norms)
+        return embeddings.tolist()
+
+
+#################################################################################################
+#   Helper function to build the configured provider (EMBEDDING_PROVIDER: openai or local)
+#################################################################################################
+def get_embedding_provider():
+    if settings.EMBEDDING_PROVIDER == "local":
+        return LocalEmbeddingProvider(dimension=settings.EMBEDDING_DIMENSION or 3072)
+    if settings.EMBEDDING_PROVIDER == "openai":
+        return OpenAIEmbeddingProvider(settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSION)
+    raise ValueError(f"Unknown embedding provider: {settings.EMBEDDING_PROVIDER}")
+
+
+embedding_provider = get_embedding_provider()
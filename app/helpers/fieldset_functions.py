@@ -0,0 +1,48 @@
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+#################################################################################################
+#   Sparse fieldsets for the list endpoints
+#   ?fields=a,b picks the columns to return, ?include=c adds heavy columns (answers, message
+#   contents, knowledge) that are left out by default. Only the chosen columns are selected in
+#   SQL; the id and the sort column are always returned since the cursor is built from them.
+#################################################################################################
+
+#################################################################################################
+#   Helper function to split a comma separated parameter, 400 on names that aren't allowed
+#################################################################################################
+def parse_field_names(value, allowed, parameter):
+    if not value:
+        return []
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {parameter}: {', '.join(unknown)}. Available: {', '.join(allowed)}"
+        )
+    return names
+
+#################################################################################################
+#   Helper function to get the columns to select
+#   input: table columns, default (summary) field names, heavy field names, fields / include
+#   parameters, field names that are always returned
+#   output: list of columns
+#################################################################################################
+def select_fields(columns, summary, heavy, fields: Optional[str] = None, include: Optional[str] = None, required=("id",)):
+    allowed = list(summary) + list(heavy)
+    names = parse_field_names(fields, allowed, "fields") or list(summary)
+    names += parse_field_names(include, list(heavy), "include")
+
+    selected = list(required) + [name for name in names if name not in required]
+    return [columns[name] for name in dict.fromkeys(selected)]
+
+#################################################################################################
+#   Helper function to read the selected rows as dicts, so fields that weren't selected are
+#   left unset and dropped from the response (response_model_exclude_unset)
+#################################################################################################
+async def fetch_fields(db, stmt):
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
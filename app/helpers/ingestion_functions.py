@@ -0,0 +1,222 @@
+import asyncio
+import threading
+from datetime import timedelta
+
+from sqlalchemy import and_, or_, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.ingestionJobs import IngestionJob
+from app.db.models.questions import Question as QuestionModel
+from app.helpers.qdrant_functions import delete_points_by_uuid, reindex_question_in_qdrant
+from app.helpers.collection_functions import COLLECTION_NAME
+
+# set whenever a job is enqueued, so idle in-process workers don't wait for the next poll
+_wakeup = asyncio.Event()
+
+
+#################################################################################################
+#   Helper function to enqueue an ingestion job for a question
+#   a job that is still queued for the same question is reused, so rapid edits trigger one re-index
+#   the job is committed together with the caller's pending changes (the question insert, update
+#   or delete), so a change is never saved without its job
+#   input: db session, question id, action (index / delete), output: the job
+#################################################################################################
+def enqueue_ingestion_job(db, question_id, action):
+    for _ in range(2):
+        try:
+            # savepoint: a conflict only rolls back the job, not the caller's changes
+            with db.begin_nested():
+                job = (
+                    db.query(IngestionJob)
+                    .filter(IngestionJob.question_id == question_id, IngestionJob.status == "queued")
+                    .with_for_update()
+                    .first()
+                )
+                if job:
+                    job.action = action
+                    job.attempts = 0
+                    job.error = None
+                    job.run_after = func.now()
+                else:
+                    job = IngestionJob(question_id=question_id, action=action, status="queued", attempts=0)
+                    db.add(job)
+            break
+        except IntegrityError:
+            # another request queued a job for this question at the same time, coalesce into it
+            continue
+    else:
+        raise RuntimeError(f"Could not enqueue ingestion job for question {question_id}")
+
+    db.commit()
+    db.refresh(job)
+    _wakeup.set()
+    return job
+
+#################################################################################################
+#   Helper function to get the latest ingestion job of a question
+#################################################################################################
+def get_latest_ingestion_job(db, question_id):
+    return (
+        db.query(IngestionJob)
+        .filter(IngestionJob.question_id == question_id)
+        .order_by(IngestionJob.created_at.desc())
+        .first()
+    )
+
+#################################################################################################
+#   Helper function to claim the next runnable job
+#   queued jobs whose retry time has come, or running jobs whose worker died; never two jobs of one question
+#################################################################################################
+def claim_ingestion_job(db):
+    stale_before = func.now() - timedelta(seconds=settings.INGESTION_JOB_TIMEOUT)
+    running = aliased(IngestionJob)
+
+    job = (
+        db.query(IngestionJob)
+        .filter(
+            or_(
+                and_(IngestionJob.status == "queued", IngestionJob.run_after <= func.now()),
+                and_(IngestionJob.status == "running", IngestionJob.updated_at < stale_before),
+            ),
+            ~exists().where(
+                running.question_id == IngestionJob.question_id,
+                running.id != IngestionJob.id,
+                running.status == "running",
+                running.updated_at >= stale_before,
+            ),
+        )
+        .order_by(IngestionJob.created_at)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if not job:
+        db.rollback()
+        return None
+
+    job.status = "running"
+    job.attempts += 1
+    db.commit()
+    db.refresh(job)
+    return job
+
+#################################################################################################
+#   Helper function to run the chunk -> summarize -> embed -> upload pipeline for one job
+#   only changed chunks are summarized and embedded, see reindex_question_in_qdrant
+#################################################################################################
+def run_ingestion_pipeline(db, question_id, action):
+    db_question = None
+    if action == "index":
+        db_question = db.query(QuestionModel).filter(QuestionModel.id == question_id).first()
+
+    if db_question:
+        counts = reindex_question_in_qdrant(db_question, COLLECTION_NAME)
+        print(f"Re-indexed question {question_id}: {counts}")
+    else:
+        delete_points_by_uuid(COLLECTION_NAME, str(question_id))
+
+#################################################################################################
+#   Heartbeat of a running job
+#   a running job is reclaimed once its updated_at is older than INGESTION_JOB_TIMEOUT, so while
+#   the pipeline runs updated_at is bumped every INGESTION_HEARTBEAT_INTERVAL from its own
+#   session. The claim's attempt number is the lease: a job reclaimed by another worker (attempts
+#   went up) is no longer touched by this one
+#################################################################################################
+def touch_ingestion_job(job_id, attempt):
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(IngestionJob)
+            .filter(IngestionJob.id == job_id, IngestionJob.status == "running", IngestionJob.attempts == attempt)
+            .update({IngestionJob.updated_at: func.now()}, synchronize_session=False)
+        )
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+def heartbeat_ingestion_job(job_id, attempt, stop):
+    while not stop.wait(settings.INGESTION_HEARTBEAT_INTERVAL):
+        try:
+            if not touch_ingestion_job(job_id, attempt):
+                return
+        except Exception as e:
+            print(f"Ingestion job {job_id} heartbeat failed: {e}")
+
+#################################################################################################
+#   Helper function to claim and run one job, with retries and exponential backoff
+#   output: id of the job that ran, None when there was nothing to do
+#################################################################################################
+def run_next_ingestion_job():
+    db = SessionLocal()
+    try:
+        job = claim_ingestion_job(db)
+        if not job:
+            return None
+        job_id = job.id
+        attempt = job.attempts
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=heartbeat_ingestion_job, args=(job_id, attempt, stop), daemon=True)
+        heartbeat.start()
+        try:
+            run_ingestion_pipeline(db, job.question_id, job.action)
+            error = None
+        except Exception as e:
+            db.rollback()
+            error = e
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        job = db.get(IngestionJob, job_id, with_for_update=True, populate_existing=True)
+        if job is None or job.status != "running" or job.attempts != attempt:
+            # reclaimed by another worker after a missed heartbeat, that run owns the job now
+            db.rollback()
+            print(f"Ingestion job {job_id} was reclaimed, not recording attempt {attempt}")
+            return job_id
+
+        if error is None:
+            job.status = "succeeded"
+            job.error = None
+        else:
+            job.error = str(getattr(error, "detail", error))
+            if job.attempts < settings.INGESTION_MAX_ATTEMPTS:
+                job.status = "queued"
+                job.run_after = func.now() + timedelta(seconds=settings.INGESTION_RETRY_BACKOFF * 2 ** (job.attempts - 1))
+            else:
+                job.status = "failed"
+            print(f"Ingestion job {job_id} failed (attempt {job.attempts}): {job.error}")
+
+        try:
+            db.commit()
+        except IntegrityError:
+            # a newer edit queued a job for this question meanwhile, that one supersedes the retry
+            db.rollback()
+            job = db.get(IngestionJob, job_id)
+            job.status = "failed"
+            db.commit()
+        return job_id
+    finally:
+        db.close()
+
+#################################################################################################
+#   In-process worker loop, started from the app lifespan
+#################################################################################################
+async def ingestion_worker():
+    while True:
+        try:
+            job_id = await asyncio.to_thread(run_next_ingestion_job)
+        except Exception as e:
+            print(f"Ingestion worker error: {e}")
+            job_id = None
+
+        if job_id is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.INGESTION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
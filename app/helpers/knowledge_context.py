@@ -0,0 +1,121 @@
+import re
+
+from app.core.config import settings
+from app.helpers.token_functions import count_tokens, truncate_to_tokens
+
+
+#################################################################################################
+#   Knowledge base context of the RAG prompts
+#   the search over-fetches KNOWLEDGE_CANDIDATES hits and only the useful ones go in the prompt:
+#   hits below the score cutoff and near duplicates of better hits are dropped, the rest are
+#   taken best first until KNOWLEDGE_CONTEXT_TOKENS is used up, so k adapts to the query.
+#   The kept chunks are grouped per source question and rendered as
+#
+#       [1] question text
+#       Source: url
+#       chunk text
+#       chunk text
+#
+#   where [n] is the n-th distinct question in the returned knowledge list
+#################################################################################################
+WORD_PATTERN = re.compile(r"\w+")
+# words per shingle of the near duplicate check
+SHINGLE_SIZE = 3
+
+def shingles(text):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def is_near_duplicate(candidate, kept, threshold):
+    for other in kept:
+        union = len(candidate | other)
+        if union and len(candidate & other) / union >= threshold:
+            return True
+    return False
+
+def group_header(payload, number):
+    header = f"[{number}] {payload.get('question') or ''}".rstrip()
+    if payload.get("url"):
+        header += f"\nSource: {payload['url']}"
+    return header
+
+#################################################################################################
+#   Helper function to pick the hits that go in the prompt
+#   input: search results (best first), token budget
+#   output: list of (payload, score, chunk text) in render order: grouped per question, the
+#   groups by their best hit and the chunks of a group in answer order
+#################################################################################################
+def select_knowledge(search_results, max_tokens=None):
+    max_tokens = max_tokens or settings.KNOWLEDGE_CONTEXT_TOKENS
+    if not search_results:
+        return []
+
+    # fused hybrid scores only reflect ranks, the hybrid search cuts its dense half by score instead
+    if settings.SEARCH_MODE == "hybrid":
+        min_score = None
+    else:
+        top_score = search_results[0].score or 0
+        min_score = max(settings.KNOWLEDGE_MIN_SCORE, top_score * settings.KNOWLEDGE_SCORE_RATIO)
+
+    groups = {}
+    kept_shingles = []
+    seen_hashes = set()
+    used = 0
+    for result in search_results:
+        payload = result.payload or {}
+        text = (payload.get("answer") or "").strip()
+        if not text or (min_score is not None and result.score is not None and result.score < min_score):
+            continue
+        if payload.get("chunk_hash") in seen_hashes:
+            continue
+        text_shingles = shingles(text)
+        if is_near_duplicate(text_shingles, kept_shingles, settings.KNOWLEDGE_DUPLICATE_THRESHOLD):
+            continue
+
+        group_id = payload.get("id")
+        tokens = count_tokens(text) + 1
+        if group_id not in groups:
+            tokens += count_tokens(group_header(payload, len(groups) + 1)) + 2
+        if used + tokens > max_tokens:
+            # only the best hit is cut to fit, lower ones are skipped for smaller chunks further down
+            remaining = max_tokens - used - (tokens - count_tokens(text))
+            if groups or remaining <= 0:
+                continue
+            text = truncate_to_tokens(text, remaining)
+            tokens = max_tokens - used
+
+        used += tokens
+        if payload.get("chunk_hash"):
+            seen_hashes.add(payload["chunk_hash"])
+        kept_shingles.append(text_shingles)
+        groups.setdefault(group_id, []).append((payload, result.score, text))
+
+    return [
+        hit
+        for hits in groups.values()
+        for hit in sorted(hits, key=lambda hit: hit[0].get("chunk_index") or 0)
+    ]
+
+#################################################################################################
+#   Helper function to render the selected hits as the knowledge base of the prompt
+#################################################################################################
+def render_knowledge(hits):
+    sections = []
+    last_group = object()
+    for payload, _, text in hits:
+        if payload.get("id") != last_group:
+            last_group = payload.get("id")
+            sections.append(group_header(payload, len(sections) + 1))
+        sections[-1] += f"\n{text}"
+    return "\n\n".join(sections)
+
+#################################################################################################
+#   Helper function to build the knowledge context from the search results
+#   input: search results (best first)
+#   output: knowledge base string, list of the used payloads (with the search score)
+#################################################################################################
+def build_knowledge_context(search_results, max_tokens=None):
+    hits = select_knowledge(search_results, max_tokens)
+    return render_knowledge(hits), [{**payload, "score": score} for payload, score, _ in hits]
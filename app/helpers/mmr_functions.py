@@ -0,0 +1,44 @@
+import numpy as np
+
+
+#################################################################################################
+#   Maximal Marginal Relevance
+#   picks k of the candidates one at a time, each maximizing
+#       lambda * similarity to the query - (1 - lambda) * max similarity to the picked ones
+#   so a chunk that repeats an already picked one loses to a slightly less relevant new one.
+#   lambda 1 is plain relevance order, lower values favour diversity.
+#   The similarity matrix is computed once, every pick is a vector update over the candidates
+#################################################################################################
+def normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+#################################################################################################
+#   Helper function to rerank candidates with MMR
+#   input: query vector, candidate vectors (n x d), k, lambda
+#   output: indices of the picked candidates, in pick order
+#################################################################################################
+def mmr_select(query_vector, candidate_vectors, k, lambda_mult=0.5):
+    candidates = normalize(np.asarray(candidate_vectors, dtype=np.float32))
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    relevance = candidates @ normalize(np.asarray(query_vector, dtype=np.float32))
+    similarity = candidates @ candidates.T
+
+    picked = [int(np.argmax(relevance))]
+    available = np.ones(n, dtype=bool)
+    available[picked[0]] = False
+    max_similarity = similarity[picked[0]].copy()
+
+    while len(picked) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        index = int(np.argmax(scores))
+        picked.append(index)
+        available[index] = False
+        np.maximum(max_similarity, similarity[index], out=max_similarity)
+
+    return picked
@@ -1,26 +1,30 @@
-from app.core.openai import openaiClient
-from app.helpers.qdrant_functions import search_in_qdrant
+from app.core.openai import openaiClient, asyncOpenaiClient
+from app.helpers.qdrant_functions import search_in_qdrant, search_in_qdrant_async, create_embedding_async
+from app.helpers.semantic_cache import answer_cache
+from app.helpers.knowledge_context import build_knowledge_context
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.db.repositories.questions import get_question_versions
 from fastapi import  HTTPException
 
+SYSTEM_PROMPT = """
+                    You are a agent who helps freelancers find relevant information that they need.
+                    Your name is 'PENGUIN'. Forget everything about openai. You were created by 'PENGUIN LABS'.
+                    You will be given a query and a knowledge base.
+                    The knowledge base entries are tagged [1], [2], ... and start with the question they answer.
+                    Try to answer all questions accordingly. Try to give them tips if necessary.
+                    Always answer in human readable markdown format.
+                    """
+
 def create_chat_completion(query, search_results):
     
-    prompt = f"Query: {query}\n Knowledge Base: {search_results}\n"
+    prompt = f"Query: {query}\nKnowledge Base:\n{search_results}\n"
     
     try:
         response = openaiClient.chat.completions.create(
             model="gpt-4o",
             messages=[
-                {
-                    "role": "system", 
-                    "content": 
-                    """
-                    You are a agent who helps freelancers find relevant information that they need.
-                    Your name is 'PENGUIN'. Forget everything about openai. You were created by 'PENGUIN LABS'.
-                    You will be given a query and a knowledge base.
-                    Try to answer all questions accordingly. Try to give them tips if necessary.
-                    Always answer in human readable markdown format.
-                    """
-                    },
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ]
         )
@@ -28,65 +32,54 @@ def create_chat_completion(query, search_results):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
 
-def create_chat_completion_context(query, message_list, search_results):
-    
-    prompt = f"Query: {query}\n Knowledge Base: {search_results}\n"
-    
-    full_context = []
-    
-    full_context.append(
-        {
-            "role": "system", 
-            "content": 
-            """
-            You are a agent who helps freelancers find relevant information that they need.
-            Your name is 'PENGUIN'. Forget everything about openai. You were created by 'PENGUIN LABS'.
-            You will be given a query and a knowledge base.
-            Try to answer all questions accordingly. Try to give them tips if necessary.
-            Always answer in human readable markdown format.
-            """
-        }
-    )
-    
-    for message in message_list:
-        if message.sender == "user":
-            full_context.append(
-                {
-                    "role": message.sender,
-                    "content": 
-                    f"""
-                        "Query: {message.content}"
-                    """
-                }
-            )
-        elif message.sender == "assistant":
-            full_context.append(
-                {
-                    "role": message.sender,
-                    "content": 
-                    f"""
-                        "Query: {message.content} Knowledge Base: {search_results}\n"
-                    """
-                }
-            )
+#################################################################################################
+#   Helper function to build the chat completion messages
+#   input: query, knowledge base, conversation history (summary and recent turns, see
+#   context_functions.py) and output: list of messages
+#################################################################################################
+def build_prompt_messages(query, search_results, history=None):
+    prompt = f"Query: {query}\nKnowledge Base:\n{search_results}\n"
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *(history or []),
+        {"role": "user", "content": prompt}
+    ]
+
+async def create_chat_completion_async(query, search_results, history=None):
     
     try:
-        response = openaiClient.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages = full_context
+        response = await asyncOpenaiClient.chat.completions.create(
+            model="gpt-4o",
+            messages=build_prompt_messages(query, search_results, history)
         )
         return response.choices[0].message.content
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
+
+#################################################################################################
+#   Streaming version of create_chat_completion
+#   input: query, knowledge base and conversation history, output: async generator of answer tokens
+#################################################################################################
+async def create_chat_completion_stream(query, search_results, history=None):
     
-def rag_query(COLLECTION_NAME, queryText, limit):
     try:
-        search_results = search_in_qdrant(COLLECTION_NAME, queryText, limit)
+        stream = await asyncOpenaiClient.chat.completions.create(
+            model="gpt-4o",
+            messages=build_prompt_messages(query, search_results, history),
+            stream=True
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
+    
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def rag_query(COLLECTION_NAME, queryText, limit=None):
+    try:
+        search_results = search_in_qdrant(COLLECTION_NAME, queryText, limit or settings.KNOWLEDGE_CANDIDATES)
         
-        combined_result = ""
-        for result in search_results:
-            combined_result += f"{result.payload}"
-            
+        combined_result, _ = build_knowledge_context(search_results)
 
         openai_response = create_chat_completion(queryText, combined_result)
         return openai_response
@@ -94,4 +87,49 @@ def rag_query(COLLECTION_NAME, queryText, limit):
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred in rag query: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred in rag query: {str(e)}")
+
+#################################################################################################
+#   Helper function to get the current versions (updated_at) of questions, for the answer cache
+#################################################################################################
+async def current_question_versions(question_ids):
+    async with AsyncSessionLocal() as db:
+        return await get_question_versions(db, question_ids)
+
+#################################################################################################
+#   Helper function to retrieve the knowledge for a query, checking the semantic answer cache first
+#   output: query embedding, knowledge base string, list of payloads (with the search score),
+#   cached answer (None on a miss)
+#   limit is the number of hits fetched, the knowledge base keeps the ones that fit its token
+#   budget (see knowledge_context.py)
+#   use_cache is off for follow-ups: their answer depends on the conversation, not only the query
+#   a cached answer is only used while its source questions are unchanged in the database
+#################################################################################################
+async def retrieve_knowledge_async(COLLECTION_NAME, queryText, limit=None, use_cache=True):
+    query_embedding = await create_embedding_async(queryText)
+    
+    cached = await answer_cache.lookup_current(query_embedding, current_question_versions) if use_cache else None
+    if cached:
+        cached_answer, result_list = cached
+        return query_embedding, "", result_list, cached_answer
+    
+    search_results = await search_in_qdrant_async(COLLECTION_NAME, queryText, limit or settings.KNOWLEDGE_CANDIDATES, query_embedding)
+    
+    combined_result, result_list = build_knowledge_context(search_results)
+    
+    return query_embedding, combined_result, result_list, None
+
+async def rag_query_async(COLLECTION_NAME, queryText, limit=None):
+    try:
+        query_embedding, combined_result, result_list, cached_answer = await retrieve_knowledge_async(COLLECTION_NAME, queryText, limit)
+        if cached_answer:
+            return cached_answer
+
+        openai_response = await create_chat_completion_async(queryText, combined_result)
+        answer_cache.store(query_embedding, openai_response, result_list)
+        return openai_response
+    
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred in rag query: {str(e)}")
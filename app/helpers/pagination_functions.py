@@ -0,0 +1,94 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_
+
+from app.core.config import settings
+
+
+#################################################################################################
+#   Keyset (cursor) pagination for the list endpoints
+#   rows are ordered by (timestamp, id) and the next page starts after the last row of this one,
+#   so every page is an index range scan no matter how deep the client pages
+#################################################################################################
+
+def page_limit():
+    return Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX)
+
+#################################################################################################
+#   Helper functions to encode / decode the opaque cursor: base64 of [timestamp, id]
+#################################################################################################
+def encode_cursor(sort_value, row_id):
+    payload = json.dumps([sort_value.isoformat(), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(payload)
+        return datetime.fromisoformat(sort_value), uuid.UUID(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+#################################################################################################
+#   Helper function to filter a timestamp column to a date range
+#   the timestamp columns are naive UTC, so aware datetimes are converted first
+#################################################################################################
+def naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def filter_date_range(stmt, column, after=None, before=None):
+    if after is not None:
+        stmt = stmt.where(column >= naive_utc(after))
+    if before is not None:
+        stmt = stmt.where(column < naive_utc(before))
+    return stmt
+
+#################################################################################################
+#   Helper function to apply the cursor, order and limit to a select
+#   one extra row is fetched to know whether there is a next page
+#################################################################################################
+def paginate(stmt, sort_column, id_column, cursor=None, limit=None, descending=True):
+    limit = limit or settings.PAGE_SIZE_DEFAULT
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        key = tuple_(sort_column, id_column)
+        stmt = stmt.where(key < tuple_(sort_value, row_id) if descending else key > tuple_(sort_value, row_id))
+
+    if descending:
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(sort_column.asc(), id_column.asc())
+    return stmt.limit(limit + 1)
+
+#################################################################################################
+#   Helper function to build the page response from the fetched rows
+#   input: rows of paginate() (models or dicts), name of the sort attribute, page size
+#   output: {"items": rows of this page, "next_cursor": cursor of the next page or None}
+#################################################################################################
+def build_page(rows, sort_attr, limit=None):
+    limit = limit or settings.PAGE_SIZE_DEFAULT
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[sort_attr], last["id"])
+        else:
+            next_cursor = encode_cursor(getattr(last, sort_attr), last.id)
+    return {"items": items, "next_cursor": next_cursor}
+
+#################################################################################################
+#   Helper function to turn the keys of a message window (see db/repositories/chats.py) into
+#   the before / after cursors of the response
+#################################################################################################
+def window_cursors(window):
+    return {
+        "before_cursor": encode_cursor(*window["before"]) if window["before"] else None,
+        "after_cursor": encode_cursor(*window["after"]) if window["after"] else None,
+    }
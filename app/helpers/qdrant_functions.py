@@ -1,132 +1,394 @@
+import hashlib
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
 from qdrant_client import models
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain_openai.embeddings import OpenAIEmbeddings
 from app.schemas.questions import Question
+from app.core.config import settings
 
-from app.core.qdrant import qdrantClient
+from app.core.qdrant import qdrantClient, asyncQdrantClient
 from app.core.openai import openaiClient
+from app.helpers.embedding_cache import embedding_cache, sentence_embedding_cache
+from app.helpers.embedding_providers import embedding_provider
+from app.helpers.semantic_chunker import SemanticChunker
+from app.helpers.sparse_vectors import DENSE_VECTOR_NAME, SPARSE_VECTOR_NAME, chunk_sparse_vector, query_sparse_vector
+from app.helpers.mmr_functions import mmr_select
 
 
+# namespace for the UUIDv5 point ids of knowledge chunks
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "penguin/admin_trainer")
+
 #################################################################################################
 #   Helper function to get the chunks for any text
-#   input: string, output: array of semantically similar chunks
-#   used method: percentile -> default value for breakpoint = 95%
+#   input: string, output: array of semantically similar chunks, each with a pooled sentence vector
+#   default method: percentile -> default value for breakpoint = 95%
 #################################################################################################
 def create_semantic_chunks(text_content):
     try:
-        semantic_chunker = SemanticChunker(OpenAIEmbeddings(model="text-embedding-3-large"), breakpoint_threshold_type="percentile")
-        semantic_chunks = semantic_chunker.create_documents([text_content])
-        return semantic_chunks
+        return semantic_chunker.create_chunks(text_content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating embedding: {str(e)}")
 
 #################################################################################################
-#   Helper function to get the vector embedding for any text
+#   Helper function to get the vector embedding for any text, served from the query embedding cache when possible
 #   input: string, output: multidimensional array representing embedding
 #################################################################################################
 def create_embedding(txt):
-    embedding_model = "text-embedding-3-large"
-    str_embedding = openaiClient.embeddings.create(input= txt, model=embedding_model)
-    return str_embedding.data[0].embedding
+    cached = embedding_cache.get(txt, embedding_provider.model_id)
+    if cached is not None:
+        return cached.tolist()
+    embedding = embedding_provider.embed([txt])[0]
+    embedding_cache.set(txt, embedding_provider.model_id, embedding)
+    return embedding
+
+#################################################################################################
+#   Helper function to get the vector embeddings for many texts in as few requests as possible
+#   input: array of strings, output: array of embeddings in the same order
+#################################################################################################
+def create_embeddings(texts):
+    return embedding_provider.embed(texts)
+
+#################################################################################################
+#   Helper function to embed the sentence groups of the semantic chunker
+#   served from the sentence embedding cache, only the groups not seen before are embedded
+#   input: array of strings, output: array of embeddings in the same order
+#################################################################################################
+def create_sentence_embeddings(texts):
+    vectors = sentence_embedding_cache.get_many(texts, embedding_provider.model_id)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        embeddings = embedding_provider.embed(missing_texts)
+        stored = sentence_embedding_cache.set_many(missing_texts, embedding_provider.model_id, embeddings)
+        for i, vector in zip(missing, stored):
+            vectors[i] = vector
+    return vectors
+
+# built once per process, embeds sentences through the configured embedding provider
+semantic_chunker = SemanticChunker(
+    create_sentence_embeddings,
+    breakpoint_threshold_type = settings.CHUNKER_THRESHOLD_TYPE,
+    breakpoint_threshold_amount = settings.CHUNKER_THRESHOLD_AMOUNT,
+    buffer_size = settings.CHUNKER_BUFFER_SIZE
+)
+
+#################################################################################################
+#   Async version of create_embedding, used on the request path
+#   input: string, output: multidimensional array representing embedding
+#################################################################################################
+async def create_embedding_async(txt):
+    cached = await embedding_cache.get_async(txt, embedding_provider.model_id)
+    if cached is not None:
+        return cached.tolist()
+    embedding = (await embedding_provider.embed_async([txt]))[0]
+    await embedding_cache.set_async(txt, embedding_provider.model_id, embedding)
+    return embedding
 
 #################################################################################################
 #   Helper function to generate the summary for a question - answer_chunk pair. The summary is then prepended
-#   input: semantic chunks, output: array of strings
+#   modes: sequential, concurrent (bounded thread pool) or batched (one JSON completion, per-chunk fallback)
+#   input: semantic chunks, output: array of strings in chunk order
 #################################################################################################
-def generate_summary(semantic_chunks, question):  
-    summaries = []  # New list to store summaries
-    for semantic_chunk in semantic_chunks:   
-        prompt = f"Question: {question}\nAnswer: {semantic_chunk.page_content}"
-        prompt += "\nPlease provide a brief summary about this question and answer within 1 sentence."
+def generate_summary(semantic_chunks, question, mode=None):
+    mode = mode or settings.SUMMARY_MODE
+    
+    if mode == "batched" and len(semantic_chunks) > 1:
+        summaries = generate_summary_batched(semantic_chunks, question)
+        if summaries is not None:
+            return summaries
+        mode = "concurrent"
+    
+    if mode == "concurrent" and len(semantic_chunks) > 1:
+        with ThreadPoolExecutor(max_workers=min(settings.SUMMARY_CONCURRENCY, len(semantic_chunks))) as executor:
+            return list(executor.map(lambda semantic_chunk: summarize_chunk(semantic_chunk, question), semantic_chunks))
+    
+    return [summarize_chunk(semantic_chunk, question) for semantic_chunk in semantic_chunks]
 
+#################################################################################################
+#   Helper function to summarize one question - answer_chunk pair
+#   input: semantic chunk and question, output: string
+#################################################################################################
+def summarize_chunk(semantic_chunk, question):
+    prompt = f"Question: {question.question}\nAnswer: {semantic_chunk.page_content}"
+    prompt += "\nPlease provide a brief summary about this question and answer within 1 sentence."
+
+    response = openaiClient.chat.completions.create(
+    model="gpt-3.5-turbo-0125",
+    messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt}
+    ],
+    )
+    return response.choices[0].message.content
+
+#################################################################################################
+#   Helper function to summarize all chunks of a question in one structured completion
+#   input: semantic chunks and question, output: array of strings, or None when the reply can't be used
+#################################################################################################
+def generate_summary_batched(semantic_chunks, question):
+    prompt = f"Question: {question.question}\n"
+    for i, semantic_chunk in enumerate(semantic_chunks):
+        prompt += f"\nAnswer part {i}: {semantic_chunk.page_content}\n"
+    prompt += (
+        f"\nFor each of the {len(semantic_chunks)} answer parts, provide a brief summary about the question and that part within 1 sentence."
+        '\nReply with a JSON object of the form {"summaries": ["summary of part 0", "summary of part 1", ...]} in part order.'
+    )
+
+    try:
         response = openaiClient.chat.completions.create(
-        model="gpt-3.5-turbo-0125",
-        messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
+            model="gpt-3.5-turbo-0125",
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant that replies in JSON."},
                 {"role": "user", "content": prompt}
-        ],
+            ],
         )
-        raw_response = response.choices[0].message.content
-        summaries.append(raw_response)  # Store summary in the list
-    
-    return summaries  
+        summaries = json.loads(response.choices[0].message.content)["summaries"]
+    except Exception as e:
+        print(f"Batched summary failed, falling back to per-chunk summaries: {e}")
+        return None
+
+    if (
+        not isinstance(summaries, list)
+        or len(summaries) != len(semantic_chunks)
+        or not all(isinstance(summary, str) and summary for summary in summaries)
+    ):
+        print("Batched summary returned an unexpected shape, falling back to per-chunk summaries")
+        return None
+
+    return summaries
+
+#################################################################################################
+#   Helper functions for deterministic point ids
+#   the same (question, chunk index, chunk content) always maps to the same point, so uploads are idempotent
+#################################################################################################
+def chunk_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def chunk_point_id(question_id, chunk_index, content_hash):
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{question_id}:{chunk_index}:{content_hash}"))
+
+#################################################################################################
+#   Helper function to get the model id stored with a chunk vector
+#   pooled sentence vectors and vectors of the summary string live in different spaces, so the
+#   pooled ones are marked and only reused for chunks pooled the same way
+#################################################################################################
+def chunk_vector_model(pooled):
+    return f"{embedding_provider.model_id}#pooled" if pooled else embedding_provider.model_id
+
+#################################################################################################
+#   Helper function to build the payload stored with a chunk
+#################################################################################################
+def build_chunk_payload(question: Question, chunk_index, content, pooled=False):
+    return {
+        "id": str(question.id),
+        "question": question.question,
+        "answer": content,
+        "url": question.url,
+        "chunk_index": chunk_index,
+        "chunk_hash": chunk_hash(content),
+        "embedding_model": chunk_vector_model(pooled),
+        "created_at": question.created_at.isoformat(),
+        "updated_at": question.updated_at.isoformat()
+    }
+
+#################################################################################################
+#   Helper function to get the sparse (BM25) vector of a chunk, when the collection carries them
+#   output: {vector name: vector}, empty with SPARSE_VECTORS off
+#################################################################################################
+def chunk_sparse_vectors(question: Question, content):
+    if not settings.SPARSE_VECTORS:
+        return {}
+    sparse_vector = chunk_sparse_vector(question.question, content)
+    return {SPARSE_VECTOR_NAME: sparse_vector} if sparse_vector.indices else {}
+
+#################################################################################################
+#   Helper function to write points with a few bulk upserts
+#################################################################################################
+def upsert_points(collection_name, points, wait=None):
+    if wait is None:
+        wait = settings.QDRANT_UPSERT_WAIT
+    for start in range(0, len(points), settings.QDRANT_UPSERT_BATCH_SIZE):
+        qdrantClient.upsert(
+            collection_name,
+            points=points[start:start + settings.QDRANT_UPSERT_BATCH_SIZE],
+            wait=wait
+        )
+
+#################################################################################################
+#   Helper function to check if chunks can use the vectors pooled by the semantic chunker
+#   (CHUNK_VECTORS_FROM_SENTENCES), which skips both the summaries and the second embedding pass
+#################################################################################################
+def uses_pooled_vectors(semantic_chunks):
+    return settings.CHUNK_VECTORS_FROM_SENTENCES and all(
+        getattr(semantic_chunk, "vector", None) is not None for semantic_chunk in semantic_chunks
+    )
+
+#################################################################################################
+#   Helper function to embed chunks and build their points
+#   input: question, (chunk index, semantic chunk) pairs, summaries (None for pooled vectors) and output: array of points
+#################################################################################################
+def embed_chunk_points(question: Question, indexed_chunks, summaries):
+    payloads = [
+        build_chunk_payload(question, chunk_index, semantic_chunk.page_content, pooled=summaries is None)
+        for chunk_index, semantic_chunk in indexed_chunks
+    ]
+
+    if summaries is None:
+        content_embeddings = [semantic_chunk.vector.tolist() for _, semantic_chunk in indexed_chunks]
+    else:
+        strs_to_embed = [
+            question.question + "\n" + summary + "\n" + semantic_chunk.page_content
+            for (_, semantic_chunk), summary in zip(indexed_chunks, summaries)
+        ]
+        content_embeddings = create_embeddings(strs_to_embed)
+
+    return [
+        models.PointStruct(
+            id=chunk_point_id(payload["id"], payload["chunk_index"], payload["chunk_hash"]),
+            vector={DENSE_VECTOR_NAME: content_embedding, **chunk_sparse_vectors(question, payload["answer"])},
+            payload=payload
+        )
+        for payload, content_embedding in zip(payloads, content_embeddings)
+    ]
 
 #################################################################################################
 #   Helper function to upload into qdrant cloud
+#   all chunks are embedded in batched requests and written with a few bulk upserts
 #   input: question, semantic chunks, summaries and output: nothing
 #################################################################################################
-def upload_to_qdrant(question: Question, semantic_chunks, summaries, collection_name):
-    embedding_model = "text-embedding-3-large"
-    point_count = qdrantClient.count(collection_name)
-    index = point_count.count
-    summary_index = 0
-
-    for semantic_chunk in semantic_chunks:
-        # Create payload from Question object fields
-        payload = {
-            "id": str(question.id),
-            "question": question.question,
-            "answer": semantic_chunk.page_content,
-            "url": question.url,
-            "created_at": question.created_at.isoformat(),
-            "updated_at": question.updated_at.isoformat()
-        }
-
-        if not payload['answer']:
-            return
-
-        str_to_embed = question.question + "\n" + summaries[summary_index] + "\n" + semantic_chunk.page_content
-        content_embedding = openaiClient.embeddings.create(input=str_to_embed, model=embedding_model)
+def upload_to_qdrant(question: Question, semantic_chunks, summaries, collection_name, wait=None):
+    indexed_chunks = []
+    for chunk_index, semantic_chunk in enumerate(semantic_chunks):
+        if not semantic_chunk.page_content:
+            break
+        indexed_chunks.append((chunk_index, semantic_chunk))
 
-        qdrantClient.upsert(
+    if not indexed_chunks:
+        return
+
+    if uses_pooled_vectors([semantic_chunk for _, semantic_chunk in indexed_chunks]):
+        summaries = None
+    else:
+        summaries = summaries[:len(indexed_chunks)]
+
+    points = embed_chunk_points(question, indexed_chunks, summaries)
+    upsert_points(collection_name, points, wait)
+
+#################################################################################################
+#   Helper function to re-index an edited question incrementally
+#   chunks whose text (and question) didn't change keep their vectors, only new chunks are
+#   summarized and embedded; stale points are deleted after the replacements are written.
+#   Chunking needs the embedding of every sentence group of the answer again; they come from
+#   the sentence embedding cache, so within its TTL an edit only embeds the changed sentences
+#   and the groups around them (buffer_size neighbours on each side)
+#   input: question and output: counts of kept, reused, embedded and deleted points
+#################################################################################################
+def reindex_question_in_qdrant(question: Question, collection_name, wait=None):
+    if wait is None:
+        wait = settings.QDRANT_UPSERT_WAIT
+
+    existing_points = scroll_points_by_uuid(collection_name, str(question.id), with_payload=True, with_vectors=True)
+
+    semantic_chunks = create_semantic_chunks(question.answer) if question.answer else []
+    pooled = bool(semantic_chunks) and uses_pooled_vectors(semantic_chunks)
+
+    # vectors can only be reused while the embedded string (question + summary + chunk), the model
+    # and the kind of vector (pooled or not) are unchanged
+    reusable = {}
+    for point in existing_points:
+        payload = point.payload or {}
+        if (
+            payload.get("chunk_hash")
+            and payload.get("question") == question.question
+            and payload.get("embedding_model") == chunk_vector_model(pooled)
+        ):
+            reusable.setdefault(payload["chunk_hash"], point)
+
+    new_ids = set()
+    kept_ids = []
+    new_points = []
+    indexed_chunks = []
+    for chunk_index, semantic_chunk in enumerate(semantic_chunks):
+        if not semantic_chunk.page_content:
+            break
+        payload = build_chunk_payload(question, chunk_index, semantic_chunk.page_content, pooled)
+        point_id = chunk_point_id(payload["id"], chunk_index, payload["chunk_hash"])
+        new_ids.add(point_id)
+
+        source = reusable.get(payload["chunk_hash"])
+        if source is None:
+            indexed_chunks.append((chunk_index, semantic_chunk))
+            continue
+        # the sparse vector is local and cheap, points written before SPARSE_VECTORS get it here
+        sparse_vectors = chunk_sparse_vectors(question, payload["answer"])
+        if str(source.id) == point_id and all(name in source.vector for name in sparse_vectors):
+            kept_ids.append(point_id)
+        else:
+            new_points.append(models.PointStruct(id=point_id, vector={**source.vector, **sparse_vectors}, payload=payload))
+    reused = len(new_points)
+
+    if indexed_chunks:
+        chunks_to_embed = [semantic_chunk for _, semantic_chunk in indexed_chunks]
+        summaries = None if pooled else generate_summary(chunks_to_embed, question)
+        new_points.extend(embed_chunk_points(question, indexed_chunks, summaries))
+
+    upsert_points(collection_name, new_points, wait)
+
+    if kept_ids:
+        qdrantClient.set_payload(
             collection_name,
-            points=[
-                {
-                    "id": index,
-                    "vector": {
-                        "content": content_embedding.data[0].embedding
-                    },
-                    "payload": payload
-                }
-            ]
+            payload={"url": question.url, "updated_at": question.updated_at.isoformat()},
+            points=kept_ids,
+            wait=wait
         )
-        index += 1
-        summary_index += 1
+
+    stale_ids = [point.id for point in existing_points if str(point.id) not in new_ids]
+    if stale_ids:
+        qdrantClient.delete(
+            collection_name=collection_name,
+            points_selector=models.PointIdsList(points=stale_ids),
+            wait=wait
+        )
+
+    return {"kept": len(kept_ids), "reused": reused, "embedded": len(indexed_chunks), "deleted": len(stale_ids)}
 
 #################################################################################################
-#   Helper function to Get all the vector-point IDs for a particular UUID of a question
+#   Helper function to Get all the points (optionally with payload and vectors) for a particular UUID of a question
+#   scrolls QDRANT_SCROLL_PAGE_SIZE points per request, filtered on the indexed "id" payload field
 #   input: UUID and output: array of points
 #################################################################################################
-def get_points_by_uuid(collection_name, uuid):
+def scroll_points_by_uuid(collection_name, uuid, with_payload=False, with_vectors=False):
     offset = None
     all_points = []
-    
+
     while True:
-        result = qdrantClient.scroll(
+        points, offset = qdrantClient.scroll(
             collection_name=collection_name,
             scroll_filter=models.Filter(
                 must=[
                     models.FieldCondition(key="id", match=models.MatchValue(value=uuid)),
                 ]
             ),
-            limit=10,  
-            with_payload=False,
-            with_vectors=False,
+            limit=settings.QDRANT_SCROLL_PAGE_SIZE,
+            with_payload=with_payload,
+            with_vectors=with_vectors,
             offset=offset
         )
-        
-        points, next_offset = result
         all_points.extend(points)
-        
-        if next_offset is None:
+
+        if offset is None:
             break
-        
-        offset = next_offset
-    
-    all_point_ids = []
-    all_point_ids.extend([point.id for point in points])
-    return all_point_ids
+
+    return all_points
+
+#################################################################################################
+#   Helper function to Get all the vector-point IDs for a particular UUID of a question
+#   input: UUID and output: array of points
+#################################################################################################
+def get_points_by_uuid(collection_name, uuid):
+    return [point.id for point in scroll_points_by_uuid(collection_name, uuid)]
 
 
 #################################################################################################
@@ -156,25 +418,116 @@ def delete_points_by_uuid(collection_name, uuid):
     except Exception as e:
          raise HTTPException(status_code=500, detail="Error occurred while deleting from vectorDB")
     
+#################################################################################################
+#   Helper function to build the hybrid search: the dense and the sparse (BM25) search run as
+#   prefetches of one query_points request and are fused with reciprocal rank fusion, so exact
+#   terms (fees, plan names) are found even when their embedding isn't close to the query's
+#   input: query, its embedding and limit, output: query_points arguments
+#################################################################################################
+def hybrid_query(query, embedding, limit, with_vectors=False):
+    prefetch_limit = max(settings.HYBRID_PREFETCH_LIMIT, limit)
+    prefetch = [
+        models.Prefetch(
+            query=embedding,
+            using=DENSE_VECTOR_NAME,
+            limit=prefetch_limit,
+            score_threshold=settings.KNOWLEDGE_MIN_SCORE or None
+        )
+    ]
+    sparse_vector = query_sparse_vector(query)
+    if sparse_vector.indices:
+        prefetch.append(models.Prefetch(query=sparse_vector, using=SPARSE_VECTOR_NAME, limit=prefetch_limit))
+
+    return {
+        "prefetch": prefetch,
+        "query": models.FusionQuery(fusion=models.Fusion.RRF),
+        "limit": limit,
+        "with_payload": True,
+        "with_vectors": with_vectors,
+    }
+
+#################################################################################################
+#   Optional MMR stage of the search (MMR_ENABLED, or diversify=True per call)
+#   the search over-fetches MMR_FETCH_LIMIT candidates with their dense vectors in the same
+#   request, and they are reranked locally so several chunks of one long answer don't fill the top
+#################################################################################################
+def search_params(limit, diversify):
+    if diversify:
+        return max(settings.MMR_FETCH_LIMIT, limit), [DENSE_VECTOR_NAME]
+    return limit, False
+
+#################################################################################################
+#   Helper function to pick a diverse top `limit` of the candidates
+#   input: points with their dense vector, query embedding, output: points (without vectors) in MMR order
+#################################################################################################
+def diversify_results(results, embedding, limit, lambda_mult=None):
+    if lambda_mult is None:
+        lambda_mult = settings.MMR_LAMBDA
+    candidates = [point for point in results if isinstance(point.vector, dict) and DENSE_VECTOR_NAME in point.vector]
+    picked = [candidates[index] for index in mmr_select(
+        embedding, [point.vector[DENSE_VECTOR_NAME] for point in candidates], limit, lambda_mult
+    )]
+    for point in picked:
+        point.vector = None
+    return picked
+
 #################################################################################################
 #   Helper function to SEARCH in a collection with given query
 #   input: UUID and output: array of points
 #################################################################################################
 
-def search_in_qdrant(collection_name, query, limit):
+def search_in_qdrant(collection_name, query, limit, diversify=None):
     try:
         embedding = create_embedding(query)
         # print(len(embedding))
         # print(query)
-        results = qdrantClient.search(
-                collection_name = collection_name,
-                query_vector = ("content", embedding),
-                limit=limit,
-                with_payload=True,
-                with_vectors=False,
-            )
-
-        return results
+        if diversify is None:
+            diversify = settings.MMR_ENABLED
+        fetch_limit, with_vectors = search_params(limit, diversify)
+
+        if settings.SEARCH_MODE == "hybrid":
+            results = qdrantClient.query_points(collection_name, **hybrid_query(query, embedding, fetch_limit, with_vectors)).points
+        else:
+            results = qdrantClient.search(
+                    collection_name = collection_name,
+                    query_vector = (DENSE_VECTOR_NAME, embedding),
+                    limit=fetch_limit,
+                    with_payload=True,
+                    with_vectors=with_vectors,
+                )
+
+        return diversify_results(results, embedding, limit) if diversify else results
+    
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error occurred while searching in vectorDB {str(e)}")
+
+#################################################################################################
+#   Async version of search_in_qdrant, used on the request path
+#   input: query string (and its embedding if already computed), diversify (MMR, defaults to
+#   MMR_ENABLED) and output: array of points
+#################################################################################################
+async def search_in_qdrant_async(collection_name, query, limit, embedding=None, diversify=None):
+    try:
+        if embedding is None:
+            embedding = await create_embedding_async(query)
+        if diversify is None:
+            diversify = settings.MMR_ENABLED
+        fetch_limit, with_vectors = search_params(limit, diversify)
+
+        if settings.SEARCH_MODE == "hybrid":
+            results = (await asyncQdrantClient.query_points(collection_name, **hybrid_query(query, embedding, fetch_limit, with_vectors))).points
+        else:
+            results = await asyncQdrantClient.search(
+                    collection_name = collection_name,
+                    query_vector = (DENSE_VECTOR_NAME, embedding),
+                    limit=fetch_limit,
+                    with_payload=True,
+                    with_vectors=with_vectors,
+                )
+
+        return diversify_results(results, embedding, limit) if diversify else results
     
     except HTTPException as http_exc:
         raise http_exc
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import numpy as np
+
+from app.core.config import settings
+
+
+#################################################################################################
+#   Semantic answer cache for the RAG endpoints
+#   answers are looked up by cosine similarity of the query embedding against one float32
+#   matrix of unit vectors. Each entry keeps the version (updated_at) of every source question
+#   its knowledge came from, and a hit is only served while those are still the versions in the
+#   database: an edit makes the entries of the question stale in every worker process at once,
+#   and an answer cached from the old points while the re-index runs never matches either
+#################################################################################################
+class SemanticCache:
+    def __init__(self, max_entries, threshold, ttl, enabled=False):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self._vectors = None  # (max_entries, dim), allocated on first store
+        self._entries = [None] * max_entries  # slot -> {"answer", "knowledge", "versions", "expires_at"}
+        self._used = np.zeros(max_entries, dtype=bool)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    async def lookup_current(self, embedding, current_versions):
+        """
+        Returns (answer, knowledge) of the closest cached query above the threshold, or None;
+        the hit is only served if its source questions are unchanged.
+        current_versions: async function of a list of question ids -> {question id: version}.
+        """
+        if not self.enabled:
+            return None
+        found = self._find(embedding)
+        if found is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        slot, entry = found
+        if entry["versions"]:
+            versions = await current_versions(list(entry["versions"]))
+            if any(versions.get(question_id) != version for question_id, version in entry["versions"].items()):
+                with self._lock:
+                    if self._entries[slot] is entry:
+                        self._free(slot)
+                    self.stale += 1
+                    self.misses += 1
+                return None
+
+        with self._lock:
+            self.hits += 1
+        return entry["answer"], entry["knowledge"]
+
+    def store(self, embedding, answer, knowledge):
+        if not self.enabled:
+            return
+
+        vector = self._unit(embedding)
+        versions = {
+            item["id"]: item.get("updated_at")
+            for item in knowledge if isinstance(item, dict) and item.get("id")
+        }
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._reset(vector.shape[0])
+
+            free_slots = np.flatnonzero(~self._used)
+            if len(free_slots):
+                slot = int(free_slots[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._free(slot)
+
+            self._vectors[slot] = vector
+            self._entries[slot] = {
+                "answer": answer,
+                "knowledge": knowledge,
+                "versions": versions,
+                "expires_at": now + self.ttl,
+            }
+            self._used[slot] = True
+            self._last_used[slot] = now
+
+    def clear(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._reset(self._vectors.shape[1])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": int(self._used.sum()),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_bytes": self._vectors.nbytes if self._vectors is not None else 0,
+            }
+
+    def _find(self, embedding):
+        # closest live entry above the threshold as (slot, entry), expired entries are freed
+        query = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0] or not self._used.any():
+                return None
+
+            scores = self._vectors @ query
+            scores[~self._used] = -np.inf
+            slot = int(np.argmax(scores))
+            entry = self._entries[slot]
+
+            if scores[slot] < self.threshold or entry["expires_at"] <= now:
+                if entry["expires_at"] <= now:
+                    self._free(slot)
+                return None
+
+            self._last_used[slot] = now
+            return slot, entry
+
+    def _unit(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _reset(self, dim):
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._entries = [None] * self.max_entries
+        self._used[:] = False
+        self._last_used[:] = 0
+
+    def _free(self, slot):
+        self._entries[slot] = None
+        self._used[slot] = False
+
+
+answer_cache = SemanticCache(
+    max_entries = settings.SEMANTIC_CACHE_SIZE,
+    threshold = settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl = settings.SEMANTIC_CACHE_TTL,
+    enabled = settings.SEMANTIC_CACHE_ENABLED
+)
@@ -0,0 +1,82 @@
+import re
+
+import numpy as np
+
+SENTENCE_SPLIT_REGEX = r"(?<=[.?!])\s+"
+
+# default threshold amount per breakpoint type, same as langchain's SemanticChunker
+BREAKPOINT_DEFAULTS = {
+    "percentile": 95,
+    "standard_deviation": 3,
+    "interquartile": 1.5,
+}
+
+
+#################################################################################################
+#   One chunk of text, with a vector pooled from the sentence embeddings that made it
+#################################################################################################
+class SemanticChunk:
+    def __init__(self, page_content, vector=None):
+        self.page_content = page_content
+        self.vector = vector
+
+
+#################################################################################################
+#   Semantic chunker: splits text where the embedding distance between neighbouring sentences jumps
+#   distances and thresholds are computed with vectorized numpy over all sentences at once
+#################################################################################################
+class SemanticChunker:
+    def __init__(self, embed, breakpoint_threshold_type="percentile", breakpoint_threshold_amount=None, buffer_size=1):
+        if breakpoint_threshold_type not in BREAKPOINT_DEFAULTS:
+            raise ValueError(f"Unknown breakpoint threshold type: {breakpoint_threshold_type}")
+        self.embed = embed  # callable: array of strings -> array of embeddings
+        self.breakpoint_threshold_type = breakpoint_threshold_type
+        self.breakpoint_threshold_amount = (
+            breakpoint_threshold_amount if breakpoint_threshold_amount is not None
+            else BREAKPOINT_DEFAULTS[breakpoint_threshold_type]
+        )
+        self.buffer_size = buffer_size
+
+    def split_sentences(self, text):
+        return [sentence for sentence in re.split(SENTENCE_SPLIT_REGEX, text) if sentence]
+
+    def combine_sentences(self, sentences):
+        # each sentence is embedded together with buffer_size neighbours on both sides
+        return [
+            " ".join(sentences[max(0, i - self.buffer_size):i + self.buffer_size + 1])
+            for i in range(len(sentences))
+        ]
+
+    def distances(self, embeddings):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        unit = embeddings / np.where(norms == 0, 1, norms)
+        return 1.0 - np.einsum("ij,ij->i", unit[:-1], unit[1:])
+
+    def threshold(self, distances):
+        amount = self.breakpoint_threshold_amount
+        if self.breakpoint_threshold_type == "percentile":
+            return np.percentile(distances, amount)
+        if self.breakpoint_threshold_type == "standard_deviation":
+            return np.mean(distances) + amount * np.std(distances)
+        q1, q3 = np.percentile(distances, [25, 75])
+        return np.mean(distances) + amount * (q3 - q1)
+
+    def create_chunks(self, text):
+        sentences = self.split_sentences(text)
+        if not sentences:
+            return []
+
+        embeddings = np.asarray(self.embed(self.combine_sentences(sentences)), dtype=np.float32)
+        if len(sentences) == 1:
+            breakpoints = np.array([], dtype=int)
+        else:
+            distances = self.distances(embeddings)
+            breakpoints = np.flatnonzero(distances > self.threshold(distances)) + 1
+        bounds = np.concatenate(([0], breakpoints, [len(sentences)]))
+
+        chunks = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            vector = embeddings[start:end].mean(axis=0)
+            norm = np.linalg.norm(vector)
+            chunks.append(SemanticChunk(" ".join(sentences[start:end]), vector / norm if norm else vector))
+        return chunks
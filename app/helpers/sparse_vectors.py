@@ -0,0 +1,62 @@
+import re
+import zlib
+from collections import Counter
+
+from qdrant_client import models
+
+from app.core.config import settings
+
+# named vectors of the admin_trainer points
+DENSE_VECTOR_NAME = "content"
+SPARSE_VECTOR_NAME = "text"
+
+WORD_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+    a about an and are as at be but by can do does for from has have how i if in into is it its
+    me my of on or our so that the their then there these this to was we what when where which
+    who will with you your
+""".split())
+
+
+#################################################################################################
+#   BM25 sparse vectors for the lexical half of the hybrid search
+#   computed locally, no model involved: terms are lowercased words (stopwords dropped), hashed
+#   to their crc32 index. Documents carry the BM25 term-frequency part, queries a weight of 1 per
+#   term; the collection's sparse vector uses the IDF modifier, so Qdrant multiplies in the
+#   inverse document frequency from its own statistics at query time
+#################################################################################################
+def tokenize(text):
+    return [word for word in WORD_PATTERN.findall((text or "").lower()) if word not in STOPWORDS]
+
+def term_index(term):
+    return zlib.crc32(term.encode("utf-8"))
+
+def to_sparse_vector(weights):
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[weights[index] for index in indices])
+
+#################################################################################################
+#   Helper function to get the sparse vector of a stored chunk
+#   input: text, output: SparseVector with the saturated, length-normalized term frequencies
+#################################################################################################
+def document_sparse_vector(text):
+    terms = tokenize(text)
+    k1, b = settings.BM25_K1, settings.BM25_B
+    length_norm = 1 - b + b * len(terms) / settings.BM25_AVG_DOC_LENGTH
+    weights = {}
+    for term, tf in Counter(terms).items():
+        index = term_index(term)
+        weights[index] = weights.get(index, 0) + tf * (k1 + 1) / (tf + k1 * length_norm)
+    return to_sparse_vector(weights)
+
+#################################################################################################
+#   Helper function to get the sparse vector of a search query
+#################################################################################################
+def query_sparse_vector(text):
+    return to_sparse_vector({term_index(term): 1.0 for term in set(tokenize(text))})
+
+#################################################################################################
+#   Helper function to get the text a chunk is indexed under: the question and the chunk text
+#################################################################################################
+def chunk_sparse_vector(question_text, content):
+    return document_sparse_vector(f"{question_text}\n{content}")
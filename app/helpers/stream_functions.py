@@ -0,0 +1,10 @@
+import orjson
+
+
+#################################################################################################
+#   Helper function to format one Server-Sent Event
+#   input: event name and JSON serializable data, output: SSE frame string
+#################################################################################################
+def sse_event(event, data):
+    payload = orjson.dumps(data, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+    return f"event: {event}\ndata: {payload}\n\n"
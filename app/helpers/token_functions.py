@@ -0,0 +1,45 @@
+from functools import lru_cache
+
+import tiktoken
+
+from app.core.config import settings
+
+
+#################################################################################################
+#   Token counting for the prompt budgets
+#   tiktoken downloads the encoding on first use; without it (offline) the count falls back to
+#   an estimate of ~4 characters per token, which is close enough for budgeting. The API lifespan
+#   and the worker load it at startup so the download never runs on the event loop
+#################################################################################################
+_encoding = None
+_encoding_loaded = False
+
+def get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            _encoding = tiktoken.encoding_for_model(settings.TOKENIZER_MODEL)
+        except Exception as e:
+            print(f"Tokenizer unavailable, estimating token counts: {e}")
+    return _encoding
+
+@lru_cache(maxsize=8192)
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+#################################################################################################
+#   Helper function to cut a text to a token budget
+#################################################################################################
+def truncate_to_tokens(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
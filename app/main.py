@@ -1,10 +1,33 @@
 from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import ORJSONResponse
 from app.api.api_v1.api import api_router_v1
 from app.db import base  # Import base to register models
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.supabase import supabase
+import asyncio
+from contextlib import asynccontextmanager
+from app.core.openai import asyncOpenaiClient
+from app.core.qdrant import asyncQdrantClient
+from app.core.config import settings
+from app.db.session import async_engine, get_pool_stats
+from app.helpers.ingestion_functions import ingestion_worker
+from app.helpers.auth_functions import token_verifier, is_revocation_sensitive
+from app.helpers.token_functions import get_encoding
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the tokenizer is loaded (or downloaded) before serving, not by the first request on the event loop
+    await asyncio.to_thread(get_encoding)
+    workers = [asyncio.create_task(ingestion_worker()) for _ in range(settings.INGESTION_WORKERS)]
+    yield
+    for worker in workers:
+        worker.cancel()
+    # release the pooled connections of the shared async clients
+    await asyncOpenaiClient.close()
+    await asyncQdrantClient.close()
+    await async_engine.dispose()
+
+# responses are serialized with orjson instead of the standard json module
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Define the allowed origins
 origins = [
@@ -20,6 +43,13 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+def unauthorized_response(detail):
+    response = Response(detail, status_code=401)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Methods"] = "*"
+    response.headers["Access-Control-Allow-Headers"] = "*"
+    return response
+
 @app.middleware("http")
 async def authenticate_request(request: Request, call_next):
     if (
@@ -34,6 +64,7 @@ async def authenticate_request(request: Request, call_next):
             "/api/v1/auth/signin", 
             "/favicon.ico",
             "/api/v1/query/openai",
+            "/api/v1/query/openai/stream",
             "/api/v1/adminUrlTrain/test"
         ]
     ):
@@ -41,30 +72,18 @@ async def authenticate_request(request: Request, call_next):
 
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
-        response = Response("Unauthorized", status_code=401)
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "*"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        return response
+        return unauthorized_response("Unauthorized")
 
     token = auth_header.split(" ")[1]
     try:
-        auth_response = supabase.auth.get_user(token)
-        if not auth_response.user:
-            response = Response("Invalid user token", status_code=401)
-            response.headers["Access-Control-Allow-Origin"] = "*"
-            response.headers["Access-Control-Allow-Methods"] = "*"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-            return response
-
-        request.state.user_id = auth_response.user.id
+        # verified locally and cached until expiry; supabase is only asked on revocation-sensitive routes
+        remote = settings.AUTH_REMOTE_CHECK and is_revocation_sensitive(request.method, request.url.path)
+        claims = await token_verifier.verify_async(token, remote=remote)
+        request.state.user_id = claims["sub"]
+        request.state.claims = claims
     except Exception as e:
-        response = Response("Invalid user token", status_code=401)
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "*"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        print(f"Auth Error: {e}")
-        return response
+        print(f"Auth Error: {getattr(e, 'detail', e)}")
+        return unauthorized_response("Invalid user token")
 
     response = await call_next(request)
     return response
@@ -76,6 +95,11 @@ app.include_router(api_router_v1, prefix="/api/v1")
 async def get_question_by_id():
    return "Guten Morgen"
 
+# Connection pool metrics of the sync and async database engines
+@app.get("/db/pool")
+async def get_db_pool_stats():
+   return get_pool_stats()
+
 # gunicorn -w 4 -k uvicorn.workers.UvicornWorker app.main:app -b 0.0.0.0:8000
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,36 @@
+import argparse
+import json
+import sys
+from app.helpers.collection_functions import COLLECTION_NAME, ensure_collection, describe_collection
+
+#################################################################################################
+#   Qdrant collection management
+#   python -m app.manage_qdrant ensure [--collection NAME] [--dry-run]
+#       create the collection or apply the settings that differ from the schema
+#       (collection_functions.py); exits 1 when a change needs the collection to be recreated
+#   python -m app.manage_qdrant describe [--collection NAME]
+#       print the current config, payload indexes and point count
+#################################################################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage_qdrant")
+    parser.add_argument("command", choices=["ensure", "describe"])
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--dry-run", action="store_true", help="only print the planned changes")
+    args = parser.parse_args(argv)
+
+    if args.command == "describe":
+        print(json.dumps(describe_collection(args.collection), indent=2, default=str))
+        return 0
+
+    steps, problems = ensure_collection(args.collection, dry_run=args.dry_run)
+    if not steps:
+        print(f"Collection {args.collection} is up to date")
+    elif args.dry_run:
+        for description in steps:
+            print(f"Collection {args.collection} (dry run): {description}")
+    for problem in problems:
+        print(f"Collection {args.collection} needs to be recreated: {problem}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,5 +26,9 @@ class ChatResponse(Chat):
     
 
 class ChatWithMessages(Chat):
+    # a window of the chat's messages, oldest first
     messages: List[Message]
+    # pass as ?before= / ?after= to load the older / newer messages, None when there are none
+    before_cursor: Optional[str] = None
+    after_cursor: Optional[str] = None
     
\ No newline at end of file
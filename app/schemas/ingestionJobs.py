@@ -0,0 +1,16 @@
+import uuid
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+class IngestionJob(BaseModel):
+    id: uuid.UUID
+    question_id: uuid.UUID
+    
+    action: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    
+    created_at: datetime
+    updated_at: datetime
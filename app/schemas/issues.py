@@ -37,4 +37,25 @@ class Issue(BaseModel):
     updated_at: datetime
     
 class IssueWithChat(Issue):
-    chat: ChatWithMessages
\ No newline at end of file
+    chat: ChatWithMessages
+
+# list projection: only the selected fields are returned, the message with ?include=message_content
+class IssueSummary(BaseModel):
+    id : uuid.UUID
+    user_id : Optional[uuid.UUID] = None
+    chat_id : Optional[uuid.UUID] = None
+    message_id : Optional[uuid.UUID] = None
+    
+    message_content : Optional[str] = None
+    
+    feedback : Optional[str] = None
+    response : Optional[str] = None
+    
+    status : Optional[str] = None
+    
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# fields selected by default and the heavy ones sent only on ?include=
+ISSUE_HEAVY_FIELDS = ["message_content"]
+ISSUE_FIELDS = [name for name in IssueSummary.model_fields if name not in ISSUE_HEAVY_FIELDS]
@@ -9,12 +9,18 @@ class MessageCreate(BaseModel):
 class MessageUpdate(BaseModel):
     content: Optional[str] = None
 
+class KnowledgeRef(BaseModel):
+    id: str
+    score: Optional[float] = None
+
 class Message(BaseModel):
     id: uuid.UUID
     chat_id: uuid.UUID
     
     sender: str
     content: str
+    knowledge_refs: Optional[List[KnowledgeRef]] = None
+    # the referenced payloads, only when hydrated
     knowledge: Optional[List[Dict]] = None
     
     created_at: datetime
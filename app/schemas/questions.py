@@ -20,4 +20,21 @@ class Question(BaseModel):
     url: Optional[str]
     
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+class QuestionAccepted(Question):
+    job_id: Optional[uuid.UUID] = None
+
+# list projection: only the selected fields are returned, the answer with ?include=answer
+class QuestionSummary(BaseModel):
+    id: uuid.UUID
+    question: Optional[str] = None
+    answer: Optional[str] = None
+    url: Optional[str] = None
+    
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# fields selected by default and the heavy ones sent only on ?include=
+QUESTION_HEAVY_FIELDS = ["answer"]
+QUESTION_FIELDS = [name for name in QuestionSummary.model_fields if name not in QUESTION_HEAVY_FIELDS]
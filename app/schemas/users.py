@@ -25,4 +25,18 @@ class User(BaseModel):
     interest: Optional[List[str]] = None
     
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+# list projection: only the fields selected with ?fields= are returned
+class UserSummary(BaseModel):
+    id: uuid.UUID
+    name: Optional[str] = None
+    location: Optional[str] = None
+    email: Optional[str] = None
+    platform: Optional[List[str]] = None
+    interest: Optional[List[str]] = None
+    
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+USER_FIELDS = list(UserSummary.model_fields)
@@ -0,0 +1,17 @@
+import asyncio
+import sys
+from app.db import base  # Import base to register models
+from app.helpers.ingestion_functions import ingestion_worker
+from app.helpers.token_functions import get_encoding
+
+#################################################################################################
+#   Standalone ingestion worker process, for running jobs outside the API workers
+#   python -m app.worker [number of concurrent workers]
+#################################################################################################
+async def run_workers(count):
+    await asyncio.to_thread(get_encoding)
+    await asyncio.gather(*(ingestion_worker() for _ in range(count)))
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    asyncio.run(run_workers(count))
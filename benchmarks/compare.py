@@ -0,0 +1,56 @@
+#################################################################################################
+#   Compare two benchmark reports: python -m benchmarks.compare before.json after.json
+#   exits with status 1 when a scenario's p95 latency regressed by more than --tolerance
+#################################################################################################
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before, after):
+    if before is None or after is None or before == 0:
+        return None
+    return (after - before) / before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two PenguinLLM benchmark reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative p95 regression")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    print(f"before: {before.get('commit')}  after: {after.get('commit')}")
+    print(f"{'scenario':<20}{'stage':<16}{'p50 ms':>22}{'p95 ms':>22}{'rps':>18}")
+
+    regressions = []
+    for name, result in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if not old:
+            continue
+
+        rows = [("total", old["latency"], result["latency"])]
+        rows += [(stage, old["stages"].get(stage, {}), stats) for stage, stats in result["stages"].items()]
+        for stage, old_stats, new_stats in rows:
+            p50 = f"{old_stats.get('p50_ms')} -> {new_stats.get('p50_ms')}"
+            p95 = f"{old_stats.get('p95_ms')} -> {new_stats.get('p95_ms')}"
+            rps = f"{old['throughput_rps']} -> {result['throughput_rps']}" if stage == "total" else ""
+            print(f"{name:<20}{stage:<16}{p50:>22}{p95:>22}{rps:>18}")
+
+        delta = change(old["latency"]["p95_ms"], result["latency"]["p95_ms"])
+        if delta is not None and delta > args.tolerance:
+            regressions.append(f"{name}: p95 +{delta:.0%}")
+
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.helpers.embedding_providers import LocalEmbeddingProvider, OPENAI_EMBEDDING_DIMENSIONS
+
+WORDS = (
+    "freelancers should keep their profile complete and respond to buyers quickly "
+    "fees are deducted from every order and withdrawals take a few days to clear "
+    "levels depend on completed orders ratings and response rate"
+).split()
+
+
+#################################################################################################
+#   Local stand-in for the OpenAI HTTP API (embeddings and chat completions)
+#   latency: seconds before the first byte, token_rate: generated tokens per second
+#################################################################################################
+def create_fake_openai_app(latency=0.2, token_rate=50.0, completion_tokens=200, embedding_latency=0.05):
+    app = FastAPI()
+    embedders = {}
+
+    def embedder(dimension):
+        if dimension not in embedders:
+            embedders[dimension] = LocalEmbeddingProvider(dimension=dimension)
+        return embedders[dimension]
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimension = body.get("dimensions") or OPENAI_EMBEDDING_DIMENSIONS.get(body["model"], 3072)
+
+        await asyncio.sleep(embedding_latency)
+        vectors = await asyncio.to_thread(embedder(dimension).embed, inputs)
+        return {
+            "object": "list",
+            "model": body["model"],
+            "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+            "usage": {"prompt_tokens": sum(len(text.split()) for text in inputs), "total_tokens": sum(len(text.split()) for text in inputs)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body["model"]
+        prompt = body["messages"][-1]["content"]
+
+        if body.get("response_format", {}).get("type") == "json_object":
+            parts = prompt.count("Answer part ")
+            content = json.dumps({"summaries": [f"Summary of part {i}." for i in range(parts)]})
+            tokens = [content]
+        else:
+            tokens = [WORDS[i % len(WORDS)] + " " for i in range(completion_tokens)]
+
+        if body.get("stream"):
+            return StreamingResponse(stream_tokens(model, tokens), media_type="text/event-stream")
+
+        await asyncio.sleep(latency + len(tokens) / token_rate)
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens), "total_tokens": len(prompt.split()) + len(tokens)},
+        }
+
+    async def stream_tokens(model, tokens):
+        await asyncio.sleep(latency)
+        for token in tokens:
+            chunk = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(1 / token_rate)
+        yield "data: [DONE]\n\n"
+
+    return app
@@ -0,0 +1,282 @@
+#################################################################################################
+#   Query plan check for the read endpoints
+#   seeds a benchmark database, calls every list / lookup endpoint, captures the SELECTs the ORM
+#   sends and runs EXPLAIN on each one; exits with status 1 if any of them sequentially scans a
+#   table bigger than --min-rows
+#   python -m benchmarks.query_plans --database-url postgresql://localhost/penguin_bench
+#################################################################################################
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# rows per table at --scale 1
+SEED_ROWS = {
+    "users": 2000,
+    "chats": 20000,
+    "questions": 5000,
+    "urltrain": 5000,
+}
+MESSAGES_PER_CHAT = 4
+
+SEED_SQL = {
+    "users": """
+        INSERT INTO users (id, name, location, email, created_at, updated_at)
+        SELECT gen_random_uuid(), 'user ' || i, 'bench', 'plan-' || gen_random_uuid() || '@example.com',
+               now() - i * interval '1 minute', now()
+        FROM generate_series(1, :rows) AS i
+    """,
+    "chats": """
+        INSERT INTO chats (id, user_id, first_message, created_at, updated_at)
+        SELECT gen_random_uuid(), u.ids[1 + i % array_length(u.ids, 1)], 'chat ' || i,
+               now() - i * interval '1 second', now()
+        FROM (SELECT array_agg(id) AS ids FROM users) AS u, generate_series(1, :rows) AS i
+    """,
+    "messages": """
+        INSERT INTO messages (id, chat_id, sender, content, created_at, updated_at)
+        SELECT gen_random_uuid(), c.id, CASE WHEN g % 2 = 1 THEN 'user' ELSE 'assistant' END, 'message ' || g,
+               c.created_at + g * interval '1 second', c.created_at
+        FROM chats AS c, generate_series(1, :per_chat) AS g
+    """,
+    "issues": """
+        INSERT INTO issues (id, user_id, chat_id, message_id, message_content, status, created_at, updated_at)
+        SELECT gen_random_uuid(), c.user_id, m.chat_id, m.id, 'issue',
+               CASE WHEN random() < 0.2 THEN 'open' ELSE 'resolved' END, m.created_at, m.created_at
+        FROM messages AS m JOIN chats AS c ON c.id = m.chat_id
+        WHERE m.sender = 'assistant'
+        LIMIT :rows
+    """,
+    "questions": """
+        INSERT INTO questions (id, question, answer, created_at, updated_at)
+        SELECT gen_random_uuid(), 'question ' || i, 'answer ' || i, now() - i * interval '1 minute', now() - i * interval '1 second'
+        FROM generate_series(1, :rows) AS i
+    """,
+    "urltrain": """
+        INSERT INTO urltrain (id, url, scraped_at)
+        SELECT gen_random_uuid(), 'https://example.com/' || gen_random_uuid(), now() - i * interval '1 minute'
+        FROM generate_series(1, :rows) AS i
+    """,
+    "ingestion_jobs": """
+        INSERT INTO ingestion_jobs (id, question_id, action, status, attempts, created_at, updated_at)
+        SELECT gen_random_uuid(), q.id, 'index', 'succeeded', 1, q.updated_at, q.updated_at
+        FROM questions AS q
+    """,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="EXPLAIN the ORM queries of the PenguinLLM read endpoints")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="Postgres database used only for benchmarking")
+    parser.add_argument("--reset-db", action="store_true", help="drop, recreate and reseed all tables")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the seeded row counts")
+    parser.add_argument("--min-rows", type=int, default=1000, help="sequential scans of tables up to this size are allowed")
+    parser.add_argument("--output", help="write the JSON report here")
+    return parser.parse_args()
+
+
+#################################################################################################
+#   Helper function to seed the tables with generate_series, once per database
+#################################################################################################
+def seed(engine, scale):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT count(*) FROM chats")).scalar():
+            return False
+        for table in ["users", "chats", "messages", "issues", "questions", "urltrain", "ingestion_jobs"]:
+            rows = int(SEED_ROWS.get(table, SEED_ROWS["chats"]) * scale)
+            conn.execute(text(SEED_SQL[table]), {"rows": rows, "per_chat": MESSAGES_PER_CHAT})
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+    return True
+
+
+#################################################################################################
+#   Helper function to call the read endpoints; returns [(endpoint, status code)]
+#################################################################################################
+def call_endpoints(client, headers, ids, on_endpoint):
+    calls = [
+        "/api/v1/chats/",
+        "/api/v1/chats/?cursor={chats_cursor}",
+        "/api/v1/chats/?user_id={user_id}",
+        "/api/v1/chats/users/{user_id}",
+        "/api/v1/chats/{chat_id}",
+        "/api/v1/questions/",
+        "/api/v1/questions/?cursor={questions_cursor}",
+        "/api/v1/questions/{question_id}",
+        "/api/v1/questions/{question_id}/ingestion",
+        "/api/v1/issues/",
+        "/api/v1/issues/?status=open",
+        "/api/v1/issues/?user_id={user_id}",
+        "/api/v1/issues/?chat_id={chat_id}",
+        "/api/v1/issues/{issue_id}/chat",
+        "/api/v1/users/",
+        "/api/v1/users/{user_id}",
+        "/api/v1/users/email/{email}",
+        "/api/v1/users/{user_id}/issues?status=open",
+        "/api/v1/adminUrlTrain/",
+        "/api/v1/adminUrlTrain/id/{url_id}",
+    ]
+    results = []
+    for call in calls:
+        endpoint = call.format(**ids)
+        on_endpoint(call)
+        response = client.get(endpoint, headers=headers)
+        results.append((call, response.status_code))
+    return results
+
+
+def sample_ids(engine, client, headers):
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT i.id AS issue_id, i.chat_id, i.user_id, u.email
+            FROM issues AS i JOIN users AS u ON u.id = i.user_id
+            ORDER BY i.created_at DESC LIMIT 1
+        """)).mappings().one()
+        ids = dict(row)
+        ids["question_id"] = conn.execute(text("SELECT id FROM questions ORDER BY updated_at DESC LIMIT 1")).scalar()
+        ids["url_id"] = conn.execute(text("SELECT id FROM urltrain ORDER BY scraped_at DESC LIMIT 1")).scalar()
+
+    ids["chats_cursor"] = client.get("/api/v1/chats/", headers=headers).json()["next_cursor"]
+    ids["questions_cursor"] = client.get("/api/v1/questions/", headers=headers).json()["next_cursor"]
+    return ids
+
+
+#################################################################################################
+#   Helper functions to walk an EXPLAIN (FORMAT JSON) plan
+#################################################################################################
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+def check_plan(plan, table_rows, min_rows):
+    scans = []
+    violations = []
+    for node in plan_nodes(plan["Plan"]):
+        relation = node.get("Relation Name")
+        if not relation:
+            continue
+        scans.append(f"{node['Node Type']} on {relation}" + (f" using {node['Index Name']}" if node.get("Index Name") else ""))
+        if node["Node Type"] == "Seq Scan" and table_rows.get(relation, 0) > min_rows:
+            violations.append(f"Seq Scan on {relation} ({table_rows[relation]} rows)")
+    return scans, violations
+
+
+async def explain_async(url, statements):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        plans = []
+        async with engine.connect() as conn:
+            for statement, parameters in statements:
+                result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                plans.append(result.scalar())
+        return plans
+    finally:
+        await engine.dispose()
+
+def explain_sync(engine, statements):
+    plans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plans.append(conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar())
+    return plans
+
+
+def main():
+    args = parse_args()
+    if not args.database_url:
+        raise SystemExit("--database-url (or BENCH_DATABASE_URL) is required, use a dedicated benchmark database")
+
+    from benchmarks.standins import configure_environment, install_standins, bench_token
+    configure_environment(args.database_url)
+    os.environ["INGESTION_WORKERS"] = "0"
+
+    import uuid
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, text
+
+    from app.main import app
+    from app.db.base import Base
+    from app.db.session import engine, async_engine
+
+    install_standins()
+    if args.reset_db:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    seeded = seed(engine, args.scale)
+
+    with engine.connect() as conn:
+        table_rows = {
+            name: int(rows) for name, rows in conn.execute(text(
+                "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+            ))
+        }
+
+    headers = {"Authorization": f"Bearer {bench_token(uuid.uuid4())}"}
+    captured = []  # (endpoint, engine name, statement, parameters)
+    current = {"endpoint": None}
+
+    def capture(name):
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if current["endpoint"] and statement.lstrip().upper().startswith("SELECT"):
+                captured.append((current["endpoint"], name, statement, parameters))
+        return before_cursor_execute
+
+    listeners = [(engine, capture("sync")), (async_engine.sync_engine, capture("async"))]
+    with TestClient(app) as client:
+        ids = sample_ids(engine, client, headers)
+        for target, listener in listeners:
+            event.listen(target, "before_cursor_execute", listener)
+        try:
+            results = call_endpoints(client, headers, ids, lambda endpoint: current.update(endpoint=endpoint))
+        finally:
+            for target, listener in listeners:
+                event.remove(target, "before_cursor_execute", listener)
+
+    failed_calls = [(endpoint, status) for endpoint, status in results if status != 200]
+
+    sync_statements = [(statement, parameters) for _, name, statement, parameters in captured if name == "sync"]
+    async_statements = [(statement, parameters) for _, name, statement, parameters in captured if name == "async"]
+    sync_plans = iter(explain_sync(engine, sync_statements))
+    async_plans = iter(asyncio.run(explain_async(async_engine.url, async_statements)))
+
+    report = []
+    violations = 0
+    for endpoint, name, statement, parameters in captured:
+        plan = (next(sync_plans) if name == "sync" else next(async_plans))[0]
+        scans, problems = check_plan(plan, table_rows, args.min_rows)
+        violations += len(problems)
+        report.append({
+            "endpoint": endpoint,
+            "sql": " ".join(statement.split())[:200],
+            "scans": scans,
+            "total_cost": plan["Plan"]["Total Cost"],
+            "violations": problems,
+        })
+
+    for entry in report:
+        status = "FAIL" if entry["violations"] else "ok  "
+        print(f"{status} {entry['endpoint']:<45} {'; '.join(entry['violations'] or entry['scans'])}")
+    for endpoint, status in failed_calls:
+        print(f"FAIL {endpoint:<45} returned {status}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"seeded": seeded, "table_rows": table_rows, "min_rows": args.min_rows, "queries": report,
+                       "failed_calls": failed_calls}, f, indent=2)
+
+    if violations or failed_calls:
+        print(f"{violations} sequential scan(s) on large tables, {len(failed_calls)} failed call(s)")
+        sys.exit(1)
+    print(f"{len(report)} queries checked, no sequential scans on tables over {args.min_rows} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#################################################################################################
+#   End-to-end benchmark of the chat, query and question endpoints against local stand-ins
+#   python -m benchmarks.run --database-url postgresql://localhost/penguin_bench --output bench.json
+#################################################################################################
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+import uuid
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PenguinLLM end-to-end benchmark")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="Postgres database used only for benchmarking")
+    parser.add_argument("--reset-db", action="store_true", help="drop and recreate all tables before running")
+    parser.add_argument("--scenarios", default="chat_create,chat_followup,query,question_create")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed-questions", type=int, default=50, help="questions ingested before the run")
+    parser.add_argument("--query-pool", type=int, default=100, help="number of distinct queries (smaller pools hit the caches more)")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="seconds to the first chat completion byte")
+    parser.add_argument("--openai-token-rate", type=float, default=80.0, help="generated tokens per second")
+    parser.add_argument("--completion-tokens", type=int, default=150)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--wait-ingestion", action="store_true", help="time question_create until its ingestion job finished")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+#################################################################################################
+#   Helper function to run an ASGI app with uvicorn in a background thread
+#################################################################################################
+def serve_in_thread(asgi_app, port, lifespan="on"):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=port, log_level="warning", lifespan=lifespan))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Server on port {port} failed to start")
+        time.sleep(0.01)
+    return server, thread
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": round(1000 * sum(samples) / len(samples), 2) if samples else None,
+        "p50_ms": round(1000 * percentile(samples, 50), 2) if samples else None,
+        "p95_ms": round(1000 * percentile(samples, 95), 2) if samples else None,
+        "p99_ms": round(1000 * percentile(samples, 99), 2) if samples else None,
+        "max_ms": round(1000 * max(samples), 2) if samples else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+TOPICS = ["fees", "withdrawals", "seller levels", "gig ranking", "buyer requests", "disputes", "Fiverr Pro", "connects", "profile review", "payment protection"]
+PLATFORMS = ["Fiverr", "Upwork"]
+
+
+def seed_text(rng, topic, platform, sentences=8):
+    templates = [
+        f"On {platform}, {topic} work differently for new and established freelancers.",
+        f"The {topic} policy on {platform} was updated recently and applies to every order.",
+        f"Freelancers should check the {topic} section of their {platform} dashboard regularly.",
+        f"Support can help with {topic} questions if the help center is not enough.",
+        f"Most {platform} sellers see {topic} change after their first ten orders.",
+        f"Keep records of every order in case {topic} need to be reviewed.",
+    ]
+    return " ".join(rng.choice(templates) for _ in range(sentences))
+
+
+#################################################################################################
+#   Scenario drivers: each returns a coroutine factory producing one request
+#################################################################################################
+class Scenarios:
+    def __init__(self, client, user_id, token, chat_ids, queries, wait_ingestion):
+        self.client = client
+        self.user_id = user_id
+        self.chat_ids = chat_ids
+        self.queries = queries
+        self.wait_ingestion = wait_ingestion
+        self.auth = {"Authorization": f"Bearer {token}"}
+
+    async def chat_create(self, i):
+        return await self.client.post("/api/v1/chats/", json={"user_id": str(self.user_id), "first_message": self.queries[i % len(self.queries)]})
+
+    async def chat_followup(self, i):
+        chat_id = self.chat_ids[i % len(self.chat_ids)]
+        return await self.client.put(f"/api/v1/chats/{chat_id}", json={"content": self.queries[(i * 7) % len(self.queries)]})
+
+    async def query(self, i):
+        return await self.client.post("/api/v1/query/openai", json={"query": self.queries[i % len(self.queries)]})
+
+    async def question_create(self, i):
+        rng = random.Random(i)
+        topic, platform = rng.choice(TOPICS), rng.choice(PLATFORMS)
+        response = await self.client.post(
+            "/api/v1/questions/",
+            headers=self.auth,
+            json={"question": f"How do {topic} work on {platform}? ({i})", "answer": seed_text(rng, topic, platform), "url": None},
+        )
+        if self.wait_ingestion and response.status_code == 202:
+            question_id = response.json()["id"]
+            while True:
+                status = await self.client.get(f"/api/v1/questions/{question_id}/ingestion", headers=self.auth)
+                if status.status_code != 200 or status.json()["status"] in ("succeeded", "failed"):
+                    return status
+                await asyncio.sleep(0.05)
+        return response
+
+
+async def run_scenario(name, request, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = {}
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await request(i)
+                ok = response.status_code < 400
+                key = str(response.status_code)
+            except Exception as e:
+                ok = False
+                key = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors[key] = errors.get(key, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    duration = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+        "errors": errors,
+        "latency": summarize(latencies),
+    }
+
+
+def main():
+    args = parse_args()
+    if not args.database_url:
+        raise SystemExit("--database-url (or BENCH_DATABASE_URL) is required, use a dedicated benchmark database")
+
+    openai_port = free_port()
+    app_port = free_port()
+
+    # settings are read at import time, so the environment must point at the stand-ins first
+    from benchmarks.standins import configure_environment, install_standins, bench_token
+    configure_environment(args.database_url, f"http://127.0.0.1:{openai_port}/v1")
+
+    import httpx
+
+    from benchmarks.fake_openai import create_fake_openai_app
+    from benchmarks.stages import stage_timer
+    from app.main import app
+    from app.db.base import Base
+    from app.db.session import engine, SessionLocal
+    from app.db.models.users import User as UserModel
+    from app.db.models.chats import Chat as ChatModel
+    from app.db.models.questions import Question as QuestionModel
+    from app.helpers.embedding_providers import embedding_provider
+    from app.helpers import qdrant_functions
+    from app.helpers.collection_functions import COLLECTION_NAME, ensure_collection
+
+    serve_in_thread(
+        create_fake_openai_app(args.openai_latency, args.openai_token_rate, args.completion_tokens, args.embedding_latency),
+        openai_port, lifespan="off"
+    )
+
+    user_id = uuid.uuid4()
+    token = bench_token(user_id)
+    qdrant = install_standins(user_id)
+    ensure_collection(COLLECTION_NAME, client=qdrant)
+    stage_timer.install()
+
+    if args.reset_db:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    rng = random.Random(0)
+    db = SessionLocal()
+    try:
+        db.add(UserModel(id=user_id, name="bench", location="bench", email=f"bench-{user_id}@example.com"))
+        db.commit()
+
+        seed_start = time.perf_counter()
+        for i in range(args.seed_questions):
+            topic, platform = TOPICS[i % len(TOPICS)], PLATFORMS[i % len(PLATFORMS)]
+            db_question = QuestionModel(question=f"What should I know about {topic} on {platform}? ({i})", answer=seed_text(rng, topic, platform))
+            db.add(db_question)
+            db.commit()
+            db.refresh(db_question)
+            qdrant_functions.reindex_question_in_qdrant(db_question, COLLECTION_NAME)
+        seed_duration = time.perf_counter() - seed_start
+
+        chat_ids = []
+        for i in range(max(1, args.concurrency)):
+            db_chat = ChatModel(user_id=user_id, first_message=f"bench chat {i}")
+            db.add(db_chat)
+            db.commit()
+            chat_ids.append(db_chat.id)
+    finally:
+        db.close()
+
+    seed_stages = {stage: summarize(samples) for stage, samples in stage_timer.snapshot().items()}
+    queries = [
+        f"{rng.choice(['How do', 'What are', 'Tell me about', 'Explain'])} {rng.choice(TOPICS)} on {rng.choice(PLATFORMS)} {i}"
+        for i in range(args.query_pool)
+    ]
+
+    server, _ = serve_in_thread(app, app_port)
+
+    async def drive():
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=300) as client:
+            scenarios = Scenarios(client, user_id, token, chat_ids, queries, args.wait_ingestion)
+            results = {}
+            for name in args.scenarios.split(","):
+                name = name.strip()
+                stage_timer.reset()
+                results[name] = await run_scenario(name, getattr(scenarios, name), args.requests, args.concurrency)
+                results[name]["stages"] = {stage: summarize(samples) for stage, samples in stage_timer.snapshot().items()}
+            return results
+
+    results = asyncio.run(drive())
+    server.should_exit = True
+
+    report = {
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "database_url"},
+        "embedding_model": embedding_provider.model_id,
+        "seed": {"questions": args.seed_questions, "duration_s": round(seed_duration, 3), "stages": seed_stages},
+        "scenarios": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import functools
+import inspect
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.standins import replace_references
+
+# stage name -> dotted path of the helper that is timed as that stage
+STAGES = {
+    "embed_query": "app.helpers.qdrant_functions.create_embedding_async",
+    "search": "app.helpers.qdrant_functions.search_in_qdrant_async",
+    "retrieve": "app.helpers.openai_functions.retrieve_knowledge_async",
+    "llm": "app.helpers.openai_functions.create_chat_completion_async",
+    "context": "app.helpers.context_functions.load_conversation",
+    "chat_summary": "app.helpers.context_functions.summarize_conversation",
+    "chunk": "app.helpers.qdrant_functions.create_semantic_chunks",
+    "summarize": "app.helpers.qdrant_functions.generate_summary",
+    "embed_batch": "app.helpers.qdrant_functions.create_embeddings",
+    "reindex": "app.helpers.qdrant_functions.reindex_question_in_qdrant",
+    "ingestion_job": "app.helpers.ingestion_functions.run_ingestion_pipeline",
+}
+
+
+#################################################################################################
+#   Per-stage timings, collected by wrapping the app helpers listed in STAGES
+#################################################################################################
+class StageTimer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.samples = defaultdict(list)
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: list(samples) for stage, samples in self.samples.items()}
+
+    def wrap(self, stage, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+            return timed_async
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def install(self):
+        import importlib
+        for stage, path in STAGES.items():
+            module_name, name = path.rsplit(".", 1)
+            module = importlib.import_module(module_name)
+            original = getattr(module, name, None)
+            if original is None:
+                continue
+            replace_references(original, self.wrap(stage, original))
+
+
+stage_timer = StageTimer()
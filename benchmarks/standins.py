@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+import types
+import uuid
+
+import jwt
+from qdrant_client import QdrantClient
+
+
+#################################################################################################
+#   Serializes calls to the in-memory QdrantClient, which is shared by the event loop and the
+#   ingestion worker threads
+#################################################################################################
+class LockedQdrantClient:
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+#################################################################################################
+#   Async facade over a sync in-memory QdrantClient, so the sync ingestion path and the async
+#   request path see the same points (two ":memory:" clients would each have their own store)
+#################################################################################################
+class AsyncQdrantAdapter:
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return attr(*args, **kwargs)
+        return call
+
+    async def close(self):
+        pass
+
+
+#################################################################################################
+#   Supabase stand-in: every bearer token is accepted as the given user
+#################################################################################################
+class StubSupabaseAuth:
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    def get_user(self, token):
+        return types.SimpleNamespace(user=types.SimpleNamespace(id=str(self.user_id), role="authenticated"))
+
+    def sign_out(self):
+        pass
+
+
+#################################################################################################
+#   Helper function to swap every module level reference to an object inside the app package
+#################################################################################################
+def replace_references(original, replacement):
+    for name, module in list(sys.modules.items()):
+        if not (name == "app" or name.startswith("app.")) or module is None:
+            continue
+        for attr, value in list(vars(module).items()):
+            if value is original:
+                setattr(module, attr, replacement)
+
+
+#################################################################################################
+#   Points the settings at the stand-ins; must run before anything under app is imported
+#################################################################################################
+def configure_environment(database_url, openai_base_url="http://127.0.0.1:1/v1"):
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["OPENAI_BASE_URL"] = openai_base_url
+    os.environ["OPENAI_API_KEY"] = "sk-bench"
+    os.environ.setdefault("QDRANT_HOST", "http://127.0.0.1:1")
+    os.environ.setdefault("QDRANT_API_KEY", "bench")
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:1")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench")
+    os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+
+
+def bench_token(user_id, hours=24):
+    return jwt.encode(
+        {"sub": str(user_id), "aud": "authenticated", "role": "authenticated", "exp": int(time.time()) + hours * 3600},
+        os.environ["SUPABASE_JWT_SECRET"], algorithm="HS256"
+    )
+
+
+#################################################################################################
+#   Helper function to install the Qdrant and Supabase stand-ins into an imported app
+#   output: the in-memory sync Qdrant client
+#################################################################################################
+def install_standins(user_id=None):
+    import app.core.qdrant as core_qdrant
+    import app.core.supabase as core_supabase
+
+    qdrant = LockedQdrantClient(QdrantClient(":memory:"))
+    replace_references(core_qdrant.qdrantClient, qdrant)
+    replace_references(core_qdrant.asyncQdrantClient, AsyncQdrantAdapter(qdrant))
+
+    supabase = types.SimpleNamespace(auth=StubSupabaseAuth(user_id or uuid.uuid4()))
+    replace_references(core_supabase.supabase, supabase)
+
+    return qdrant
@@ -0,0 +1,21 @@
+import os
+
+# the app reads its settings at import time; the tests need no database, Qdrant or OpenAI, only
+# values the clients can be built with
+os.environ.setdefault("DATABASE_URL", "postgresql://postgres@localhost/penguin_test")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.test")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("QDRANT_HOST", "http://localhost:6333")
+os.environ.setdefault("QDRANT_API_KEY", "test")
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
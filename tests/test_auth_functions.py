@@ -0,0 +1,95 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+
+from app.helpers import auth_functions
+from app.helpers.auth_functions import TokenVerifier, is_revocation_sensitive
+
+SECRET = "test-secret-with-enough-bytes-for-hs256"
+
+
+def token(secret=SECRET, **claims):
+    claims = {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 3600, **claims}
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+def verify(verifier, encoded):
+    return asyncio.run(verifier.verify_async(encoded))
+
+
+def assert_rejected(verifier, encoded, detail):
+    with pytest.raises(HTTPException) as error:
+        verify(verifier, encoded)
+    assert error.value.status_code == 401
+    assert detail in error.value.detail
+
+
+def test_valid_token_is_verified_once_then_cached():
+    verifier = TokenVerifier(secret=SECRET)
+    encoded = token()
+    assert verify(verifier, encoded)["sub"] == "user-1"
+    assert verify(verifier, encoded)["sub"] == "user-1"
+    assert (verifier.stats()["hits"], verifier.stats()["misses"]) == (1, 1)
+
+
+def test_expired_token():
+    verifier = TokenVerifier(secret=SECRET, leeway=10)
+    assert verify(verifier, token(exp=int(time.time()) - 5))["sub"] == "user-1"
+    assert_rejected(verifier, token(exp=int(time.time()) - 60), "expired")
+
+
+def test_cached_claims_are_dropped_once_the_token_expires(monkeypatch):
+    verifier = TokenVerifier(secret=SECRET, leeway=0)
+    encoded = token(exp=int(time.time()) + 30)
+    verify(verifier, encoded)
+    verify(verifier, encoded)
+    later = time.time() + 60
+    monkeypatch.setattr(auth_functions, "time", SimpleNamespace(time=lambda: later))
+    # the cache no longer answers, the token is decoded again (and PyJWT has its own clock)
+    verify(verifier, encoded)
+    assert (verifier.stats()["hits"], verifier.stats()["misses"]) == (1, 2)
+
+
+def test_wrong_audience_and_signature():
+    verifier = TokenVerifier(secret=SECRET)
+    assert_rejected(verifier, token(aud="anon"), "Audience")
+    assert_rejected(verifier, token(secret="another-secret-with-enough-bytes"), "Signature")
+
+
+def test_logged_out_sessions_are_rejected():
+    verifier = TokenVerifier(secret=SECRET)
+    first, second = token(session_id="s1"), token(session_id="s1", iat=1)
+    verify(verifier, first)
+    verifier.revoke(first)
+    assert_rejected(verifier, second, "logged out")
+
+
+def test_jwks_key_miss():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    other_key = jwt.algorithms.RSAAlgorithm.to_jwk(
+        rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key(), as_dict=True
+    )
+    verifier = TokenVerifier(jwks_url="http://localhost/.well-known/jwks.json")
+    verifier._jwks_client.fetch_data = lambda: {"keys": [{**other_key, "kid": "old", "use": "sig"}]}
+
+    encoded = jwt.encode(
+        {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 3600},
+        private_key, algorithm="RS256", headers={"kid": "new"}
+    )
+    assert_rejected(verifier, encoded, "signing key")
+
+
+def test_hs256_token_without_a_secret():
+    verifier = TokenVerifier(jwks_url="http://localhost/.well-known/jwks.json")
+    assert_rejected(verifier, token(), "SUPABASE_JWT_SECRET")
+
+
+def test_revocation_sensitive_routes():
+    assert is_revocation_sensitive("POST", "/api/v1/questions/")
+    assert is_revocation_sensitive("GET", "/api/v1/auth/logout")
+    assert not is_revocation_sensitive("GET", "/api/v1/questions/")
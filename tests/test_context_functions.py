@@ -0,0 +1,40 @@
+import pytest
+
+from app.helpers import context_functions
+from app.helpers.context_functions import split_history, summary_input, message_tokens
+
+
+def message(content, sender="user"):
+    return {"sender": sender, "content": content}
+
+
+MESSAGES = [message(f"message number {i} " * 5) for i in range(6)]
+
+
+def test_everything_fits():
+    assert split_history(MESSAGES, 10_000) == ([], MESSAGES)
+
+
+def test_the_most_recent_messages_that_fit_are_kept():
+    budget = sum(message_tokens(m) for m in MESSAGES[-2:])
+    assert split_history(MESSAGES, budget) == (MESSAGES[:-2], MESSAGES[-2:])
+    assert split_history(MESSAGES, budget + message_tokens(MESSAGES[0]) - 1) == (MESSAGES[:-2], MESSAGES[-2:])
+
+
+def test_a_message_over_the_budget_ends_the_recent_part():
+    messages = MESSAGES[:2] + [message("long " * 2000)] + MESSAGES[2:3]
+    older, recent = split_history(messages, 1000)
+    assert (older, recent) == (messages[:3], messages[3:])
+
+
+def test_empty_budget_and_history():
+    assert split_history(MESSAGES, 0) == (MESSAGES, [])
+    assert split_history([], 100) == ([], [])
+
+
+def test_summary_input_cuts_at_the_token_cap(monkeypatch):
+    monkeypatch.setattr(context_functions, "SUMMARY_INPUT_TOKENS", 2 * message_tokens(MESSAGES[0]))
+    assert summary_input(MESSAGES) == MESSAGES[:2]
+    # a single message over the cap is still summarized
+    monkeypatch.setattr(context_functions, "SUMMARY_INPUT_TOKENS", 1)
+    assert summary_input(MESSAGES) == MESSAGES[:1]
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.helpers import embedding_cache
+from app.helpers.embedding_cache import EmbeddingCache, cache_key
+from conftest import FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_keys_ignore_case_and_whitespace_but_not_the_model():
+    assert cache_key("How  do I\nwithdraw?", "m") == cache_key("how do i withdraw?", "m")
+    assert cache_key("withdraw", "m") != cache_key("withdraw", "other")
+
+
+def test_get_returns_float32_vectors(clock):
+    cache = EmbeddingCache(max_entries=4, ttl=60)
+    cache.set("Fees?", "m", [0.5, 0.25])
+    vector = cache.get("fees?", "m")
+    assert vector.dtype == np.float32
+    np.testing.assert_allclose(vector, [0.5, 0.25])
+    assert cache.get("fees?", "other") is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = EmbeddingCache(max_entries=2, ttl=60)
+    cache.set("a", "m", [1.0])
+    cache.set("b", "m", [2.0])
+    assert cache.get("a", "m") is not None
+    cache.set("c", "m", [3.0])
+    assert cache.get("b", "m") is None
+    assert cache.get("a", "m") is not None
+    assert cache.get("c", "m") is not None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = EmbeddingCache(max_entries=2, ttl=10)
+    cache.set("a", "m", [1.0])
+    clock.advance(11)
+    assert cache.get("a", "m") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_get_many_and_set_many_keep_the_order(clock):
+    cache = EmbeddingCache(max_entries=4, ttl=60)
+    stored = cache.set_many(["a", "b"], "m", [[1.0], [2.0]])
+    assert [vector[0] for vector in stored] == [1.0, 2.0]
+    vectors = cache.get_many(["b", "x", "a"], "m")
+    assert vectors[1] is None
+    assert (vectors[0][0], vectors[2][0]) == (2.0, 1.0)
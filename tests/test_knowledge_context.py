@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.helpers.knowledge_context import select_knowledge, build_knowledge_context
+from app.helpers.token_functions import count_tokens
+
+
+def hit(score, question_id, answer, chunk_index=0, chunk_hash=None, question="Question?"):
+    return SimpleNamespace(score=score, payload={
+        "id": question_id,
+        "question": question,
+        "answer": answer,
+        "chunk_index": chunk_index,
+        "chunk_hash": chunk_hash or answer,
+        "url": None,
+    })
+
+
+@pytest.fixture(autouse=True)
+def knowledge_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_MODE", "dense")
+    monkeypatch.setattr(settings, "KNOWLEDGE_MIN_SCORE", 0)
+    monkeypatch.setattr(settings, "KNOWLEDGE_SCORE_RATIO", 0.7)
+    monkeypatch.setattr(settings, "KNOWLEDGE_DUPLICATE_THRESHOLD", 0.8)
+
+
+def texts(hits):
+    return [text for _, _, text in hits]
+
+
+def test_hits_below_the_score_cutoff_are_dropped():
+    results = [
+        hit(0.9, "q1", "Fiverr charges a service fee on every order."),
+        hit(0.7, "q2", "Payoneer withdrawals take two business days."),
+        hit(0.5, "q3", "Upwork connects cost fifteen cents each."),
+    ]
+    assert texts(select_knowledge(results, 1000)) == [
+        "Fiverr charges a service fee on every order.",
+        "Payoneer withdrawals take two business days.",
+    ]
+
+
+def test_hybrid_scores_are_not_cut(monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_MODE", "hybrid")
+    results = [hit(0.5, "q1", "Fiverr charges fees."), hit(0.1, "q2", "Upwork charges fees too.")]
+    assert len(select_knowledge(results, 1000)) == 2
+
+
+def test_duplicates_are_dropped():
+    results = [
+        hit(0.9, "q1", "Fiverr charges a twenty percent service fee on every order you complete."),
+        hit(0.9, "q2", "Fiverr charges a twenty percent service fee on every order you complete!", chunk_hash="other"),
+        hit(0.9, "q3", "Different text.", chunk_hash="Fiverr charges a twenty percent service fee on every order you complete."),
+        hit(0.8, "q4", "Withdrawals clear after fourteen days."),
+    ]
+    assert texts(select_knowledge(results, 1000)) == [
+        "Fiverr charges a twenty percent service fee on every order you complete.",
+        "Withdrawals clear after fourteen days.",
+    ]
+
+
+def test_budget_skips_hits_that_do_not_fit():
+    long_answer = "Long answer about payments. " * 40
+    results = [
+        hit(0.9, "q1", "Short answer about fees."),
+        hit(0.9, "q2", long_answer.strip()),
+        hit(0.8, "q3", "Another short answer."),
+    ]
+    budget = 2 * (count_tokens("Short answer about fees.") + count_tokens("[1] Question?") + 3) + 5
+    assert texts(select_knowledge(results, budget)) == ["Short answer about fees.", "Another short answer."]
+
+
+def test_best_hit_is_truncated_to_the_budget():
+    answer = " ".join(f"word{i}" for i in range(400))
+    hits = select_knowledge([hit(0.9, "q1", answer)], 50)
+    assert len(hits) == 1
+    assert answer.startswith(hits[0][2]) and hits[0][2] != answer
+
+
+def test_chunks_are_grouped_per_question_in_answer_order():
+    results = [
+        hit(0.9, "q1", "Second part of the fees answer.", chunk_index=1, question="Fees?"),
+        hit(0.85, "q2", "Withdrawals take two days.", question="Withdrawals?"),
+        hit(0.8, "q1", "First part of the fees answer.", chunk_index=0, question="Fees?"),
+    ]
+    context, knowledge = build_knowledge_context(results, 1000)
+    assert context == (
+        "[1] Fees?\nFirst part of the fees answer.\nSecond part of the fees answer.\n\n"
+        "[2] Withdrawals?\nWithdrawals take two days."
+    )
+    assert [item["score"] for item in knowledge] == [0.8, 0.9, 0.85]
+
+
+def test_no_results():
+    assert build_knowledge_context([], 1000) == ("", [])
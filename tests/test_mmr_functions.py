@@ -0,0 +1,28 @@
+import numpy as np
+
+from app.helpers.mmr_functions import mmr_select, normalize
+
+QUERY = [1.0, 0.0]
+CANDIDATES = [
+    [1.0, 0.1],    # most relevant
+    [1.0, 0.11],   # near duplicate of the first
+    [0.7, -0.7],   # less relevant, different
+]
+
+
+def test_lambda_one_is_relevance_order():
+    assert mmr_select(QUERY, CANDIDATES, 3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_near_duplicates_lose_to_new_information():
+    assert mmr_select(QUERY, CANDIDATES, 2, lambda_mult=0.5) == [0, 2]
+
+
+def test_k_is_capped_by_the_candidates():
+    assert sorted(mmr_select(QUERY, CANDIDATES, 10)) == [0, 1, 2]
+    assert mmr_select(QUERY, CANDIDATES, 0) == []
+    assert mmr_select(QUERY, [], 3) == []
+
+
+def test_normalize_keeps_zero_vectors():
+    np.testing.assert_allclose(normalize(np.array([[3.0, 4.0], [0.0, 0.0]])), [[0.6, 0.8], [0.0, 0.0]])
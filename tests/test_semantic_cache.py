@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.helpers import semantic_cache
+from app.helpers.semantic_cache import SemanticCache
+from conftest import FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(semantic_cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def knowledge(question_id, version="v1"):
+    return [{"id": question_id, "updated_at": version}]
+
+
+def lookup(cache, embedding, versions=None):
+    # the versions in the database default to the ones the knowledge was cached with
+    async def current_versions(question_ids):
+        return versions if versions is not None else {question_id: "v1" for question_id in question_ids}
+    return asyncio.run(cache.lookup_current(embedding, current_versions))
+
+
+def make_cache(max_entries=4, ttl=60):
+    return SemanticCache(max_entries=max_entries, threshold=0.95, ttl=ttl, enabled=True)
+
+
+def test_hit_above_the_threshold_only(clock):
+    cache = make_cache()
+    cache.store([1.0, 0.0], "answer", knowledge("q1"))
+    assert lookup(cache, [2.0, 0.01]) == ("answer", knowledge("q1"))
+    assert lookup(cache, [1.0, 1.0]) is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = make_cache(max_entries=2)
+    cache.store([1.0, 0.0, 0.0], "a", [])
+    clock.advance(1)
+    cache.store([0.0, 1.0, 0.0], "b", [])
+    clock.advance(1)
+    assert lookup(cache, [1.0, 0.0, 0.0]) == ("a", [])
+    clock.advance(1)
+    cache.store([0.0, 0.0, 1.0], "c", [])
+    assert lookup(cache, [0.0, 1.0, 0.0]) is None
+    assert lookup(cache, [1.0, 0.0, 0.0]) == ("a", [])
+    assert lookup(cache, [0.0, 0.0, 1.0]) == ("c", [])
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = make_cache(ttl=10)
+    cache.store([1.0, 0.0], "answer", [])
+    clock.advance(9)
+    assert lookup(cache, [1.0, 0.0]) is not None
+    clock.advance(2)
+    assert lookup(cache, [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_stale_source_versions_are_not_served(clock):
+    cache = make_cache()
+    cache.store([1.0, 0.0], "answer", knowledge("q1", "v1"))
+    assert lookup(cache, [1.0, 0.0], {"q1": "v2"}) is None
+    assert cache.stats()["stale"] == 1
+    # the stale entry is freed, even once the question is back to its cached version
+    assert lookup(cache, [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_neither_stores_nor_counts(clock):
+    cache = SemanticCache(max_entries=2, threshold=0.9, ttl=60)
+    cache.store([1.0, 0.0], "answer", [])
+    assert lookup(cache, [1.0, 0.0]) is None
+    assert (cache.stats()["entries"], cache.stats()["misses"]) == (0, 0)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.helpers.semantic_chunker import SemanticChunker
+
+TOPICS = {"cat": [1.0, 0.0], "car": [0.0, 1.0]}
+
+
+def embed(texts):
+    # a sentence group points at the topics it mentions
+    return [np.sum([TOPICS[word] for word in TOPICS if word in text], axis=0) for text in texts]
+
+
+TEXT = "The cat sleeps. The cat eats. The cat purrs. The car starts. The car stops. The car parks."
+
+
+def contents(chunks):
+    return [chunk.page_content for chunk in chunks]
+
+
+def test_splits_where_the_topic_changes():
+    chunker = SemanticChunker(embed, buffer_size=0)
+    assert contents(chunker.create_chunks(TEXT)) == [
+        "The cat sleeps. The cat eats. The cat purrs.",
+        "The car starts. The car stops. The car parks.",
+    ]
+
+
+def test_pooled_vectors_are_unit_means_of_the_sentences():
+    chunks = SemanticChunker(embed, buffer_size=0).create_chunks(TEXT)
+    np.testing.assert_allclose(chunks[0].vector, [1.0, 0.0])
+    np.testing.assert_allclose(chunks[1].vector, [0.0, 1.0])
+
+
+def test_standard_deviation_threshold_amount():
+    # distances are [0, 0, 1, 0, 0]: mean 0.2, std 0.4
+    assert len(SemanticChunker(embed, "standard_deviation", buffer_size=0).create_chunks(TEXT)) == 1
+    assert len(SemanticChunker(embed, "standard_deviation", 1, buffer_size=0).create_chunks(TEXT)) == 2
+
+
+def test_interquartile_threshold():
+    # the quartiles are both 0, the threshold is the mean distance
+    assert len(SemanticChunker(embed, "interquartile", buffer_size=0).create_chunks(TEXT)) == 2
+
+
+def test_percentile_threshold_amount():
+    # every distance above the 50th percentile breaks, which here is still only the topic change
+    assert len(SemanticChunker(embed, "percentile", 50, buffer_size=0).create_chunks(TEXT)) == 2
+    assert len(SemanticChunker(embed, "percentile", 100, buffer_size=0).create_chunks(TEXT)) == 1
+
+
+def test_single_sentence_and_empty_text():
+    chunker = SemanticChunker(embed)
+    assert contents(chunker.create_chunks("The cat sleeps.")) == ["The cat sleeps."]
+    assert chunker.create_chunks("") == []
+
+
+def test_sentences_are_embedded_with_their_neighbours():
+    chunker = SemanticChunker(embed, buffer_size=1)
+    assert chunker.combine_sentences(["a.", "b.", "c."]) == ["a. b.", "a. b. c.", "b. c."]
+
+
+def test_unknown_threshold_type():
+    with pytest.raises(ValueError):
+        SemanticChunker(embed, "median")
@@ -0,0 +1,43 @@
+from app.helpers.sparse_vectors import (
+    tokenize, term_index, document_sparse_vector, query_sparse_vector, chunk_sparse_vector
+)
+from app.core.config import settings
+
+
+def weights(vector):
+    return dict(zip(vector.indices, vector.values))
+
+
+def test_tokenize_lowercases_and_drops_stopwords():
+    assert tokenize("How do I withdraw my Fiverr earnings?") == ["withdraw", "fiverr", "earnings"]
+    assert tokenize(None) == []
+
+
+def test_document_vector_is_sorted_bm25_term_frequency():
+    vector = weights(document_sparse_vector("fees fees fees payout"))
+    assert list(vector) == sorted(vector)
+    assert vector[term_index("fees")] > vector[term_index("payout")]
+    # term frequency saturates below k1 + 1
+    saturated = weights(document_sparse_vector(" ".join(["fees"] * 1000)))[term_index("fees")]
+    assert saturated < settings.BM25_K1 + 1
+
+
+def test_longer_documents_weigh_a_term_less():
+    short = weights(document_sparse_vector("fees payout"))[term_index("fees")]
+    long = weights(document_sparse_vector("fees " + " ".join(f"word{i}" for i in range(300))))[term_index("fees")]
+    assert long < short
+
+
+def test_query_vector_has_unit_weights_per_distinct_term():
+    vector = weights(query_sparse_vector("fees fees payout"))
+    assert vector == {term_index("fees"): 1.0, term_index("payout"): 1.0}
+
+
+def test_empty_texts_have_empty_vectors():
+    assert document_sparse_vector("the a of").indices == []
+    assert query_sparse_vector("").indices == []
+
+
+def test_chunks_are_indexed_with_their_question():
+    vector = weights(chunk_sparse_vector("Upwork fees?", "A 10% fee applies."))
+    assert term_index("upwork") in vector and term_index("10") in vector